@@ -0,0 +1,62 @@
+"""
+Bytes trafegados e custo de CPU por requisição da compressão de respostas
+(CompressedRoute) para os principais payloads do dashboard.
+
+Uso: python -m benchmarks.dashboard_compression [--repeat 20]
+"""
+
+import argparse
+import time
+
+from benchmarks.dashboard_serialization import evolution_payload, expired_docs
+from nodesk.core.compression import compress
+from nodesk.core.responses import dumps
+
+SETTINGS = [
+    ("identity", None, 0),
+    ("gzip-1", "gzip", 1),
+    ("gzip-6", "gzip", 6),
+    ("gzip-9", "gzip", 9),
+    ("br-1", "br", 1),
+    ("br-4", "br", 4),
+    ("br-11", "br", 11),
+]
+
+
+def payloads() -> dict[str, bytes]:
+    expired = {"items": expired_docs(200), "total": 5000, "limit": 200, "offset": 0}
+    companies = {"companies": [{"company_id": i, "name": f"Empresa {i} LTDA", "cnpj": None} for i in range(500)]}
+    evolution = evolution_payload()
+    return {
+        "tickets_evolution (365x50)": dumps(evolution),
+        "expired_tickets_list (200)": dumps(expired),
+        "companies (500)": dumps(companies),
+        "overview": dumps({"tickets_evolution": evolution, "expired_tickets_list": expired, "companies": companies}),
+    }
+
+
+def cpu_ms(body: bytes, encoding: str | None, level: int, repeat: int) -> float:
+    if encoding is None:
+        return 0.0
+    start = time.process_time()
+    for _ in range(repeat):
+        compress(body, encoding, gzip_level=level, brotli_quality=level)
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, body in payloads().items():
+        print(f"\n{name}")
+        print(f"  {'encoding':<10}{'bytes':>12}{'ratio':>9}{'cpu ms/req':>13}")
+        for label, encoding, level in SETTINGS:
+            size = len(compress(body, encoding, level, level)) if encoding else len(body)
+            ms = cpu_ms(body, encoding, level, args.repeat)
+            print(f"  {label:<10}{size:>12,}{len(body) / size:>8.1f}x{ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compara a serialização das respostas do dashboard:
+
+* validated: caminho padrão do FastAPI (modelos pydantic validados, validação
+  do response_model, encode para JSON).
+* trusted: documentos da ETL repassados como estão para TrustedJSONResponse
+  (orjson), sem validação.
+
+Uso: python -m benchmarks.dashboard_serialization [--repeat 50]
+"""
+
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from nodesk.core.responses import TrustedJSONResponse
+from nodesk.dashboard.schemas import (
+    ExpiredTicketItem,
+    ExpiredTicketsListResponse,
+    TicketsEvolutionResponse,
+)
+
+
+def expired_docs(rows: int = 200) -> list[dict]:
+    created = datetime(2025, 1, 1)
+    return [
+        {
+            "tempo_vencido_minutos": 10_000 - i,
+            "data_criacao": (created + timedelta(minutes=i)).isoformat(),
+            "titulo": f"Chamado {i} - sistema indisponível",
+            "compania_id": i % 40,
+            "compania_nome": f"Empresa {i % 40}",
+            "user_vip": "Sim" if i % 7 == 0 else "Não",
+        }
+        for i in range(rows)
+    ]
+
+
+def evolution_payload(points: int = 365, categories: int = 50) -> dict:
+    start = datetime(2024, 1, 1)
+    abscissa = [(start + timedelta(days=i)).strftime("%d/%m") for i in range(points)]
+    return {
+        "itens": [
+            {"name": f"Categoria {c}", "count": [(i * c) % 97 for i in range(points)], "abscissa": abscissa}
+            for c in range(categories)
+        ]
+    }
+
+
+def validated_expired(docs: list[dict]) -> bytes:
+    items = [ExpiredTicketItem(**doc) for doc in docs]
+    response = ExpiredTicketsListResponse(items=items, total=len(items), limit=200, offset=0)
+    adapter = TypeAdapter(ExpiredTicketsListResponse)
+    content = adapter.dump_python(adapter.validate_python(response), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def trusted_expired(docs: list[dict]) -> bytes:
+    return TrustedJSONResponse({"items": docs, "total": len(docs), "limit": 200, "offset": 0}).body
+
+
+def validated_evolution(payload: dict) -> bytes:
+    adapter = TypeAdapter(TicketsEvolutionResponse)
+    content = adapter.dump_python(adapter.validate_python(payload), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def trusted_evolution(payload: dict) -> bytes:
+    return TrustedJSONResponse(payload).body
+
+
+def measure(label: str, validated, trusted, data, repeat: int) -> None:
+    assert json.loads(validated(data)) == json.loads(trusted(data))
+    slow = min(timeit.repeat(lambda: validated(data), number=1, repeat=repeat))
+    fast = min(timeit.repeat(lambda: trusted(data), number=1, repeat=repeat))
+    print(f"{label:<28} validated {slow * 1000:8.3f} ms   trusted {fast * 1000:8.3f} ms   x{slow / fast:5.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    measure("expired list (200 rows)", validated_expired, trusted_expired, expired_docs(), args.repeat)
+    measure("evolution (365 x 50)", validated_evolution, trusted_evolution, evolution_payload(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Pipelines da ETL sem servidores: origem SQLite (gerada por
+nodesk.etl.synthetic) e destino mongomock, ou um MongoDB local com --mongo-uri.
+
+Para cada escala (tickets) e pipeline mede a vazão (tickets/s, melhor de
+--repeat execuções, cada uma num banco Mongo novo), os documentos gravados
+por segundo e o pico de memória Python (tracemalloc, numa execução à parte). Compara com o baseline em
+benchmarks/etl_baseline.json e termina com erro quando a vazão cai ou o pico
+sobe além da tolerância; --save-baseline grava os valores medidos.
+
+snapshot_retention usa $dateTrunc e $merge, que o mongomock não implementa:
+só roda com --mongo-uri. O ajuste de category_forecast roda em subprocessos,
+fora do tracemalloc.
+
+Uso: python -m benchmarks.etl_pipelines [--scales 1000,10000,50000] [--pipelines companies,evolution_chart]
+     [--repeat 3] [--tolerance 0.5] [--save-baseline] [--output resultados.json] [--mongo-uri mongodb://localhost:27017]
+"""
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Any, Optional
+from unittest import mock
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from pymongo.database import Database
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from nodesk.etl.pipelines import (
+    category_forecast,
+    companies,
+    critical_projects,
+    evolution_chart,
+    expired_tickets,
+    kpi_forecast,
+    kpi_snapshots,
+    snapshot_retention,
+    tickets_snapshot,
+)
+from nodesk.etl.synthetic import Volumes, generate
+
+BASELINE_PATH = Path(__file__).with_name("etl_baseline.json")
+SCALES = (1_000, 10_000, 50_000)
+
+
+# Pipeline: (engine, db, diretório de trabalho) -> resultado; na ordem de run_all_pipelines
+PIPELINES: dict[str, Callable[[Engine, Database, Path], Any]] = {
+    "critical_projects": lambda engine, db, _: critical_projects.run(engine=engine, db=db),
+    "evolution_chart": lambda engine, db, _: evolution_chart.evolution_chart_pipeline(db, engine),
+    "expired_tickets": lambda engine, db, _: expired_tickets.run(engine=engine, db=db),
+    "companies": lambda engine, db, _: companies.run(engine, db),
+    "kpi_forecast": lambda engine, db, _: kpi_forecast.run(db=db),
+    "kpi_snapshots": lambda engine, db, _: kpi_snapshots.run(engine, db),
+    "tickets_snapshot": lambda engine, db, workdir: tickets_snapshot.run(engine, workdir / "tickets.arrow"),
+    "category_forecast": lambda engine, db, workdir: category_forecast.run(db=db, path=workdir / "tickets.arrow"),
+    "snapshot_retention": lambda engine, db, _: snapshot_retention.run(db),
+}
+MONGO_ONLY = {"snapshot_retention"}
+# Folga absoluta: pipelines de milissegundos e picos abaixo de 1 MB oscilam mais que a tolerância
+SLACK_SECONDS = 0.05
+SLACK_MB = 1.0
+
+
+def _bulk_write(collection, requests, ordered=True):
+    """
+    bulk_write para o mongomock, que não aceita as operações do pymongo atual.
+
+    Upserts em lote: uma busca pelas chaves que já existem e um insert_many do
+    resto. O mongomock varre a coleção a cada operação; aplicadas uma a uma,
+    as escritas cresceriam com o quadrado do volume e dominariam a medida.
+    """
+    upserts: dict[str, list[tuple[Any, dict, Any]]] = {}
+    deletes = []
+    for request in requests:
+        if isinstance(request, ReplaceOne) and request._upsert and list(request._filter) == ["_id"]:
+            upserts.setdefault("_id", []).append((request._filter["_id"], dict(request._doc), request))
+        elif isinstance(request, UpdateOne) and request._upsert and list(request._doc) == ["$set"]:
+            ((field, value),) = request._filter.items()
+            upserts.setdefault(field, []).append((value, {**request._filter, **request._doc["$set"]}, request))
+        elif isinstance(request, DeleteMany):
+            deletes.append(request._filter)
+        else:
+            raise TypeError(f"Operação não suportada no stand-in: {request!r}")
+
+    for field, docs in upserts.items():
+        keys = [key for key, _, _ in docs]
+        # Uma varredura direta no armazenamento: $in no mongomock compara cada documento com a lista
+        # inteira, e find copia e projeta cada documento
+        wanted = set(keys)
+        existing = {doc[field] for doc in collection._store.documents if doc.get(field) in wanted}
+        new = [doc for key, doc, _ in docs if key not in existing]
+        for key, _, request in docs:
+            if key not in existing:
+                continue
+            if isinstance(request, ReplaceOne):
+                collection.replace_one(request._filter, request._doc)
+            else:
+                collection.update_one(request._filter, request._doc)
+        if new:
+            collection.insert_many(new, ordered=False)
+    for delete in deletes:
+        collection.delete_many(delete)
+
+
+@contextmanager
+def mongo_sink(uri: Optional[str]):
+    """
+    Fábrica de bancos Mongo vazios: num servidor (--mongo-uri, bancos removidos
+    no fim) ou em memória (mongomock).
+    """
+    if uri:
+        from pymongo import MongoClient
+
+        client = MongoClient(uri)
+        created: list[str] = []
+
+        def database() -> Database:
+            created.append(f"benchmark_etl_{int(time.time() * 1000)}_{len(created)}")
+            return client[created[-1]]
+
+        try:
+            yield database
+        finally:
+            for name in created:
+                client.drop_database(name)
+        return
+
+    import mongomock
+
+    client = mongomock.MongoClient()
+    # Índices únicos também viram uma varredura por documento inserido; as chaves já são únicas na origem
+    with (
+        mock.patch.object(mongomock.collection.Collection, "bulk_write", _bulk_write),
+        mock.patch.object(mongomock.collection.Collection, "_ensure_uniques", lambda collection, doc: None),
+    ):
+        yield lambda: client[f"benchmark_etl_{time.perf_counter_ns()}"]
+
+
+def measure(pipeline: Callable, engine: Engine, new_db: Callable[[], Database], workdir: Path, repeat: int) -> dict:
+    # Sem o log dos pipelines na tabela
+    quiet = io.StringIO()
+    timings = []
+    for _ in range(repeat):
+        db = new_db()
+        started = time.perf_counter()
+        with redirect_stdout(quiet):
+            pipeline(engine, db, workdir)
+        timings.append(time.perf_counter() - started)
+    # O banco é novo a cada execução: tudo nele foi gravado pelo pipeline
+    documents = sum(db[name].estimated_document_count() for name in db.list_collection_names())
+
+    db = new_db()
+    tracemalloc.start()
+    try:
+        with redirect_stdout(quiet):
+            pipeline(engine, db, workdir)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "docs_per_sec": documents / min(timings), "peak_mb": peak / 2**20}
+
+
+def run(scales: list[int], names: list[str], repeat: int, mongo_uri: Optional[str]) -> dict[str, dict[str, dict]]:
+    results: dict[str, dict[str, dict]] = {name: {} for name in names}
+    with tempfile.TemporaryDirectory() as tmp, mongo_sink(mongo_uri) as new_db:
+        for scale in scales:
+            workdir = Path(tmp) / str(scale)
+            workdir.mkdir()
+            url = f"sqlite:///{workdir / 'source.db'}"
+            started = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                generate(Volumes(tickets=scale, days=365), sql_url=url, chunk_size=min(scale, 100_000))
+            print(f"\n{scale:,} tickets (origem gerada em {time.perf_counter() - started:.1f}s)")
+            print(f"{'pipeline':<20}{'s':>9}{'tickets/s':>12}{'docs/s':>12}{'pico MB':>10}")
+
+            engine = create_engine(url, execution_options={"schema_translate_map": {"dbo": None}})
+            try:
+                for name in names:
+                    if name in MONGO_ONLY and not mongo_uri:
+                        print(f"{name:<20}{'requer --mongo-uri':>43}")
+                        continue
+                    result = measure(PIPELINES[name], engine, new_db, workdir, repeat)
+                    result["tickets_per_sec"] = scale / result["seconds"]
+                    results[name][str(scale)] = result
+                    print(
+                        f"{name:<20}{result['seconds']:>9.3f}{result['tickets_per_sec']:>12,.0f}"
+                        f"{result['docs_per_sec']:>12,.0f}{result['peak_mb']:>10.1f}"
+                    )
+            finally:
+                engine.dispose()
+    return results
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Medidas piores que o baseline além da tolerância (vazão menor ou pico maior).
+    """
+    found = []
+    for name, scales in results.items():
+        for scale, result in scales.items():
+            expected = baseline.get(name, {}).get(scale)
+            if not expected:
+                continue
+            seconds = int(scale) / expected["tickets_per_sec"]
+            if result["seconds"] > seconds / (1 - tolerance) + SLACK_SECONDS:
+                found.append(
+                    f"{name} @ {scale}: {result['tickets_per_sec']:,.0f} tickets/s "
+                    f"(baseline {expected['tickets_per_sec']:,.0f})"
+                )
+            if result["peak_mb"] > expected["peak_mb"] * (1 + tolerance) + SLACK_MB:
+                found.append(f"{name} @ {scale}: pico {result['peak_mb']:.1f} MB (baseline {expected['peak_mb']:.1f})")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)))
+    parser.add_argument("--pipelines", default=",".join(PIPELINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="fração de piora aceita sobre o baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", type=Path, help="grava as medidas em JSON")
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args()
+
+    names = args.pipelines.split(",")
+    unknown = set(names) - set(PIPELINES)
+    if unknown:
+        parser.error(f"pipelines desconhecidos: {sorted(unknown)}")
+
+    results = run([int(scale) for scale in args.scales.split(",")], names, args.repeat, args.mongo_uri)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        for name, scales in results.items():
+            baseline.setdefault(name, {}).update(
+                {
+                    scale: {"tickets_per_sec": round(result["tickets_per_sec"]), "peak_mb": round(result["peak_mb"], 1)}
+                    for scale, result in scales.items()
+                }
+            )
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline gravado em {args.baseline}")
+        return
+
+    found = regressions(results, baseline, args.tolerance)
+    if found:
+        print("\n❌ Regressões (tolerância {:.0%}):\n  {}".format(args.tolerance, "\n  ".join(found)))
+        sys.exit(1)
+    print(f"\n✅ Dentro do baseline (tolerância {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
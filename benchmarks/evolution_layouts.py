@@ -0,0 +1,123 @@
+"""
+Layouts da evolução diária (tickets_evolution): um documento por dia
+("documents") contra um documento por série e ano com as contagens
+empacotadas ("series").
+
+Sem MongoDB, compara o tamanho em BSON e a leitura de uma janela de vários
+anos (decode BSON + DataFrame da janela). Com --mongo-uri, grava os dois
+layouts num banco temporário e mede storageSize e o range scan via find.
+
+Uso: python -m benchmarks.evolution_layouts [--years 5] [--categories 20] [--subcategories 80]
+     [--repeat 5] [--mongo-uri mongodb://localhost:27017]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import bson
+import numpy as np
+
+from nodesk.dashboard.evolution import (
+    DOCUMENTS_COLLECTION,
+    SERIES_COLLECTION,
+    documents_frame,
+    pack_series,
+    range_bounds,
+    series_frame,
+    series_query,
+)
+
+
+def synthetic_evolution(years: int, categories: int, subcategories: int) -> list[dict]:
+    rng = np.random.default_rng(42)
+    start = datetime(2025 - years, 1, 1)
+    days = (datetime(2025, 1, 1) - start).days
+    # Nomes com contagem 0 no dia não entram no mapa, como na ETL
+    category_counts = rng.poisson(3, (days, categories))
+    subcategory_counts = rng.poisson(1, (days, subcategories))
+    return [
+        {
+            "date": start + timedelta(days=day),
+            "categories_count": {f"Categoria {c}": int(n) for c, n in enumerate(category_counts[day]) if n},
+            "subcategories_count": {f"Subcategoria {s}": int(n) for s, n in enumerate(subcategory_counts[day]) if n},
+        }
+        for day in range(days)
+    ]
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def local(evolution: list[dict], packed: list[dict], repeat: int) -> None:
+    start, end = evolution[0]["date"].date(), evolution[-1]["date"].date()
+    documents = [bson.encode(doc) for doc in evolution]
+    series = [bson.encode(doc) for doc in packed if doc["level"] == "subcategory"]
+    series_bytes = sum(len(bson.encode(doc)) for doc in packed)
+
+    def read_documents():
+        documents_frame([bson.decode(raw) for raw in documents], "subcategory").resample("MS").mean()
+
+    def read_series():
+        series_frame([bson.decode(raw) for raw in series], start, end).resample("MS").mean()
+
+    rows = [
+        ("documents", len(documents), sum(map(len, documents)), best_of(read_documents, repeat)),
+        ("series", len(packed), series_bytes, best_of(read_series, repeat)),
+    ]
+    print(f"{'layout':<12}{'docs':>8}{'BSON bytes':>14}{'read ms':>10}")
+    for layout, docs, size, seconds in rows:
+        print(f"{layout:<12}{docs:>8,}{size:>14,}{seconds * 1000:>10.1f}")
+
+
+def mongo(uri: str, evolution: list[dict], packed: list[dict], repeat: int) -> None:
+    from pymongo import MongoClient
+
+    client = MongoClient(uri)
+    db = client[f"benchmark_evolution_{int(time.time())}"]
+    try:
+        db[DOCUMENTS_COLLECTION].create_index("date")
+        db[DOCUMENTS_COLLECTION].insert_many([dict(doc) for doc in evolution])
+        db[SERIES_COLLECTION].create_index([("level", 1), ("start", 1), ("end", 1)])
+        db[SERIES_COLLECTION].insert_many([dict(doc) for doc in packed])
+
+        start, end = evolution[0]["date"].date(), evolution[-1]["date"].date()
+        low, high = range_bounds(start, end)
+        scans = {
+            DOCUMENTS_COLLECTION: lambda: list(db[DOCUMENTS_COLLECTION].find({"date": {"$gte": low, "$lte": high}})),
+            SERIES_COLLECTION: lambda: list(db[SERIES_COLLECTION].find(series_query("subcategory", start, end))),
+        }
+        print(f"\n{'collection':<26}{'storageSize':>14}{'indexSize':>12}{'scan ms':>10}")
+        for name, scan in scans.items():
+            stats = db.command("collStats", name)
+            ms = best_of(scan, repeat) * 1000
+            print(f"{name:<26}{stats['storageSize']:>14,}{stats['totalIndexSize']:>12,}{ms:>10.1f}")
+    finally:
+        client.drop_database(db.name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--subcategories", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args()
+
+    evolution = synthetic_evolution(args.years, args.categories, args.subcategories)
+    packed = pack_series(evolution)
+    print(f"{len(evolution)} dias, {args.categories} categorias, {args.subcategories} subcategorias")
+    local(evolution, packed, args.repeat)
+    if args.mongo_uri:
+        mongo(args.mongo_uri, evolution, packed, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
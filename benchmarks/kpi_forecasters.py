@@ -0,0 +1,80 @@
+"""
+Precisão x latência dos previsores do KPI 3 sobre o histórico semanal do
+modelo atual (weekly_tickets_model.json), com origem móvel nas últimas semanas:
+
+- numpy: smoothing_forecast ajustado a cada origem (ajuste + previsão);
+- prophet (refit): fit_series ajustado a cada origem;
+- prophet (modelo atual): predição do modelo servido hoje. Ele foi treinado
+  com todo o histórico, então o erro é in-sample (otimista); a latência é a
+  de servir uma previsão com o modelo já carregado.
+
+Uso: python -m benchmarks.kpi_forecasters [--holdout 12]
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from nodesk.kpi.forecast import WEEKLY_FREQ, fit_series, forecast, load_model, smoothing_forecast
+
+
+def score(name: str, predictions: list[dict], actual: list[float], latencies: list[float]) -> None:
+    yhat = np.array([row["yhat"] for row in predictions], dtype=float)
+    lower = np.array([row["yhat_lower"] for row in predictions], dtype=float)
+    upper = np.array([row["yhat_upper"] for row in predictions], dtype=float)
+    y = np.array(actual, dtype=float)
+
+    mae = np.abs(yhat - y).mean()
+    nonzero = y != 0
+    mape = (np.abs(yhat - y)[nonzero] / y[nonzero]).mean() * 100
+    coverage = ((y >= lower) & (y <= upper)).mean() * 100
+    latency = statistics.median(latencies) * 1000
+    print(f"  {name:<26}{mae:>10.1f}{mape:>9.1f}%{coverage:>10.0f}%{latency:>14.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--holdout", type=int, default=12)
+    args = parser.parse_args()
+
+    model = load_model()
+    history = model.history[["ds", "y"]].reset_index(drop=True)
+    origins = range(len(history) - args.holdout, len(history))
+    actual = [float(history["y"][t]) for t in origins]
+
+    numpy_rows, numpy_latency = [], []
+    refit_rows, refit_latency = [], []
+    for t in origins:
+        train = history.iloc[:t]
+        cutoff = str(train["ds"].iloc[-1].date())
+
+        start = time.perf_counter()
+        numpy_rows += smoothing_forecast(train["ds"], train["y"], 1, WEEKLY_FREQ, cutoff)
+        numpy_latency.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        refit_rows += fit_series(train["ds"], train["y"], 1, WEEKLY_FREQ)["rows"]
+        refit_latency.append(time.perf_counter() - start)
+
+    served = model.predict(pd.DataFrame({"ds": history["ds"].iloc[list(origins)]}))
+    served_rows = [
+        {"yhat": row.yhat, "yhat_lower": row.yhat_lower, "yhat_upper": row.yhat_upper} for row in served.itertuples()
+    ]
+    served_latency = []
+    for _ in range(args.holdout):
+        start = time.perf_counter()
+        forecast(model, 1, WEEKLY_FREQ, str(history["ds"].iloc[-1].date()))
+        served_latency.append(time.perf_counter() - start)
+
+    print(f"{len(history)} semanas de histórico, {args.holdout} origens")
+    print(f"  {'previsor':<26}{'MAE':>10}{'MAPE':>10}{'cobertura':>11}{'latência ms':>14}")
+    score("numpy (ajuste+previsão)", numpy_rows, actual, numpy_latency)
+    score("prophet (refit)", refit_rows, actual, refit_latency)
+    score("prophet (modelo atual)", served_rows, actual, served_latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Carga semanal de tickets usada por predict: CSV (read_csv + to_datetime) contra
+o snapshot Arrow IPC (projeção de coluna + memory-map).
+
+Uso: python -m benchmarks.kpi_tickets_snapshot [--rows 500000] [--repeat 5]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from nodesk.kpi.tickets import weekly_ticket_counts, write_tickets
+
+CATEGORIES = ["Rede", "Acesso", "Hardware", "Software", "Financeiro"]
+STATUSES = ["Aberto", "Em Atendimento", "Aguardando Cliente", "Resolvido", "Fechado"]
+
+
+def synthetic_tickets(rows: int) -> dict[str, list]:
+    rng = np.random.default_rng(42)
+    created = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365 * 24 * 60, rows), unit="min")
+    created = created.floor("ms").to_pydatetime().tolist()
+    return {
+        "ticket_id": list(range(1, rows + 1)),
+        "company_id": rng.integers(1, 300, rows).tolist(),
+        "product_id": rng.integers(1, 50, rows).tolist(),
+        "sla_plan_id": rng.integers(1, 4, rows).tolist(),
+        "category": rng.choice(CATEGORIES, rows).tolist(),
+        "subcategory": [f"Sub {i}" for i in rng.integers(0, 40, rows)],
+        "priority": rng.choice(["Baixa", "Média", "Alta", "Crítica"], rows).tolist(),
+        "status": rng.choice(STATUSES, rows).tolist(),
+        "channel": rng.choice(["Email", "Portal", "Telefone"], rows).tolist(),
+        "created_at": created,
+        "first_response_at": created,
+        "closed_at": [None] * rows,
+    }
+
+
+def csv_weekly(path: Path) -> pd.DataFrame:
+    # Caminho antigo de predict
+    tickets = pd.read_csv(path)
+    tickets["CreatedAt"] = pd.to_datetime(tickets["CreatedAt"])
+    df = tickets.resample("W-MON", on="CreatedAt").size().reset_index(name="y")
+    return df.rename(columns={"CreatedAt": "ds"})
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = synthetic_tickets(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "Tickets.csv"
+        arrow_path = Path(tmp) / "tickets.arrow"
+
+        frame = pd.DataFrame(columns)
+        frame.columns = [name.title().replace("_", "") for name in frame.columns]
+        frame.to_csv(csv_path, index=False)
+        write_tickets(columns, arrow_path)
+
+        pd.testing.assert_frame_equal(csv_weekly(csv_path), weekly_ticket_counts(arrow_path), check_dtype=False)
+
+        csv_s = best_of(lambda: csv_weekly(csv_path), args.repeat)
+        arrow_s = best_of(lambda: weekly_ticket_counts(arrow_path), args.repeat)
+
+        print(f"{args.rows:,} tickets")
+        print(f"  {'formato':<12}{'arquivo MB':>12}{'carga ms':>12}")
+        print(f"  {'csv':<12}{csv_path.stat().st_size / 1e6:>12.1f}{csv_s * 1000:>12.1f}")
+        print(f"  {'arrow':<12}{arrow_path.stat().st_size / 1e6:>12.1f}{arrow_s * 1000:>12.1f}")
+        print(f"  speedup: {csv_s / arrow_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
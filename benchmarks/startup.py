@@ -0,0 +1,67 @@
+"""
+Tempo de startup da API: `import nodesk` e tempo até a primeira resposta
+(lifespan + GET /health), cada amostra num processo Python novo.
+
+Uso: python -m benchmarks.startup [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_CODE = """
+import time
+start = time.perf_counter()
+import nodesk
+print(time.perf_counter() - start)
+"""
+
+FIRST_REQUEST_CODE = """
+import asyncio, time
+start = time.perf_counter()
+from asgi_lifespan import LifespanManager
+from httpx import ASGITransport, AsyncClient
+from nodesk import app
+
+async def first_request():
+    async with LifespanManager(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.get("/health")
+            response.raise_for_status()
+
+asyncio.run(first_request())
+print(time.perf_counter() - start)
+"""
+
+
+def sample(code: str, repeat: int) -> list[float]:
+    # Mesmo ambiente dos testes: o lifespan não acessa bancos
+    env = {**os.environ, "APP_ENVIRONMENT": "testing"}
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", "from dotenv import load_dotenv; load_dotenv('.env.example')\n" + code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env,
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'medida':<22}{'mediana s':>12}{'mín s':>10}{'máx s':>10}")
+    for label, code in (("import nodesk", IMPORT_CODE), ("primeira requisição", FIRST_REQUEST_CODE)):
+        timings = sample(code, args.repeat)
+        print(f"{label:<22}{statistics.median(timings):>12.3f}{min(timings):>10.3f}{max(timings):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import Annotated
 
 from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .authentication.services import AuthenticationService
@@ -10,9 +12,11 @@ from .authentication.protocols import PasswordHasherProtocol, TokenIssuerProtoco
 from .authentication.routers import authentication_router
 from .authentication.tokens import JWTTokenIssuer
 from .core.database.protocols import SQLAlchemySettingsProtocol, MongoSettingsProtocol
-from .core.database.session import get_session
+from .core.database.session import close_mongo_clients, get_session
 from .core.di import provider_for
+from .core.readiness import ANALYTICS_MODULES, Readiness, import_modules
 from .core.settings import Settings
+from .kpi.prediction import PredictionService
 from .users.protocols import PasswordHasherProtocol as UsersPasswordHasherProtocol
 
 # Routers
@@ -53,6 +57,22 @@ async def lifespan(app: FastAPI):
     # Authentication
     app.dependency_overrides[provider_for(AuthenticationService)] = AuthenticationService
 
+    # KPI Prediction (process pool, warmed up outside tests)
+    prediction_service = PredictionService(
+        max_workers=settings.KPI_PREDICTION_WORKERS,
+        timeout=settings.KPI_PREDICTION_TIMEOUT,
+        max_concurrency=settings.KPI_PREDICTION_MAX_CONCURRENCY,
+    )
+    prediction_service.start(warm=settings.APP_ENVIRONMENT != "testing")
+    app.dependency_overrides[provider_for(PredictionService)] = lambda: prediction_service
+
+    # Readiness (heavy imports warmed up in the background, outside tests)
+    readiness = Readiness()
+    readiness.register("kpi_prediction", prediction_service.state)
+    if settings.APP_ENVIRONMENT != "testing":
+        readiness.track("analytics", asyncio.create_task(asyncio.to_thread(import_modules, ANALYTICS_MODULES)))
+    app.dependency_overrides[provider_for(Readiness)] = lambda: readiness
+
     # Bootstrap Administrator
     if settings.APP_ENVIRONMENT != "testing":
         async for session in get_session(settings):
@@ -80,6 +100,9 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    prediction_service.shutdown()
+    close_mongo_clients()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -106,6 +129,14 @@ def health(
     return {"status": "ok", "environment": settings.APP_ENVIRONMENT}
 
 
+@app.get("/ready")
+def ready(
+    readiness: Annotated[Readiness, Depends(provider_for(Readiness))],
+) -> JSONResponse:
+    report = readiness.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
 # Routers
 app.include_router(users_router)
 app.include_router(authentication_router)
@@ -0,0 +1,101 @@
+import gzip
+from collections.abc import Callable, Coroutine
+from typing import Annotated, Any
+
+import brotli
+from fastapi import Depends, Request, Response
+from fastapi.routing import APIRoute
+
+from .di import provider_for
+from .settings import CompressionSettings, Settings
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+async def _bind_settings(request: Request, settings: Annotated[Settings, Depends(provider_for(Settings))]) -> None:
+    # Settings injected per request (bound in the lifespan), read back when the response is compressed
+    request.state.compression_settings = settings
+
+
+def _accepted_encodings(header: str) -> dict[str, float]:
+    encodings: dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values."""
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = [(accepted.get(name, wildcard), name) for name in ("br", "gzip")]
+    quality, name = max(candidates, key=lambda candidate: candidate[0])
+    return name if quality > 0 else None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressedRoute(APIRoute):
+    """
+    Route class that compresses buffered responses (gzip or brotli, negotiated
+    from Accept-Encoding). Enable it per router with
+    APIRouter(route_class=CompressedRoute); subclass and set the class
+    attributes to override the COMPRESSION_* settings for a single router.
+
+    Streaming responses and bodies below the size threshold are left untouched.
+    """
+
+    minimum_size: int | None = None
+    gzip_level: int | None = None
+    brotli_quality: int | None = None
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        kwargs["dependencies"] = [*(kwargs.get("dependencies") or []), Depends(_bind_settings)]
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def compressed_handler(request: Request) -> Response:
+            response = await handler(request)
+            return self.compress_response(request, response)
+
+        return compressed_handler
+
+    def compress_response(self, request: Request, response: Response) -> Response:
+        settings: CompressionSettings = request.state.compression_settings
+        minimum_size = settings.COMPRESSION_MINIMUM_SIZE if self.minimum_size is None else self.minimum_size
+
+        body = getattr(response, "body", None)
+        if not body or len(body) < minimum_size or "content-encoding" in response.headers:
+            return response
+        if not response.headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        response.headers.append("Vary", "Accept-Encoding")
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding is None:
+            return response
+
+        response.body = compress(
+            body,
+            encoding,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL if self.gzip_level is None else self.gzip_level,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY if self.brotli_quality is None else self.brotli_quality,
+        )
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Content-Length"] = str(len(response.body))
+        return response
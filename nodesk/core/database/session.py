@@ -33,12 +33,24 @@ async def get_session(
     await engine.dispose()
 
 
+# One Motor client (and connection pool) per URI, shared by every request
+_MONGO_CLIENTS: dict[str, AsyncIOMotorClient] = {}
+
+
+def get_mongo_client(uri: str) -> AsyncIOMotorClient:
+    client = _MONGO_CLIENTS.get(uri)
+    if client is None:
+        client = _MONGO_CLIENTS[uri] = AsyncIOMotorClient(uri)
+    return client
+
+
+def close_mongo_clients() -> None:
+    while _MONGO_CLIENTS:
+        _, client = _MONGO_CLIENTS.popitem()
+        client.close()
+
+
 async def get_mongo_db(
     mongo_settings: MongoSettings,
 ) -> AsyncIterator[AsyncIOMotorDatabase]:
-    client = AsyncIOMotorClient(mongo_settings.MONGO_URI)
-    db = client[mongo_settings.MONGO_DB]
-    try:
-        yield db
-    finally:
-        client.close()
+    yield get_mongo_client(mongo_settings.MONGO_URI)[mongo_settings.MONGO_DB]
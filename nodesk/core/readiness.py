@@ -0,0 +1,40 @@
+import asyncio
+import importlib
+from collections.abc import Callable, Iterable
+
+# Heavy analytics dependencies imported lazily by the dashboard and KPI code paths
+ANALYTICS_MODULES = ("pandas",)
+
+
+def import_modules(modules: Iterable[str]) -> None:
+    for module in modules:
+        importlib.import_module(module)
+
+
+class Readiness:
+    """
+    Readiness of the components warmed up in the background by the lifespan.
+
+    Each component reports a state string; the application is ready once
+    every component reports "ready".
+    """
+
+    def __init__(self) -> None:
+        self._checks: dict[str, Callable[[], str]] = {}
+
+    def register(self, name: str, check: Callable[[], str]) -> None:
+        self._checks[name] = check
+
+    def track(self, name: str, task: asyncio.Future[object]) -> None:
+        def check() -> str:
+            if not task.done():
+                return "warming"
+            if task.cancelled() or task.exception() is not None:
+                return "failed"
+            return "ready"
+
+        self.register(name, check)
+
+    def report(self) -> dict[str, object]:
+        components = {name: check() for name, check in self._checks.items()}
+        return {"ready": all(state == "ready" for state in components.values()), "components": components}
@@ -1,8 +1,20 @@
 from .mongo import MongoSettings
 from .admin import AdministratorSettings
 from .application import ApplicationSettings
+from .compression import CompressionSettings
+from .dashboard import DashboardSettings
 from .database import DatabaseSettings
+from .kpi import KPISettings
 from .sqlalchemy import SQLAlchemySettings
 
 
-class Settings(ApplicationSettings, DatabaseSettings, SQLAlchemySettings, MongoSettings, AdministratorSettings): ...
+class Settings(
+    ApplicationSettings,
+    DatabaseSettings,
+    SQLAlchemySettings,
+    MongoSettings,
+    AdministratorSettings,
+    CompressionSettings,
+    DashboardSettings,
+    KPISettings,
+): ...
@@ -0,0 +1,9 @@
+from pydantic import Field
+
+from .base import BaseSettings
+
+
+class CompressionSettings(BaseSettings):
+    COMPRESSION_MINIMUM_SIZE: int = Field(default=1024, ge=0)
+    COMPRESSION_GZIP_LEVEL: int = Field(default=6, ge=1, le=9)
+    COMPRESSION_BROTLI_QUALITY: int = Field(default=4, ge=0, le=11)
@@ -0,0 +1,10 @@
+from typing import Literal
+
+from pydantic import Field
+
+from .base import BaseSettings
+
+
+class DashboardSettings(BaseSettings):
+    # Layout da evolução diária gravado pela ETL (mesmo valor de TICKETS_EVOLUTION_LAYOUT na ETL)
+    TICKETS_EVOLUTION_LAYOUT: Literal["documents", "series"] = Field(default="documents")
@@ -0,0 +1,13 @@
+from typing import Literal
+
+from pydantic import Field
+
+from .base import BaseSettings
+
+
+class KPISettings(BaseSettings):
+    KPI_PREDICTION_WORKERS: int = Field(default=1, ge=1)
+    KPI_PREDICTION_TIMEOUT: float = Field(default=10.0, gt=0)
+    KPI_PREDICTION_MAX_CONCURRENCY: int = Field(default=2, ge=1)
+    KPI_TICKETS_SNAPSHOT_PATH: str = Field(default="analytics/tickets.arrow")
+    KPI_FORECAST_MODEL: Literal["prophet", "numpy"] = Field(default="prophet")
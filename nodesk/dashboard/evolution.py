@@ -0,0 +1,109 @@
+"""
+Layouts de armazenamento da evolução diária de tickets abertos (escritos pela
+ETL, lidos pelo dashboard):
+
+* documents (tickets_evolution): um documento por dia com os mapas
+  categories_count e subcategories_count.
+* series (tickets_evolution_series): um documento por série (nível + nome) e
+  ano, com as contagens diárias empacotadas em binário (int32 little-endian,
+  uma por dia a partir de start). Janelas de vários anos leem poucos
+  documentos em vez de um por dia, e os nomes não se repetem a cada dia.
+
+Os dois viram o mesmo DataFrame (índice diário, uma coluna por nome, 0 nos
+dias sem tickets abertos).
+"""
+
+from datetime import date, datetime, time
+from typing import Iterable, Literal
+
+import numpy as np
+import pandas as pd
+
+EvolutionLayout = Literal["documents", "series"]
+Level = Literal["category", "subcategory"]
+
+DOCUMENTS_COLLECTION = "tickets_evolution"
+SERIES_COLLECTION = "tickets_evolution_series"
+COUNTS_DTYPE = np.dtype("<i4")
+LEVEL_FIELDS: dict[Level, str] = {"category": "categories_count", "subcategory": "subcategories_count"}
+
+
+def pack_series(evolution: Iterable[dict]) -> list[dict]:
+    """
+    Documentos diários (em ordem de data, sem lacunas) -> um documento por
+    série e ano. Todas as séries de um ano cobrem os mesmos dias (start..end).
+    """
+    years: dict[int, list[dict]] = {}
+    for doc in evolution:
+        years.setdefault(doc["date"].year, []).append(doc)
+
+    packed = []
+    for year, days in years.items():
+        start, end = days[0]["date"], days[-1]["date"]
+        for level, field in LEVEL_FIELDS.items():
+            series: dict[str, list[int]] = {}
+            for offset, doc in enumerate(days):
+                for name, count in doc[field].items():
+                    series.setdefault(name, [0] * len(days))[offset] = int(count)
+            for name, counts in series.items():
+                packed.append(
+                    {
+                        "_id": f"{level}:{name}:{year}",
+                        "level": level,
+                        "name": name,
+                        "start": start,
+                        "end": end,
+                        "counts": np.asarray(counts, dtype=COUNTS_DTYPE).tobytes(),
+                    }
+                )
+    return packed
+
+
+def range_bounds(start: date, end: date) -> tuple[datetime, datetime]:
+    return datetime.combine(start, time.min), datetime.combine(end, time.max)
+
+
+def series_query(level: Level, start: date, end: date) -> dict:
+    # Séries do ano que se sobrepõem à janela
+    low, high = range_bounds(start, end)
+    return {"level": level, "start": {"$lte": high}, "end": {"$gte": low}}
+
+
+def _ordered(matrix: np.ndarray, index: pd.DatetimeIndex, names: list[str]) -> pd.DataFrame:
+    # Só nomes com tickets abertos na janela, pela ordem do primeiro dia em que aparecem (empate: nome)
+    active = np.flatnonzero(matrix.any(axis=0))
+    first_day = (matrix > 0).argmax(axis=0)
+    order = sorted(active, key=lambda column: (first_day[column], names[column]))
+    return pd.DataFrame(matrix[:, order], index=index, columns=[names[column] for column in order])
+
+
+def documents_frame(docs: list[dict], level: Level) -> pd.DataFrame:
+    field = LEVEL_FIELDS[level]
+    frame = pd.DataFrame([{"date": pd.to_datetime(doc["date"]), **doc[field]} for doc in docs]).set_index("date")
+    # Nome ausente no mapa do dia = nenhum ticket aberto
+    frame = frame.sort_index().fillna(0)
+    return _ordered(frame.to_numpy(dtype=np.int64), frame.index, list(frame.columns))
+
+
+def series_frame(docs: list[dict], start: date, end: date) -> pd.DataFrame:
+    """
+    Desempacota as séries na janela [start, end].
+    """
+    low = max(pd.Timestamp(start), min(pd.Timestamp(doc["start"]) for doc in docs))
+    high = min(pd.Timestamp(end), max(pd.Timestamp(doc["end"]) for doc in docs))
+    index = pd.date_range(low, high, freq="D")
+
+    names: dict[str, int] = {}
+    for doc in docs:
+        names.setdefault(doc["name"], len(names))
+
+    matrix = np.zeros((len(index), len(names)), dtype=np.int64)
+    for doc in docs:
+        counts = np.frombuffer(doc["counts"], dtype=COUNTS_DTYPE)
+        offset = (pd.Timestamp(doc["start"]) - low).days
+        # Recorta a série do ano à janela
+        begin, stop = max(offset, 0), min(offset + len(counts), len(index))
+        if begin < stop:
+            matrix[begin:stop, names[doc["name"]]] = counts[begin - offset : stop - offset]
+
+    return _ordered(matrix, pd.DatetimeIndex(index, name="date"), list(names))
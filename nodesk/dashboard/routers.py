@@ -1,26 +1,25 @@
-from fastapi import APIRouter, status, Depends, Query, HTTPException
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from typing import List, Optional
+from fastapi import APIRouter, status, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 
+from ..core.compression import CompressedRoute
 from ..core.database.session import get_mongo_db
+from ..core.di import provider_for
+from ..core.settings import Settings
+from ..core.responses import TrustedJSONResponse
+from nodesk.dashboard import service
 from nodesk.dashboard.schemas import (
     CriticalProjectsSnapshot,
     TicketsEvolutionResponse,
     TotalExpiredTicketsResponse,
-    ExpiredTicketItem,
     ExpiredTicketsListResponse,
-    CompanyItem,
     CompaniesListResponse,
+    DashboardOverviewResponse,
+    SingleFlightStats,
 )
 from motor.motor_asyncio import AsyncIOMotorDatabase
-import pandas as pd
 
-dashboard_router = APIRouter(prefix="/dashboard", tags=["dashboard"])
-
-EXPIRED_TICKETS_COLLECTION = "expired_tickets_totals"
-EXPIRED_TICKETS_LIST_COLLECTION = "expired_tickets_list"
-EXPIRED_TICKETS_DEFAULT_STATUS = [1, 2, 3]
+dashboard_router = APIRouter(prefix="/dashboard", tags=["dashboard"], route_class=CompressedRoute)
 
 
 @dashboard_router.get("/exemplo", response_model=List[dict])
@@ -48,94 +47,13 @@ async def exemplo(db: AsyncIOMotorDatabase = Depends(get_mongo_db)):
 )
 async def get_tickets_evolution(
     db: AsyncIOMotorDatabase = Depends(get_mongo_db),
+    settings: Settings = Depends(provider_for(Settings)),
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     subcategories: bool = Query(False, description="Exibir dados por subcategorias?"),
 ):
-    if not start_date or not end_date:
-        end = datetime.today().date()
-        start = end - relativedelta(months=6)
-    else:
-        start = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end = datetime.strptime(end_date, "%Y-%m-%d").date()
-
-    diff_days = (end - start).days
-
-    # Define granularidade
-    if diff_days >= 120:
-        granularity = "M"  # mês
-    elif diff_days >= 90:
-        granularity = "2W"  # pares de semanas
-    elif diff_days >= 30:
-        granularity = "W"  # semana
-    elif diff_days >= 10:
-        granularity = "2D"  # pares de dias
-    else:
-        granularity = "D"  # dia
-
-    # Busca os dados no Mongo
-    collection = db["tickets_evolution"]
-    cursor = collection.find(
-        {
-            "date": {
-                "$gte": datetime.combine(start, datetime.min.time()),
-                "$lte": datetime.combine(end, datetime.max.time()),
-            }
-        }
-    )
-    docs = await cursor.to_list(length=None)
-
-    # se não houver documentos, retorne no formato esperado pelo pydantic
-    if not docs:
-        return {"tickets_evolution": []}
-
-    # Normaliza em DataFrame (cada coluna = uma categoria/subcategoria)
-
-    df = pd.DataFrame(
-        [
-            {
-                "date": pd.to_datetime(doc["date"]),
-                **(doc["subcategories_count"] if subcategories else doc["categories_count"]),
-            }
-            for doc in docs
-        ]
-    ).set_index("date")
-
-    # Resample de acordo com granularidade (média para agregações maiores, diário mantém)
-    if granularity in ["M", "W", "2W", "2D"]:
-        df_grouped = df.resample(granularity).mean().fillna(0)
-    elif granularity == "D":
-        # já está diário no índice; garantir ordenação por data
-        df_grouped = df.sort_index()
-    else:
-        df_grouped = df.sort_index()
-
-    # Converter para inteiros (arredonda médias)
-    df_int = df_grouped.round().astype(int)
-
-    # Preparar saída
-    categorias = list(df_int.columns)
-    counts = [df_int[cat].tolist() for cat in categorias]
-
-    # Abscissa (labels do eixo x)
-    if granularity == "M":
-        abscissa = [d.strftime("%b/%Y") for d in df_int.index]
-    elif granularity in ["W", "2W"]:
-        abscissa = [f"Sem {d.strftime('%U')}/{d.year}" for d in df_int.index]
-    elif granularity in ["2D", "D"]:
-        abscissa = [d.strftime("%d/%m") for d in df_int.index]
-    else:
-        abscissa = [str(d.date()) for d in df_int.index]
-
-    # Montar resposta no formato esperado por TicketsEvolutionResponse
-    result = []
-
-    for i in range(len(categorias)):
-        result.append({"name": categorias[i], "count": counts[i], "abscissa": abscissa})
-
-    obj_result = {"itens": result}
-
-    return obj_result
+    start, end = service.evolution_range(start_date, end_date)
+    return TrustedJSONResponse(await service.get_tickets_evolution(db, settings, start, end, subcategories))
 
 
 @dashboard_router.get(
@@ -146,69 +64,18 @@ async def get_tickets_evolution(
 async def get_total_expired_tickets(
     db: AsyncIOMotorDatabase = Depends(get_mongo_db),
 ) -> TotalExpiredTicketsResponse:
-    collection = db[EXPIRED_TICKETS_COLLECTION]
-    doc = await collection.find_one(sort=[("generated_at", -1)])
-
-    if not doc:
-        return TotalExpiredTicketsResponse(
-            generated_at=None,
-            total_expired_tickets=0,
-            open_status_ids=EXPIRED_TICKETS_DEFAULT_STATUS,
-        )
-
-    generated_at = doc.get("generated_at")
-    if isinstance(generated_at, str):
-        try:
-            doc["generated_at"] = datetime.fromisoformat(generated_at)
-        except ValueError:
-            doc["generated_at"] = None
-
-    doc.pop("_id", None)
-
-    return TotalExpiredTicketsResponse(
-        generated_at=doc.get("generated_at"),
-        total_expired_tickets=int(doc.get("total_expired_tickets", 0)),
-        open_status_ids=list(doc.get("open_status_ids", EXPIRED_TICKETS_DEFAULT_STATUS)),
-    )
+    return await service.get_total_expired_tickets(db)
 
 
 @dashboard_router.get("/categories", status_code=status.HTTP_200_OK)
 async def top_subcategories(
     db: AsyncIOMotorDatabase = Depends(get_mongo_db),
+    settings: Settings = Depends(provider_for(Settings)),
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
 ):
-    end = datetime.today().date() if not end_date else datetime.strptime(end_date, "%Y-%m-%d").date()
-    start = end - relativedelta(days=60) if not start_date else datetime.strptime(start_date, "%Y-%m-%d").date()
-
-    collection = db["tickets_evolution"]
-    cursor = collection.find(
-        {
-            "date": {
-                "$gte": datetime.combine(start, datetime.min.time()),
-                "$lte": datetime.combine(end, datetime.max.time()),
-            }
-        }
-    )
-    docs = await cursor.to_list(length=None)
-
-    if not docs:
-        return []
-
-    subcategories_sum = {}
-    for doc in docs:
-        for subcat, count in doc.get("subcategories_count", {}).items():
-            subcategories_sum[subcat] = subcategories_sum.get(subcat, 0) + count
-
-    num_days = (end - start).days + 1
-
-    subcategories_avg = {name: total / num_days for name, total in subcategories_sum.items()}
-
-    top5 = sorted(subcategories_avg.items(), key=lambda x: x[1], reverse=True)[:5]
-
-    result = [{"name": name, "count": int(round(count))} for name, count in top5]
-
-    return result
+    start, end = service.categories_range(start_date, end_date)
+    return TrustedJSONResponse(await service.get_top_subcategories(db, settings, start, end))
 
 
 @dashboard_router.get(
@@ -220,56 +87,11 @@ async def get_critical_projects(
     db: AsyncIOMotorDatabase = Depends(get_mongo_db),
     start: Optional[str] = Query(None, description="ISO 8601 datetime inclusive lower bound"),
     end: Optional[str] = Query(None, description="ISO 8601 datetime inclusive upper bound"),
+    bucket: Literal["raw", "hour", "day"] = Query(
+        "raw", description="Resolução: todos os snapshots (raw) ou o último de cada hora/dia"
+    ),
 ):
-    def parse_iso(value: str) -> datetime:
-        try:
-            return datetime.fromisoformat(value.replace("Z", "+00:00"))
-        except ValueError as exc:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid datetime format: {value}",
-            ) from exc
-
-    filters: dict[str, dict[str, datetime]] = {}
-
-    if start or end:
-        parsed_start = parse_iso(start) if start else None
-        parsed_end = parse_iso(end) if end else None
-
-        if parsed_start and parsed_end and parsed_start > parsed_end:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="start must be before or equal to end",
-            )
-
-        generated_range: dict[str, datetime] = {}
-        if parsed_start:
-            generated_range["$gte"] = parsed_start
-        if parsed_end:
-            generated_range["$lte"] = parsed_end
-        filters["generated_at"] = generated_range
-
-    collection = db["critical_projects"]
-    documents: List[dict] = []
-
-    if filters:
-        cursor = collection.find(filters).sort("generated_at", -1)
-        documents = await cursor.to_list(length=None)
-
-        if not documents:
-            return []
-    else:
-        document = await collection.find_one(sort=[("generated_at", -1)])
-
-        if not document:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No critical project data found")
-
-        documents = [document]
-
-    for doc in documents:
-        doc["id"] = str(doc.pop("_id"))
-
-    return documents
+    return TrustedJSONResponse(await service.get_critical_projects(db, start, end, bucket))
 
 
 @dashboard_router.get(
@@ -286,35 +108,29 @@ async def get_expired_tickets_list(
     """
     Retorna a lista detalhada de chamados vencidos com paginação.
     """
-    collection = db[EXPIRED_TICKETS_LIST_COLLECTION]
-
-    # Monta o filtro de busca
-    filter_query = {}
-    if company_id is not None:
-        filter_query["compania_id"] = company_id
-
-    # Conta o total de documentos
-    total = await collection.count_documents(filter_query)
+    return TrustedJSONResponse(await service.get_expired_tickets_list(db, limit, offset, company_id))
 
-    # Busca os documentos com paginação
-    cursor = collection.find(filter_query).sort("tempo_vencido_minutos", -1).skip(offset).limit(limit)
-    docs = await cursor.to_list(length=limit)
 
-    # Converte data_criacao de string ISO para datetime se necessário
-    items = []
-    for doc in docs:
-        if "data_criacao" in doc and isinstance(doc["data_criacao"], str):
-            try:
-                doc["data_criacao"] = datetime.fromisoformat(doc["data_criacao"].replace("Z", "+00:00"))
-            except ValueError:
-                doc["data_criacao"] = None
-        items.append(ExpiredTicketItem(**doc))
-
-    return ExpiredTicketsListResponse(
-        items=items,
-        total=total,
-        limit=limit,
-        offset=offset,
+@dashboard_router.get("/expired_tickets_list/export", status_code=status.HTTP_200_OK)
+async def export_expired_tickets_list(
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="ndjson ou csv"),
+    company_id: Optional[int] = Query(None, description="Filtrar por ID da empresa"),
+    gzip: bool = Query(False, description="Compactar o arquivo com gzip"),
+):
+    """
+    Exporta a lista completa de chamados vencidos em streaming.
+    """
+    filename = f"expired_tickets.{export_format}"
+    media_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        service.export_expired_tickets(db, export_format, company_id, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
@@ -329,10 +145,56 @@ async def get_companies(
     """
     Retorna a lista de empresas.
     """
-    collection = db["companies"]
-    cursor = collection.find().sort("name", 1)
-    docs = await cursor.to_list(length=None)
+    return TrustedJSONResponse(await service.get_companies(db))
 
-    companies = [CompanyItem(**doc) for doc in docs]
 
-    return CompaniesListResponse(companies=companies)
+@dashboard_router.get(
+    "/overview",
+    response_model=DashboardOverviewResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_overview(
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db),
+    settings: Settings = Depends(provider_for(Settings)),
+    widgets: Optional[List[str]] = Query(None, description="Widgets a incluir (padrão: todos)"),
+    timeout: float = Query(5.0, gt=0, le=30, description="Tempo máximo por widget, em segundos"),
+    evolution_start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    evolution_end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    evolution_subcategories: bool = Query(False, description="Evolução por subcategorias?"),
+    categories_start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    categories_end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    critical_start: Optional[str] = Query(None, description="ISO 8601 datetime inclusive lower bound"),
+    critical_end: Optional[str] = Query(None, description="ISO 8601 datetime inclusive upper bound"),
+    expired_limit: int = Query(50, ge=1, le=200, description="Número máximo de chamados vencidos"),
+    expired_offset: int = Query(0, ge=0, description="Número de chamados vencidos a pular"),
+    expired_company_id: Optional[int] = Query(None, description="Filtrar vencidos por ID da empresa"),
+):
+    """
+    Retorna todos os widgets do dashboard em um único documento, consultados em paralelo.
+    """
+    evolution_start, evolution_end = service.evolution_range(evolution_start_date, evolution_end_date)
+    categories_start, categories_end = service.categories_range(categories_start_date, categories_end_date)
+
+    available = {
+        "tickets_evolution": lambda: service.get_tickets_evolution(
+            db, settings, evolution_start, evolution_end, evolution_subcategories
+        ),
+        "categories": lambda: service.get_top_subcategories(db, settings, categories_start, categories_end),
+        "critical_projects": lambda: service.get_critical_projects(db, critical_start, critical_end),
+        "total_expired_tickets": lambda: service.get_total_expired_tickets(db),
+        "expired_tickets_list": lambda: service.get_expired_tickets_list(
+            db, expired_limit, expired_offset, expired_company_id
+        ),
+        "companies": lambda: service.get_companies(db),
+    }
+    selected = [name for name in service.OVERVIEW_WIDGETS if not widgets or name in widgets]
+
+    return TrustedJSONResponse(await service.get_overview({name: available[name] for name in selected}, timeout))
+
+
+@dashboard_router.get("/coalescing", response_model=SingleFlightStats, status_code=status.HTTP_200_OK)
+async def get_coalescing_stats():
+    """
+    Contadores de coalescência das consultas de evolução e categorias.
+    """
+    return service.dashboard_flight.stats()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -26,6 +26,9 @@ class CriticalProjectsSnapshot(BaseModel):
     limit: int
     open_status_ids: List[int]
     rows: List[CriticalProjectRow]
+    # Rollups (bucket=hour/day): nível e quantos snapshots o documento resume
+    bucket: Optional[str] = None
+    samples: Optional[int] = None
 
 
 class TotalExpiredTicketsResponse(BaseModel):
@@ -58,3 +61,25 @@ class CompanyItem(BaseModel):
 
 class CompaniesListResponse(BaseModel):
     companies: List[CompanyItem]
+
+
+class TopSubcategoryItem(BaseModel):
+    name: str
+    count: int
+
+
+class DashboardOverviewResponse(BaseModel):
+    tickets_evolution: Optional[TicketsEvolutionResponse] = None
+    categories: Optional[List[TopSubcategoryItem]] = None
+    critical_projects: Optional[List[CriticalProjectsSnapshot]] = None
+    total_expired_tickets: Optional[TotalExpiredTicketsResponse] = None
+    expired_tickets_list: Optional[ExpiredTicketsListResponse] = None
+    companies: Optional[CompaniesListResponse] = None
+    errors: Dict[str, str] = {}
+
+
+class SingleFlightStats(BaseModel):
+    requests: int
+    executions: int
+    coalesced: int
+    in_flight: int
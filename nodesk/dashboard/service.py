@@ -0,0 +1,440 @@
+import asyncio
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from dateutil.relativedelta import relativedelta
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from nodesk.core.responses import dumps
+from nodesk.core.settings import DashboardSettings
+from nodesk.dashboard.schemas import CompanyItem, TotalExpiredTicketsResponse
+from nodesk.dashboard.singleflight import SingleFlight
+
+TICKETS_EVOLUTION_COLLECTION = "tickets_evolution"
+CRITICAL_PROJECTS_COLLECTION = "critical_projects"
+# Resolução total e rollups (último snapshot de cada hora/dia) gerados pela ETL
+CRITICAL_PROJECTS_BUCKETS = {
+    "raw": CRITICAL_PROJECTS_COLLECTION,
+    "hour": "critical_projects_hourly",
+    "day": "critical_projects_daily",
+}
+EXPIRED_TICKETS_COLLECTION = "expired_tickets_totals"
+EXPIRED_TICKETS_LIST_COLLECTION = "expired_tickets_list"
+COMPANIES_COLLECTION = "companies"
+EXPIRED_TICKETS_DEFAULT_STATUS = [1, 2, 3]
+EXPIRED_TICKETS_EXPORT_FIELDS = (
+    "tempo_vencido_minutos",
+    "data_criacao",
+    "titulo",
+    "compania_id",
+    "compania_nome",
+    "user_vip",
+)
+EXPORT_BATCH_SIZE = 500
+# Só os campos de CompanyItem: a resposta não passa pelo response_model
+COMPANIES_PROJECTION = {"_id": 0, **{field: 1 for field in CompanyItem.model_fields}}
+
+
+# Dashboards refreshed together (e.g. right after an ETL run) share one computation per date range
+dashboard_flight = SingleFlight()
+
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_iso(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid datetime format: {value}",
+        ) from exc
+
+
+def evolution_range(start_date: Optional[str], end_date: Optional[str]) -> tuple[date, date]:
+    """
+    Intervalo do gráfico de evolução: últimos 6 meses quando não informado.
+    """
+    if not start_date or not end_date:
+        end = datetime.today().date()
+        return end - relativedelta(months=6), end
+    return parse_date(start_date), parse_date(end_date)
+
+
+def categories_range(start_date: Optional[str], end_date: Optional[str]) -> tuple[date, date]:
+    """
+    Intervalo do ranking de subcategorias: últimos 60 dias quando não informado.
+    """
+    end = datetime.today().date() if not end_date else parse_date(end_date)
+    start = end - relativedelta(days=60) if not start_date else parse_date(start_date)
+    return start, end
+
+
+async def _evolution_frame(
+    db: AsyncIOMotorDatabase, settings: DashboardSettings, start: date, end: date, subcategories: bool
+):
+    """
+    Evolução diária na janela como DataFrame (uma coluna por nome), no layout
+    configurado em TICKETS_EVOLUTION_LAYOUT; None sem dados gravados.
+    """
+    # pandas/numpy só quando o gráfico é pedido (fora do startup da API)
+    from nodesk.dashboard import evolution
+
+    level: evolution.Level = "subcategory" if subcategories else "category"
+    if settings.TICKETS_EVOLUTION_LAYOUT == "series":
+        docs = (
+            await db[evolution.SERIES_COLLECTION].find(evolution.series_query(level, start, end)).to_list(length=None)
+        )
+        return evolution.series_frame(docs, start, end) if docs else None
+
+    low, high = evolution.range_bounds(start, end)
+    docs = await db[TICKETS_EVOLUTION_COLLECTION].find({"date": {"$gte": low, "$lte": high}}).to_list(length=None)
+    return evolution.documents_frame(docs, level) if docs else None
+
+
+async def get_tickets_evolution(
+    db: AsyncIOMotorDatabase, settings: DashboardSettings, start: date, end: date, subcategories: bool
+) -> dict:
+    return await dashboard_flight.do(
+        ("tickets_evolution", settings.TICKETS_EVOLUTION_LAYOUT, start, end, subcategories),
+        lambda: _compute_tickets_evolution(db, settings, start, end, subcategories),
+    )
+
+
+async def _compute_tickets_evolution(
+    db: AsyncIOMotorDatabase, settings: DashboardSettings, start: date, end: date, subcategories: bool
+) -> dict:
+    diff_days = (end - start).days
+
+    # Define granularidade
+    if diff_days >= 120:
+        granularity = "M"  # mês
+    elif diff_days >= 90:
+        granularity = "2W"  # pares de semanas
+    elif diff_days >= 30:
+        granularity = "W"  # semana
+    elif diff_days >= 10:
+        granularity = "2D"  # pares de dias
+    else:
+        granularity = "D"  # dia
+
+    # Busca os dados no Mongo (cada coluna = uma categoria/subcategoria)
+    df = await _evolution_frame(db, settings, start, end, subcategories)
+
+    # se não houver documentos, retorne no formato esperado pelo pydantic
+    if df is None:
+        return {"itens": []}
+
+    # Resample de acordo com granularidade (média para agregações maiores, diário mantém)
+    if granularity in ["M", "W", "2W", "2D"]:
+        df_grouped = df.resample(granularity).mean().fillna(0)
+    elif granularity == "D":
+        # já está diário no índice; garantir ordenação por data
+        df_grouped = df.sort_index()
+    else:
+        df_grouped = df.sort_index()
+
+    # Converter para inteiros (arredonda médias)
+    df_int = df_grouped.round().astype(int)
+
+    # Preparar saída
+    categorias = list(df_int.columns)
+    counts = [df_int[cat].tolist() for cat in categorias]
+
+    # Abscissa (labels do eixo x)
+    if granularity == "M":
+        abscissa = [d.strftime("%b/%Y") for d in df_int.index]
+    elif granularity in ["W", "2W"]:
+        abscissa = [f"Sem {d.strftime('%U')}/{d.year}" for d in df_int.index]
+    elif granularity in ["2D", "D"]:
+        abscissa = [d.strftime("%d/%m") for d in df_int.index]
+    else:
+        abscissa = [str(d.date()) for d in df_int.index]
+
+    # Montar resposta no formato esperado por TicketsEvolutionResponse
+    result = []
+
+    for i in range(len(categorias)):
+        result.append({"name": categorias[i], "count": counts[i], "abscissa": abscissa})
+
+    return {"itens": result}
+
+
+async def get_top_subcategories(
+    db: AsyncIOMotorDatabase, settings: DashboardSettings, start: date, end: date
+) -> List[dict]:
+    return await dashboard_flight.do(
+        ("categories", settings.TICKETS_EVOLUTION_LAYOUT, start, end),
+        lambda: _compute_top_subcategories(db, settings, start, end),
+    )
+
+
+async def _compute_top_subcategories(
+    db: AsyncIOMotorDatabase, settings: DashboardSettings, start: date, end: date
+) -> List[dict]:
+    df = await _evolution_frame(db, settings, start, end, subcategories=True)
+
+    if df is None:
+        return []
+
+    subcategories_sum = df.sum().to_dict()
+
+    num_days = (end - start).days + 1
+
+    subcategories_avg = {name: total / num_days for name, total in subcategories_sum.items()}
+
+    top5 = sorted(subcategories_avg.items(), key=lambda x: x[1], reverse=True)[:5]
+
+    return [{"name": name, "count": int(round(count))} for name, count in top5]
+
+
+async def get_total_expired_tickets(db: AsyncIOMotorDatabase) -> TotalExpiredTicketsResponse:
+    """
+    Total contado na leitura, com o mesmo filtro da lista (pelo índice em
+    deadline): card e lista nunca divergem entre execuções da ETL. O snapshot
+    da ETL só informa quando a lista foi carregada e os status abertos.
+    """
+    now = datetime.now(tz=timezone.utc)
+    doc, total = await asyncio.gather(
+        db[EXPIRED_TICKETS_COLLECTION].find_one(sort=[("generated_at", -1)]),
+        db[EXPIRED_TICKETS_LIST_COLLECTION].count_documents(_expired_tickets_filter(None, now)),
+    )
+
+    if not doc:
+        return TotalExpiredTicketsResponse(
+            generated_at=None,
+            total_expired_tickets=total,
+            open_status_ids=EXPIRED_TICKETS_DEFAULT_STATUS,
+        )
+
+    generated_at = doc.get("generated_at")
+    if isinstance(generated_at, str):
+        try:
+            doc["generated_at"] = datetime.fromisoformat(generated_at)
+        except ValueError:
+            doc["generated_at"] = None
+
+    doc.pop("_id", None)
+
+    return TotalExpiredTicketsResponse(
+        generated_at=doc.get("generated_at"),
+        total_expired_tickets=total,
+        open_status_ids=list(doc.get("open_status_ids", EXPIRED_TICKETS_DEFAULT_STATUS)),
+    )
+
+
+async def get_critical_projects(
+    db: AsyncIOMotorDatabase,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bucket: str = "raw",
+) -> List[dict]:
+    filters: dict[str, dict[str, datetime]] = {}
+
+    if start or end:
+        parsed_start = parse_iso(start) if start else None
+        parsed_end = parse_iso(end) if end else None
+
+        if parsed_start and parsed_end and parsed_start > parsed_end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start must be before or equal to end",
+            )
+
+        generated_range: dict[str, datetime] = {}
+        if parsed_start:
+            generated_range["$gte"] = parsed_start
+        if parsed_end:
+            generated_range["$lte"] = parsed_end
+        filters["generated_at"] = generated_range
+
+    collection = db[CRITICAL_PROJECTS_BUCKETS[bucket]]
+    documents: List[dict] = []
+
+    if filters:
+        cursor = collection.find(filters).sort("generated_at", -1)
+        documents = await cursor.to_list(length=None)
+
+        if not documents:
+            return []
+    else:
+        document = await collection.find_one(sort=[("generated_at", -1)])
+
+        if not document:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No critical project data found")
+
+        documents = [document]
+
+    for doc in documents:
+        doc["id"] = str(doc.pop("_id"))
+
+    return documents
+
+
+def _expired_tickets_filter(company_id: Optional[int], now: datetime) -> dict:
+    # Vencidos: prazo (deadline, gravado pela ETL) antes de agora; usa o índice em deadline
+    filter_query: dict[str, Any] = {"deadline": {"$lt": now}}
+    if company_id is not None:
+        filter_query["compania_id"] = company_id
+    return filter_query
+
+
+def _normalize_created_at(docs: List[dict]) -> List[dict]:
+    # data_criacao gravada como string ISO vira datetime; inválida, None (como o ExpiredTicketItem recebia)
+    for doc in docs:
+        value = doc.get("data_criacao")
+        if isinstance(value, str):
+            try:
+                doc["data_criacao"] = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                doc["data_criacao"] = None
+    return docs
+
+
+def _expired_tickets_pipeline(company_id: Optional[int], now: datetime) -> List[dict]:
+    """
+    Vencidos do mais atrasado ao menos atrasado, com o atraso calculado na
+    leitura: $dateDiff conta as viradas de minuto, como o DATEDIFF da ETL.
+    """
+    return [
+        {"$match": _expired_tickets_filter(company_id, now)},
+        {"$sort": {"deadline": 1, "ticket_id": 1}},
+        {
+            "$replaceWith": {
+                "tempo_vencido_minutos": {"$dateDiff": {"startDate": "$deadline", "endDate": now, "unit": "minute"}},
+                **{field: f"${field}" for field in EXPIRED_TICKETS_EXPORT_FIELDS[1:]},
+            }
+        },
+    ]
+
+
+async def get_expired_tickets_list(
+    db: AsyncIOMotorDatabase,
+    limit: int = 50,
+    offset: int = 0,
+    company_id: Optional[int] = None,
+) -> dict:
+    collection = db[EXPIRED_TICKETS_LIST_COLLECTION]
+    # O mesmo instante no total e nos itens
+    now = datetime.now(tz=timezone.utc)
+
+    # Conta o total de documentos
+    total = await collection.count_documents(_expired_tickets_filter(company_id, now))
+
+    # Busca os documentos com paginação (antes do $replaceWith, só percorre a página pedida)
+    pipeline = _expired_tickets_pipeline(company_id, now)
+    pipeline[2:2] = [{"$skip": offset}, {"$limit": limit}]
+    docs = await collection.aggregate(pipeline).to_list(length=limit)
+
+    # Documentos já estão no formato de ExpiredTicketItem ($replaceWith): sem revalidação
+    return {
+        "items": _normalize_created_at(docs),
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+def _encode_ndjson(docs: List[dict]) -> bytes:
+    return b"".join(dumps(doc) + b"\n" for doc in docs)
+
+
+def _encode_csv(docs: List[dict]) -> bytes:
+    buffer = io.StringIO()
+    # Datas em ISO 8601, como no NDJSON
+    rows = ({k: v.isoformat() if isinstance(v, datetime) else v for k, v in doc.items()} for doc in docs)
+    csv.DictWriter(buffer, fieldnames=EXPIRED_TICKETS_EXPORT_FIELDS, extrasaction="ignore").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def export_expired_tickets(
+    db: AsyncIOMotorDatabase,
+    export_format: str = "ndjson",
+    company_id: Optional[int] = None,
+    compress: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Percorre a collection inteira em lotes de `batch_size` documentos, emitindo
+    um bloco NDJSON/CSV (opcionalmente gzip) por lote: a memória do servidor
+    fica limitada ao tamanho do lote, independente do total exportado.
+    """
+    encode = _encode_csv if export_format == "csv" else _encode_ndjson
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(chunk: bytes) -> bytes:
+        return compressor.compress(chunk) if compressor else chunk
+
+    if export_format == "csv":
+        # BOM para que planilhas reconheçam UTF-8 (acentos em "Não", nomes de empresas)
+        yield emit(("\ufeff" + ",".join(EXPIRED_TICKETS_EXPORT_FIELDS) + "\r\n").encode("utf-8"))
+
+    collection = db[EXPIRED_TICKETS_LIST_COLLECTION]
+    now = datetime.now(tz=timezone.utc)
+    cursor = collection.aggregate(_expired_tickets_pipeline(company_id, now), batchSize=batch_size)
+
+    batch: List[dict] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield emit(encode(_normalize_created_at(batch)))
+            batch = []
+    if batch:
+        yield emit(encode(_normalize_created_at(batch)))
+
+    if compressor:
+        yield compressor.flush()
+
+
+async def get_companies(db: AsyncIOMotorDatabase) -> dict:
+    collection = db[COMPANIES_COLLECTION]
+    cursor = collection.find({}, COMPANIES_PROJECTION).sort("name", 1)
+    docs = await cursor.to_list(length=None)
+
+    return {"companies": docs}
+
+
+OVERVIEW_WIDGETS = (
+    "tickets_evolution",
+    "categories",
+    "critical_projects",
+    "total_expired_tickets",
+    "expired_tickets_list",
+    "companies",
+)
+
+
+async def _run_widget(coro: Awaitable[Any], timeout: float) -> tuple[Any, Optional[str]]:
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout), None
+    except TimeoutError:
+        return None, "timeout"
+    except HTTPException as exc:
+        return None, str(exc.detail)
+    except Exception as exc:
+        return None, type(exc).__name__
+
+
+async def get_overview(widgets: Dict[str, Callable[[], Awaitable[Any]]], timeout: float) -> dict:
+    """
+    Executa os widgets concorrentemente; um widget lento ou com erro vira
+    uma entrada em `errors` sem bloquear os demais.
+    """
+    names = list(widgets)
+    results = await asyncio.gather(*(_run_widget(widgets[name](), timeout) for name in names))
+
+    overview: dict[str, Any] = dict.fromkeys(OVERVIEW_WIDGETS)
+    overview["errors"] = {}
+    for name, (value, error) in zip(names, results):
+        overview[name] = value
+        if error is not None:
+            overview["errors"][name] = error
+
+    return overview
@@ -0,0 +1,126 @@
+"""
+Execuções da ETL em etapas retomáveis.
+
+O progresso de cada pipeline fica em Mongo (etl_checkpoints): a etapa atual
+(extract -> load -> swap) e os offsets já gravados. A extração e a carga
+escrevem em coleções de staging com _id determinístico (upsert idempotente),
+e a coleção publicada só é trocada no fim, com um rename atômico. Uma
+execução que falha no meio deixa a coleção publicada intacta, e a próxima
+continua da etapa e do offset salvos em vez de recomeçar.
+"""
+
+import uuid
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from pymongo import ReplaceOne
+from pymongo.database import Database
+
+from .databases import mongo
+from .sink import WriteReport, write
+
+CHECKPOINTS_COLLECTION = "etl_checkpoints"
+
+
+def staging_collection(name: str) -> str:
+    return f"{name}_staging"
+
+
+@dataclass
+class Checkpoint:
+    name: str
+    run_id: str
+    key: dict  # parâmetros da execução; checkpoint com outra chave é descartado
+    stage: str = "extract"
+    state: dict = field(default_factory=dict)  # offsets e dados das etapas
+    resumed: bool = False
+    db: Database = field(default_factory=mongo, repr=False)
+
+    @classmethod
+    def resume(cls, name: str, key: dict, db: Optional[Database] = None) -> "Checkpoint":
+        """
+        Retoma o checkpoint salvo de `name` se ele for da mesma execução
+        (mesma chave); senão começa uma nova, da extração.
+        """
+        db = mongo() if db is None else db
+        doc = db[CHECKPOINTS_COLLECTION].find_one({"_id": name})
+        if doc and doc.get("key") == key:
+            return cls(name, doc["run_id"], key, doc["stage"], doc.get("state", {}), resumed=True, db=db)
+        checkpoint = cls(name, uuid.uuid4().hex, key, db=db)
+        checkpoint.save()
+        return checkpoint
+
+    def save(self, stage: str | None = None, **state: Any) -> None:
+        if stage is not None:
+            self.stage = stage
+        self.state.update(state)
+        self.db[CHECKPOINTS_COLLECTION].replace_one(
+            {"_id": self.name},
+            {
+                "run_id": self.run_id,
+                "key": self.key,
+                "stage": self.stage,
+                "state": self.state,
+                "updated_at": datetime.now(tz=timezone.utc),
+            },
+            upsert=True,
+        )
+
+    def clear(self) -> None:
+        self.db[CHECKPOINTS_COLLECTION].delete_one({"_id": self.name, "run_id": self.run_id})
+
+
+def write_batches(
+    checkpoint: Checkpoint,
+    collection: str,
+    docs: Iterable[dict],
+    offset_field: str,
+    batch_size: Optional[int] = None,
+    key: Optional[Callable[[dict], Any]] = None,
+) -> WriteReport:
+    """
+    Upsert por _id dos documentos em lotes (pelo sink, com write concern
+    relaxado: é staging), salvando no checkpoint quantos já foram gravados.
+
+    Sem `key`, os primeiros `state[offset_field]` (gravados por uma execução
+    anterior) são pulados: a origem tem que repetir os mesmos documentos na
+    mesma ordem, como uma staging já gravada. Com `key`, nada é pulado aqui;
+    o checkpoint guarda também a chave do último documento confirmado
+    (`state[offset_field + "_key"]`), e a origem, ordenada pela chave,
+    recomeça depois dela.
+    """
+    done = checkpoint.state.get(offset_field, 0)
+    submitted: deque[tuple[int, Any]] = deque()  # (posição, chave) dos documentos ainda não confirmados
+
+    def upserts() -> Iterator[ReplaceOne]:
+        for position, doc in enumerate(docs, start=1):
+            if key is None and position <= done:
+                continue
+            if key is not None:
+                submitted.append((position, key(doc)))
+            yield ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+
+    def acknowledge(written: int) -> None:
+        if key is None:
+            checkpoint.save(**{offset_field: done + written})
+            return
+        while submitted[0][0] < written:
+            submitted.popleft()
+        checkpoint.save(**{offset_field: done + written, f"{offset_field}_key": submitted.popleft()[1]})
+
+    report = write(checkpoint.db[collection], upserts(), batch_size, rebuildable=True, on_batch=acknowledge)
+    if not report.batches:
+        checkpoint.save(**{offset_field: done})
+    return report
+
+
+def swap(db: Database, staging: str, target: str) -> None:
+    """
+    Publica a coleção de staging no lugar da coleção alvo (rename atômico,
+    sem janela com a coleção vazia). Sem staging (swap já feito), não faz nada.
+    """
+    if db.list_collection_names(filter={"name": staging}):
+        db[staging].rename(target, dropTarget=True)
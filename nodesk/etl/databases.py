@@ -1,12 +1,29 @@
-from sqlalchemy import create_engine
+"""
+Origem (SQL Server) e destino (MongoDB) da ETL, criados no primeiro uso.
+
+Importar os pipelines não abre conexões nem exige o driver ODBC. Os
+pipelines recebem a origem (engine) e o destino (db) que usam como
+parâmetros opcionais e só caem nestas conexões quando não os recebem;
+benchmarks e testes passam SQLite e um MongoDB local no lugar.
+"""
+
+from functools import cache
+
 from pymongo import MongoClient
+from pymongo.database import Database
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 
 from .settings import Settings
 
 settings = Settings()
 
 
-sqlserver = create_engine(settings.SQLALCHEMY_DATABASE_URI, echo=settings.SQLALCHEMY_ECHO)
-mongo = MongoClient(settings.MONGO_URI)[settings.MONGO_DB]
+@cache
+def sqlserver() -> Engine:
+    return create_engine(settings.SQLALCHEMY_DATABASE_URI, echo=settings.SQLALCHEMY_ECHO)
+
 
-print(settings.MONGO_URI)
+@cache
+def mongo() -> Database:
+    return MongoClient(settings.MONGO_URI)[settings.MONGO_DB]
@@ -0,0 +1,137 @@
+"""
+Extração incremental por watermark (high-water mark).
+
+Cada fonte guarda em Mongo (etl_watermarks) o maior valor já visto da sua
+coluna de mudança — um timestamp (CreatedAt, ClosedAt, ChangedAt) ou um
+rowversion do SQL Server. A execução seguinte só lê as linhas a partir dele e
+faz upsert por chave natural com bulk_write: o custo acompanha o volume de
+mudanças, não o tamanho da tabela. Sem watermark (primeira execução), a
+carga é completa. Fontes sem coluna de mudança confiável (edições e exclusões
+não mexem nela) precisam de uma reconciliação periódica (full=True): carga
+completa que também remove da coleção as chaves que sumiram da origem. As
+escritas passam pelo sink (lotes concorrentes, write concern relaxado): a
+coleção é reconstruível a partir do SQL Server.
+"""
+
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+from sqlalchemy import Select, true
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement
+
+from .databases import mongo, sqlserver
+from .settings import Settings
+from .sink import WriteReport, write
+
+settings = Settings()
+
+WATERMARKS_COLLECTION = "etl_watermarks"
+
+
+@dataclass(frozen=True)
+class IncrementalSource:
+    name: str  # id do watermark
+    collection: str  # collection de destino
+    key: tuple[str, ...]  # chave natural nos documentos
+    query: Callable[[Optional[Any]], Select]  # recebe o watermark (None = carga completa)
+    document: Callable[[Row], dict]
+    watermark_column: str = "changed_at"  # coluna do resultado com o valor de mudança da linha
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    rows: int
+    batches: int
+    watermark: Optional[Any]
+    report: WriteReport
+    deleted: int = 0
+
+
+def changed_since(column: ColumnElement, watermark: Optional[Any], inclusive: bool = True) -> ColumnElement[bool]:
+    """
+    Filtro incremental. Timestamps usam >=: linhas gravadas depois com o mesmo
+    instante do watermark não se perdem (o upsert é idempotente). Para
+    rowversion, estritamente crescente, use inclusive=False.
+    """
+    if watermark is None:
+        return true()
+    return column >= watermark if inclusive else column > watermark
+
+
+def read_watermark(db: Database, name: str) -> Optional[Any]:
+    doc = db[WATERMARKS_COLLECTION].find_one({"_id": name})
+    return doc["value"] if doc else None
+
+
+def save_watermark(db: Database, name: str, value: Any) -> None:
+    db[WATERMARKS_COLLECTION].update_one(
+        {"_id": name},
+        {"$set": {"value": value, "updated_at": datetime.now(tz=timezone.utc)}},
+        upsert=True,
+    )
+
+
+def _upserts(source: IncrementalSource, rows: Iterable[Row], seen: set[tuple]) -> Iterator[UpdateOne]:
+    for row in rows:
+        doc = source.document(row)
+        seen.add(tuple(doc[field] for field in source.key))
+        yield UpdateOne({field: doc[field] for field in source.key}, {"$set": doc}, upsert=True)
+
+
+def sync(
+    source: IncrementalSource,
+    engine: Optional[Engine] = None,
+    db: Optional[Database] = None,
+    batch_size: Optional[int] = None,
+    full: bool = False,
+) -> SyncResult:
+    """
+    Lê as linhas alteradas desde o watermark em lotes (ETL_WRITE_BATCH_SIZE
+    por padrão) e faz upsert de cada lote. O watermark só avança depois que
+    todos os lotes foram gravados: uma execução interrompida repete as mesmas
+    linhas na próxima.
+
+    full=True ignora o watermark, lê tudo e, depois dos upserts, remove os
+    documentos cuja chave não veio da origem.
+    """
+    batch_size = batch_size or settings.ETL_WRITE_BATCH_SIZE
+    engine = sqlserver() if engine is None else engine
+    db = mongo() if db is None else db
+    watermark = None if full else read_watermark(db, source.name)
+    collection = db[source.collection]
+    collection.create_index([(field, 1) for field in source.key], unique=True)
+
+    high = watermark
+    seen: set[tuple] = set()
+
+    def changed_rows(result) -> Iterator[Row]:
+        nonlocal high
+        for row in result:
+            value = getattr(row, source.watermark_column)
+            if value is not None and (high is None or value > high):
+                high = value
+            yield row
+
+    with Session(engine) as session:
+        result = session.execute(source.query(watermark), execution_options={"yield_per": batch_size})
+        report = write(collection, _upserts(source, changed_rows(result), seen), batch_size, rebuildable=True)
+
+    deleted = 0
+    if full:
+        missing: dict[str, Any]
+        if len(source.key) == 1:
+            (field,) = source.key
+            missing = {field: {"$nin": [key for (key,) in seen]}}
+        else:
+            missing = {"$nor": [dict(zip(source.key, key)) for key in seen]} if seen else {}
+        deleted = collection.delete_many(missing).deleted_count
+
+    if high is not None and high != watermark:
+        save_watermark(db, source.name, high)
+    return SyncResult(rows=report.documents, batches=report.batches, watermark=high, report=report, deleted=deleted)
@@ -0,0 +1,129 @@
+"""
+Conjunto de trabalho dos tickets abertos, extraído uma vez por execução da ETL.
+
+critical_projects e expired_tickets (total e lista de vencidos) liam Tickets
+cada um com seus joins (SLA_Plans, Products, Companies, Users). Aqui a leitura
+é única, em colunas NumPy, e cada pipeline deriva sua saída em memória.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .databases import sqlserver
+from .models import Company, Product, SLAPlan, Ticket, User
+from .sql import db_now, db_utcnow
+
+OPEN_STATUS_IDS = (1, 2, 3)  # 1=Aberto, 2=Em Atendimento, 3=Aguardando Cliente
+NO_PRODUCT = -1  # ticket sem produto
+
+
+@dataclass(frozen=True)
+class OpenTickets:
+    """
+    Uma linha por ticket aberto; nomes de produto e empresa ficam em dicionários por id.
+    """
+
+    now: datetime  # relógio do SQL Server no momento da extração (GETDATE())
+    utc_now: datetime  # o mesmo instante em UTC (GETUTCDATE())
+    ticket_id: np.ndarray  # int64
+    title: list[str]
+    created_at: np.ndarray  # datetime64[us], NaT quando nulo
+    resolution_mins: np.ndarray  # float64, NaN quando o plano não define
+    product_id: np.ndarray  # int64, NO_PRODUCT quando nulo
+    company_id: np.ndarray  # int64
+    user_vip: np.ndarray  # bool
+    product_names: dict[int, str]
+    company_names: dict[int, str]
+
+    def __len__(self) -> int:
+        return len(self.ticket_id)
+
+    def top_products(self, limit: int) -> list[tuple[int, str, int]]:
+        """
+        (product_id, nome, abertos) dos produtos com mais tickets abertos.
+        """
+        counts = Counter(int(pid) for pid in self.product_id[self.product_id != NO_PRODUCT])
+        return [(pid, self.product_names[pid], count) for pid, count in counts.most_common(limit)]
+
+    @property
+    def utc_offset(self) -> timedelta:
+        """
+        Fuso do SQL Server: as datas do banco (CreatedAt, GETDATE()) são locais.
+        """
+        return timedelta(minutes=round((self.now - self.utc_now).total_seconds() / 60))
+
+    def deadlines(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Índices dos tickets com prazo de resolução (CreatedAt + ResolutionMins)
+        e o prazo de cada um, no horário do SQL Server.
+        """
+        index = np.flatnonzero(~np.isnat(self.created_at) & ~np.isnan(self.resolution_mins))
+        deadline = self.created_at[index] + self.resolution_mins[index].astype(np.int64).astype("timedelta64[m]")
+        return index, deadline
+
+    def expired(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Índices dos tickets com SLA de resolução vencido, do mais atrasado ao
+        menos atrasado, e o atraso de cada um em minutos.
+
+        O atraso segue DATEDIFF(minute, deadline, GETDATE()): conta as viradas
+        de minuto entre o deadline e agora.
+        """
+        index, deadline = self.deadlines()
+        now = np.datetime64(self.now, "us")
+        late = deadline < now
+        index = index[late]
+        overdue = (now.astype("datetime64[m]") - deadline[late].astype("datetime64[m]")).astype(np.int64)
+
+        order = np.argsort(-overdue, kind="stable")
+        return index[order], overdue[order]
+
+
+def extract_open_tickets(engine: Optional[Engine] = None) -> OpenTickets:
+    """
+    Lê os tickets abertos com as colunas que os pipelines usam, numa única consulta.
+    """
+    engine = sqlserver() if engine is None else engine
+    with Session(engine) as session:
+        now, utc_now = session.execute(select(db_now(), db_utcnow())).one()
+        stmt = (
+            select(
+                Ticket.ticket_id,
+                Ticket.title,
+                Ticket.created_at,
+                SLAPlan.resolution_mins,
+                # Do join: ticket sem produto (ou com produto inexistente) fica com NULL
+                Product.product_id,
+                Product.name.label("product_name"),
+                Ticket.company_id,
+                Company.name.label("company_name"),
+                User.is_vip,
+            )
+            .join(SLAPlan, SLAPlan.sla_plan_id == Ticket.sla_plan_id)
+            .join(Company, Company.company_id == Ticket.company_id)
+            .join(User, User.user_id == Ticket.created_by_user_id)
+            .outerjoin(Product, Product.product_id == Ticket.product_id)
+            .where(Ticket.current_status_id.in_(OPEN_STATUS_IDS))
+        )
+        rows = session.execute(stmt).all()
+
+    return OpenTickets(
+        now=now,
+        utc_now=utc_now,
+        ticket_id=np.array([row.ticket_id for row in rows], dtype=np.int64),
+        title=[row.title for row in rows],
+        created_at=np.array([row.created_at for row in rows], dtype="datetime64[us]"),
+        resolution_mins=np.array([row.resolution_mins for row in rows], dtype=np.float64),
+        product_id=np.array([NO_PRODUCT if row.product_id is None else row.product_id for row in rows], dtype=np.int64),
+        company_id=np.array([row.company_id for row in rows], dtype=np.int64),
+        user_vip=np.array([bool(row.is_vip) for row in rows], dtype=bool),
+        product_names={row.product_id: row.product_name for row in rows if row.product_id is not None},
+        company_names={row.company_id: row.company_name for row in rows},
+    )
@@ -0,0 +1,93 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from pymongo.database import Database
+
+from nodesk.kpi.forecast import WEEKLY_FREQ, fit_series
+from nodesk.kpi.tickets import weekly_counts_by
+
+from ..databases import mongo
+from ..settings import Settings
+
+settings = Settings()
+
+COLLECTION_NAME = "category_forecasts"
+LEVELS = ("category", "subcategory")
+MIN_WEEKS = 8  # séries mais curtas não têm histórico para o Prophet
+
+
+def _series(path: Path) -> list[tuple[str, str, np.ndarray, np.ndarray]]:
+    """
+    (nível, nome, semanas, contagens) de cada categoria/subcategoria, a partir do snapshot colunar.
+    """
+    series = []
+    for level in LEVELS:
+        ds, counts = weekly_counts_by(path, level, freq=WEEKLY_FREQ)
+        for name, y in counts.items():
+            # A série começa na primeira semana com ticket
+            start = int(np.argmax(y > 0))
+            if len(y) - start >= MIN_WEEKS:
+                series.append((level, name, ds[start:], y[start:]))
+    return series
+
+
+def _previous_params(db: Database) -> dict[tuple[str, str], dict]:
+    doc = db[COLLECTION_NAME].find_one(
+        {}, {"series.level": 1, "series.name": 1, "series.params": 1}, sort=[("generated_at", -1)]
+    )
+    if not doc:
+        return {}
+    return {(item["level"], item["name"]): item["params"] for item in doc["series"] if item.get("params")}
+
+
+def run(periods: int = 1, db: Optional[Database] = None, path: Optional[Path] = None) -> str:
+    """
+    Previsão da próxima semana por categoria e subcategoria, um Prophet por série.
+
+    As séries são ajustadas em paralelo num pool de processos, partindo dos
+    parâmetros da execução anterior (warm-start). O tempo de ajuste de cada
+    série fica registrado no documento.
+    """
+    started = time.perf_counter()
+    db = mongo() if db is None else db
+    series = _series(Path(settings.TICKETS_SNAPSHOT_PATH) if path is None else path)
+    previous = _previous_params(db)
+
+    results = []
+    # spawn: o processo da ETL já tem clientes de banco abertos
+    with ProcessPoolExecutor(
+        max_workers=settings.FORECAST_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = [
+            (level, name, len(y), pool.submit(fit_series, ds, y, periods, WEEKLY_FREQ, previous.get((level, name))))
+            for level, name, ds, y in series
+        ]
+        for level, name, weeks, future in futures:
+            try:
+                results.append({"level": level, "name": name, "weeks": weeks, **future.result()})
+            except Exception as exc:
+                results.append({"level": level, "name": name, "weeks": weeks, "error": repr(exc)})
+
+    fitted = [item for item in results if "error" not in item]
+    doc = {
+        "generated_at": datetime.now(tz=timezone.utc),
+        "freq": WEEKLY_FREQ,
+        "periods": periods,
+        "workers": settings.FORECAST_WORKERS,
+        "wall_seconds": time.perf_counter() - started,
+        "fit_seconds": sum(item["fit_seconds"] for item in fitted),
+        "warm_started": sum(item["warm_start"] for item in fitted),
+        "series": results,
+    }
+    collection = db[COLLECTION_NAME]
+    collection.create_index([("generated_at", -1)])
+    collection.insert_one(doc)
+    return (
+        f"Inserted {len(fitted)}/{len(results)} series forecasts into {settings.MONGO_DB}.{COLLECTION_NAME} "
+        f"in {doc['wall_seconds']:.1f}s"
+    )
@@ -1,7 +1,10 @@
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from ..databases import mongo, sqlserver
+from pymongo.database import Database
+from sqlalchemy import or_, select
+from sqlalchemy.engine import Engine
+
+from ..incremental import IncrementalSource, changed_since, sync
 from ..models import Company
 from ..settings import Settings
 
@@ -10,40 +13,54 @@ settings = Settings()
 COLLECTION_NAME = "companies"
 
 
-def run() -> str:
+def _query(watermark):
+    # Sem CreatedAt a empresa nunca passaria do watermark: é relida a cada execução
+    changed = changed_since(Company.created_at, watermark)
+    return select(
+        Company.company_id,
+        Company.name,
+        Company.cnpj,
+        Company.created_at.label("changed_at"),
+    ).where(changed if watermark is None else or_(changed, Company.created_at.is_(None)))
+
+
+COMPANIES = IncrementalSource(
+    name=COLLECTION_NAME,
+    collection=COLLECTION_NAME,
+    key=("company_id",),
+    query=_query,
+    document=lambda row: {
+        "company_id": int(row.company_id),
+        "name": row.name,
+        "cnpj": row.cnpj,
+    },
+)
+
+
+def run(engine: Optional[Engine] = None, db: Optional[Database] = None) -> str:
     """
-    ETL pipeline para extrair lista de empresas do SQL Server e carregar no MongoDB.
+    ETL pipeline para sincronizar a lista de empresas do SQL Server no MongoDB.
+
+    Incremental: só as empresas criadas desde a última execução (CreatedAt),
+    mais as sem CreatedAt, são lidas e gravadas (upsert por company_id).
+    Companies não tem coluna de alteração: edições de nome/CNPJ e exclusões
+    só chegam pela reconciliação (reconcile).
     """
     print("🚀 Iniciando ETL de Companies...")
+    result = sync(COMPANIES, engine, db)
+    print("✅ Pipeline concluída com sucesso!")
+    return f"Upserted {result.rows} companies into {settings.MONGO_DB}.{COLLECTION_NAME} ({result.report})"
 
-    # Extract
-    print("📥 Extraindo dados do SQL Server...")
-    with Session(sqlserver) as session:
-        stmt = select(
-            Company.company_id,
-            Company.name,
-            Company.cnpj,
-        )
-        results = session.execute(stmt).all()
-
-    # Transform
-    print("🔄 Transformando dados...")
-    documents = []
-    for row in results:
-        doc = {
-            "company_id": int(row.company_id),
-            "name": row.name,
-            "cnpj": row.cnpj,
-        }
-        documents.append(doc)
-
-    # Load
-    print("📤 Carregando dados no MongoDB...")
-    collection = mongo[COLLECTION_NAME]
-    collection.delete_many({})
-
-    if documents:
-        collection.insert_many(documents)
 
+def reconcile(engine: Optional[Engine] = None, db: Optional[Database] = None) -> str:
+    """
+    Recarga completa das empresas: regrava todas (pega edições de nome e
+    CNPJ) e remove do MongoDB as que não existem mais no SQL Server.
+    """
+    print("🚀 Reconciliando Companies...")
+    result = sync(COMPANIES, engine, db, full=True)
     print("✅ Pipeline concluída com sucesso!")
-    return f"Inserted {len(documents)} companies into {settings.MONGO_DB}.{COLLECTION_NAME}"
+    return (
+        f"Reconciled {result.rows} companies into {settings.MONGO_DB}.{COLLECTION_NAME}, "
+        f"deleted {result.deleted} ({result.report})"
+    )
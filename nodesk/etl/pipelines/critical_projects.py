@@ -1,35 +1,20 @@
 from datetime import datetime, timezone
+from typing import Optional
 
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session
+from pymongo.database import Database
+from sqlalchemy.engine import Engine
 
-from ..databases import mongo, sqlserver
-from ..models import Product, Ticket
+from ..databases import mongo
+from ..open_tickets import OPEN_STATUS_IDS, OpenTickets, extract_open_tickets
 from ..settings import Settings
 
 settings = Settings()
 
-OPEN_STATUS_IDS = (1, 2, 3)  # 1=Aberto, 2=Em Atendimento, 3=Aguardando Cliente
 
-
-def run(limit: int = 10) -> str:
-    with Session(sqlserver) as session:
-        stmt = (
-            select(
-                Ticket.product_id,
-                Product.name,
-                func.count(Ticket.ticket_id).label("open_count"),
-            )
-            .join(Product, Product.product_id == Ticket.product_id)
-            .where(Ticket.current_status_id.in_(OPEN_STATUS_IDS))
-            .group_by(Ticket.product_id, Product.name)
-            .order_by(func.count(Ticket.ticket_id).desc())
-            .limit(limit)
-        )
-        rows = session.execute(stmt).all()
-
-    doc = {
-        "generated_at": datetime.now(tz=timezone.utc).isoformat(),
+def snapshot_document(open_tickets: OpenTickets, limit: int = 10) -> dict:
+    rows = open_tickets.top_products(limit)
+    return {
+        "generated_at": datetime.now(tz=timezone.utc),
         "limit": limit,
         "open_status_ids": list(OPEN_STATUS_IDS),
         "rows": [
@@ -41,5 +26,16 @@ def run(limit: int = 10) -> str:
             for (pid, pname, count) in rows
         ],
     }
-    mongo["critical_projects"].insert_one(doc)
+
+
+def run(
+    limit: int = 10,
+    open_tickets: Optional[OpenTickets] = None,
+    engine: Optional[Engine] = None,
+    db: Optional[Database] = None,
+) -> str:
+    if open_tickets is None:
+        open_tickets = extract_open_tickets(engine)
+    db = mongo() if db is None else db
+    db["critical_projects"].insert_one(snapshot_document(open_tickets, limit))
     return f"Inserted snapshot into {settings.MONGO_DB}.critical_projects"
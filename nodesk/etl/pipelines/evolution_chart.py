@@ -1,24 +1,46 @@
 import datetime
+import numpy as np
 import pandas as pd
 from datetime import timedelta
-from collections import Counter
+from collections.abc import Iterable
+from typing import Optional
 
+from pymongo.database import Database
+from sqlalchemy import case, func, literal, select, true, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import CompileError, NotSupportedError, ProgrammingError
+
+from nodesk.dashboard.evolution import DOCUMENTS_COLLECTION, SERIES_COLLECTION, pack_series
+
+from ..checkpoints import Checkpoint, staging_collection, swap, write_batches
 from ..databases import mongo, sqlserver
+from ..models import Category, Subcategory, Ticket, TicketStatusHistory
+from ..settings import Settings
+from ..sql import add_days, to_date
+
+settings = Settings()
+
+OPEN_STATUS_IDS = (1, 2, 3)  # Aberto, Em Atendimento, Aguardando Cliente
+CLOSED_STATUS_IDS = (4, 5)  # Resolvido, Fechado
+
+CHECKPOINT_NAME = "evolution_chart"
+EXTRACT_STAGING = staging_collection("evolution_chart_extract")
+BATCH_SIZE = 5000
 
 
-def extract_sqlserver_for_evolution_chart():
+def extract_sqlserver_for_evolution_chart(engine: Optional[Engine] = None):
     """
     Extrai dados do SQL Server usando SQLAlchemy para evitar warnings do pandas.
     Retorna o df da primeira data e df dos tickets (histórico completo).
     """
+    engine = sqlserver() if engine is None else engine
 
     # Query para pegar a primeira data
     query_first_date = """
-    SELECT TOP 1 Tickets.CreatedAt AS FirstCreatedAt
-    FROM Tickets
-    ORDER BY Tickets.CreatedAt ASC;
+    SELECT MIN(Tickets.CreatedAt) AS FirstCreatedAt
+    FROM Tickets;
     """
-    df_first_date = pd.read_sql(query_first_date, sqlserver)
+    df_first_date = pd.read_sql(query_first_date, engine)
 
     # Query para pegar histórico completo de tickets
     query_tickets = """
@@ -29,7 +51,8 @@ def extract_sqlserver_for_evolution_chart():
     JOIN Categories ON Tickets.CategoryId = Categories.CategoryId
     JOIN Subcategories ON Tickets.SubcategoryId = Subcategories.SubcategoryId
     """
-    df_tickets = pd.read_sql(query_tickets, sqlserver)
+    # Dimensões já como categóricas (códigos inteiros); os nomes só voltam na carga
+    df_tickets = pd.read_sql(query_tickets, engine, dtype={"Category": "category", "Subcategories": "category"})
 
     # Debug rápido
     print("df_tickets (preview):")
@@ -44,91 +67,404 @@ def normalize_date(doc):
     return doc
 
 
-def transform_tickets(df_first_date, df_tickets):
+def _ticket_codes(df_tickets, column, tickets, n_tickets):
+    """
+    Código (categórico) da coluna por ticket e a tabela de nomes; todas as
+    linhas de um ticket têm a mesma categoria/subcategoria.
+    """
+    values = df_tickets[column].astype("category").cat
+    codes = np.zeros(n_tickets, dtype=np.int32)
+    codes[tickets] = values.codes
+    return codes, list(values.categories)
+
+
+def _events_by_day(days, tickets, mask, start_date, n_days):
+    """
+    Tickets de cada evento agrupados por dia (offset a partir de start_date):
+    retorna os tickets ordenados por dia e os limites de cada dia.
+    """
+    offsets = (days[mask] - np.datetime64(start_date, "D")).astype(np.int64)
+    in_range = (offsets >= 0) & (offsets < n_days)
+    offsets, event_tickets = offsets[in_range], tickets[mask][in_range]
+    order = np.argsort(offsets, kind="stable")
+    bounds = np.searchsorted(offsets[order], np.arange(n_days + 1))
+    return event_tickets[order], bounds
+
+
+def open_counts_by_code(df_first_date, df_tickets, end_date: Optional[datetime.date] = None):
+    """
+    Contagem diária de tickets abertos por código de categoria/subcategoria.
+
+    Os tickets viram posições (0..n-1) e as dimensões, códigos inteiros; o
+    estado aberto/fechado fica num array de bool e as contagens são
+    atualizadas só para os tickets que mudam de estado no dia. Retorna
+    (dias, contagens por categoria [dia x código], nomes das categorias,
+    contagens por subcategoria, nomes das subcategorias).
+    """
     start_date = pd.to_datetime(df_first_date.iloc[0, 0]).date()
-    end_date = pd.Timestamp.today().date()
+    end_date = end_date or pd.Timestamp.today().date()
+    n_days = (end_date - start_date).days + 1
+    days = [start_date + timedelta(days=offset) for offset in range(max(n_days, 0))]
+    if n_days <= 0 or df_tickets.empty:
+        return days, np.zeros((len(days), 0), np.int32), [], np.zeros((len(days), 0), np.int32), []
+
+    tickets, _ = pd.factorize(df_tickets["TicketId"])
+    n_tickets = tickets.max() + 1
+    category_codes, categories = _ticket_codes(df_tickets, "Category", tickets, n_tickets)
+    subcategory_codes, subcategories = _ticket_codes(df_tickets, "Subcategories", tickets, n_tickets)
+
+    created = pd.to_datetime(df_tickets["CreatedAt"]).to_numpy().astype("datetime64[D]")
+    changed = pd.to_datetime(df_tickets["ChangedAt"]).to_numpy().astype("datetime64[D]")
+    to_status = df_tickets["ToStatusId"].to_numpy(dtype=np.float64, na_value=np.nan)
+    changed_valid = ~np.isnat(changed)
+
+    # Abre: criado no dia ou mudou para status aberto; fecha: mudou para resolvido/fechado
+    created_tickets, created_bounds = _events_by_day(created, tickets, ~np.isnat(created), start_date, n_days)
+    reopened_tickets, reopened_bounds = _events_by_day(
+        changed, tickets, changed_valid & np.isin(to_status, OPEN_STATUS_IDS), start_date, n_days
+    )
+    closed_tickets, closed_bounds = _events_by_day(
+        changed, tickets, changed_valid & np.isin(to_status, CLOSED_STATUS_IDS), start_date, n_days
+    )
+
+    is_open = np.zeros(n_tickets, dtype=bool)
+    category_open = np.zeros(len(categories), dtype=np.int32)
+    subcategory_open = np.zeros(len(subcategories), dtype=np.int32)
+    category_counts = np.empty((n_days, len(categories)), dtype=np.int32)
+    subcategory_counts = np.empty((n_days, len(subcategories)), dtype=np.int32)
+
+    for day in range(n_days):
+        # Aberturas antes dos fechamentos do mesmo dia
+        opened = np.concatenate(
+            (
+                created_tickets[created_bounds[day] : created_bounds[day + 1]],
+                reopened_tickets[reopened_bounds[day] : reopened_bounds[day + 1]],
+            )
+        )
+        opened = np.unique(opened[~is_open[opened]])
+        is_open[opened] = True
+        category_open += np.bincount(category_codes[opened], minlength=len(categories)).astype(np.int32)
+        subcategory_open += np.bincount(subcategory_codes[opened], minlength=len(subcategories)).astype(np.int32)
 
-    # PARA TESTES
-    # start_date = pd.Timestamp("2025-09-04").date()
-    # end_date = start_date + timedelta(days=2)
+        closed = closed_tickets[closed_bounds[day] : closed_bounds[day + 1]]
+        closed = np.unique(closed[is_open[closed]])
+        is_open[closed] = False
+        category_open -= np.bincount(category_codes[closed], minlength=len(categories)).astype(np.int32)
+        subcategory_open -= np.bincount(subcategory_codes[closed], minlength=len(subcategories)).astype(np.int32)
 
-    open_tickets = {}  # dict: {TicketId: {"TicketId": ..., "Categoria": ..., "Subcategoria": ...}}
-    evolution = []
+        category_counts[day] = category_open
+        subcategory_counts[day] = subcategory_open
 
-    current_date = start_date
+    return days, category_counts, categories, subcategory_counts, subcategories
 
-    while current_date <= end_date:
-        print("current_date", current_date, "\n")
-        current_date_ts = pd.Timestamp(current_date)
-
-        # Tickets criados hoje
-        created_today = df_tickets[pd.to_datetime(df_tickets["CreatedAt"]).dt.normalize() == current_date_ts]
-
-        # Tickets que mudaram para status aberto, em atendimento, aguardando cliente hoje
-        changed_today = df_tickets[
-            (pd.to_datetime(df_tickets["ChangedAt"]).dt.normalize() == current_date_ts)
-            & (df_tickets["ToStatusId"].isin([1, 2, 3]))
-        ]
-
-        # Todos os tickets que devem ser adicionados
-        to_add = pd.concat([created_today, changed_today])
-
-        for _, row in to_add.iterrows():
-            open_tickets[row["TicketId"]] = {
-                "TicketId": row["TicketId"],
-                "Categoria": row["Category"],
-                "Subcategoria": row["Subcategories"],
+
+def decode_counts(days, category_counts, categories, subcategory_counts, subcategories):
+    """
+    Códigos -> documentos diários com os nomes (só contagens > 0), no momento da carga.
+    """
+    evolution = []
+    for day, category_row, subcategory_row in zip(days, category_counts, subcategory_counts):
+        evolution.append(
+            {
+                "date": normalize_date(day),
+                "categories_count": {
+                    categories[code]: int(category_row[code]) for code in np.flatnonzero(category_row)
+                },
+                "subcategories_count": {
+                    subcategories[code]: int(subcategory_row[code]) for code in np.flatnonzero(subcategory_row)
+                },
             }
+        )
+    return evolution
+
 
-        # Tickets fechados hoje
-        closed_today = df_tickets[
-            (pd.to_datetime(df_tickets["ChangedAt"]).dt.normalize() == current_date_ts)
-            & (df_tickets["ToStatusId"].isin([4, 5]))
-        ]
+def transform_tickets(df_first_date, df_tickets, end_date: Optional[datetime.date] = None):
+    return decode_counts(*open_counts_by_code(df_first_date, df_tickets, end_date))
+
+
+def daily_open_counts_query(end_date: datetime.date, after: Optional[tuple[datetime.date, str, str]] = None):
+    """
+    Tickets abertos por dia, categoria e subcategoria, calculados no banco.
+
+    Mesma regra de transform_tickets: o ticket abre na criação ou ao entrar em
+    um status aberto, e fecha ao entrar em Resolvido/Fechado (no mesmo dia, o
+    fechamento vence). Cada estado vira um intervalo (LEAD até o próximo
+    evento do ticket), cada intervalo aberto vira +1/-1 por série, e a soma
+    acumulada (janela) sobre o calendário dá a contagem de cada dia. Só voltam
+    as linhas com contagem > 0, ordenadas por (dia, nível, nome); com `after`,
+    só as que vêm depois dessa chave.
+    """
+    created = select(
+        Ticket.ticket_id.label("ticket_id"),
+        to_date(Ticket.created_at).label("day"),
+        literal(1).label("is_open"),
+    ).where(Ticket.created_at.is_not(None))
+    changed = select(
+        TicketStatusHistory.ticket_id,
+        to_date(TicketStatusHistory.changed_at),
+        case((TicketStatusHistory.to_status_id.in_(OPEN_STATUS_IDS), 1), else_=0),
+    ).where(
+        TicketStatusHistory.changed_at.is_not(None),
+        TicketStatusHistory.to_status_id.in_(OPEN_STATUS_IDS + CLOSED_STATUS_IDS),
+    )
+    events = union_all(created, changed).cte("events")
+
+    # Estado do ticket no fim de cada dia com evento
+    states = (
+        select(events.c.ticket_id, events.c.day, func.min(events.c.is_open).label("is_open"))
+        .group_by(events.c.ticket_id, events.c.day)
+        .cte("states")
+    )
+    intervals = select(
+        states.c.ticket_id,
+        states.c.day.label("start_day"),
+        func.lead(states.c.day, type_=states.c.day.type)
+        .over(partition_by=states.c.ticket_id, order_by=states.c.day)
+        .label("end_day"),
+        states.c.is_open,
+    ).cte("intervals")
+
+    # Intervalos abertos com as séries do ticket (join interno com Subcategories, como no caminho pandas)
+    open_spans = (
+        select(
+            Category.name.label("category"),
+            Subcategory.name.label("subcategory"),
+            intervals.c.start_day,
+            intervals.c.end_day,
+        )
+        .join(Ticket, Ticket.ticket_id == intervals.c.ticket_id)
+        .join(Category, Category.category_id == Ticket.category_id)
+        .join(Subcategory, Subcategory.subcategory_id == Ticket.subcategory_id)
+        .where(intervals.c.is_open == 1, intervals.c.start_day <= end_date)
+        .cte("open_spans")
+    )
+    deltas = union_all(
+        *(
+            select(
+                literal(level).label("level"),
+                open_spans.c[level].label("name"),
+                day.label("day"),
+                literal(delta).label("delta"),
+            ).where(day.is_not(None))
+            for level in ("category", "subcategory")
+            for day, delta in ((open_spans.c.start_day, 1), (open_spans.c.end_day, -1))
+        )
+    ).cte("deltas")
+    daily = (
+        select(deltas.c.level, deltas.c.name, deltas.c.day, func.sum(deltas.c.delta).label("delta"))
+        .group_by(deltas.c.level, deltas.c.name, deltas.c.day)
+        .cte("daily")
+    )
+    series = select(daily.c.level, daily.c.name).distinct().cte("series")
+
+    calendar = select(func.min(to_date(Ticket.created_at)).label("day")).cte("calendar", recursive=True)
+    calendar = calendar.union_all(select(add_days(calendar.c.day, 1)).where(calendar.c.day < end_date))
+
+    counts = (
+        select(
+            calendar.c.day,
+            series.c.level,
+            series.c.name,
+            func.sum(func.coalesce(daily.c.delta, 0))
+            .over(partition_by=(series.c.level, series.c.name), order_by=calendar.c.day, rows=(None, 0))
+            .label("open_count"),
+        )
+        .select_from(calendar.join(series, true()))
+        .outerjoin(
+            daily,
+            (daily.c.day == calendar.c.day) & (daily.c.level == series.c.level) & (daily.c.name == series.c.name),
+        )
+        .subquery("counts")
+    )
+    query = select(counts).where(counts.c.open_count > 0)
+    if after is not None:
+        # Depois da chave na ordem do ORDER BY (o SQL Server não compara tuplas)
+        day, level, name = after
+        query = query.where(
+            (counts.c.day > day)
+            | (counts.c.day == day) & ((counts.c.level > level) | (counts.c.level == level) & (counts.c.name > name))
+        )
+    return query.order_by(counts.c.day, counts.c.level, counts.c.name).with_statement_hint(
+        "OPTION (MAXRECURSION 0)", dialect_name="mssql"
+    )
 
-        for _, row in closed_today.iterrows():
-            open_tickets.pop(row["TicketId"], None)  # remove se existir
 
-        # Contagem de categorias e subcategorias
-        categories_count = Counter([t["Categoria"] for t in open_tickets.values()])
-        subcategories_count = Counter([t["Subcategoria"] for t in open_tickets.values()])
+def evolution_from_rows(start_date: datetime.date, end_date: datetime.date, rows):
+    """
+    Linhas (dia, nível, nome, abertos) -> um documento por dia do calendário
+    (de start_date até end_date), no formato de transform_tickets.
+    """
+    by_day: dict[datetime.date, dict[str, dict[str, int]]] = {}
+    for day, level, name, open_count in rows:
+        counts = by_day.setdefault(day, {"category": {}, "subcategory": {}})
+        counts[level][name] = open_count
 
-        # Salvar a evolução do dia
-        date_to_bson = normalize_date(current_date)
+    evolution = []
+    current_date = start_date
+    while current_date <= end_date:
+        counts = by_day.get(current_date, {"category": {}, "subcategory": {}})
         evolution.append(
             {
-                "date": date_to_bson,
-                "categories_count": dict(categories_count),
-                "subcategories_count": dict(subcategories_count),
-                # "tickets": list(open_tickets.values())
+                "date": normalize_date(current_date),
+                "categories_count": counts["category"],
+                "subcategories_count": counts["subcategory"],
             }
         )
-
-        # Próximo dia
         current_date += timedelta(days=1)
-
     return evolution
 
 
-def load_evolution_to_mongo(evolution, collection_name):
-    collection = mongo[collection_name]
-    collection.delete_many({})
-    collection.insert_many(evolution)
+def extract_daily_open_counts(engine: Optional[Engine] = None, end_date: Optional[datetime.date] = None):
+    """
+    Evolução diária já agregada no banco: um documento por dia do calendário
+    (da primeira criação até end_date), no formato de transform_tickets.
+    """
+    end_date = end_date or pd.Timestamp.today().date()
+    with (sqlserver() if engine is None else engine).connect() as conn:
+        start_date = conn.execute(select(func.min(to_date(Ticket.created_at)))).scalar()
+        rows = conn.execute(daily_open_counts_query(end_date)).all()
+    if start_date is None:
+        return []
+    return evolution_from_rows(start_date, end_date, rows)
+
 
+def _staged_row(day, level, name, open_count):
+    return {
+        "_id": f"{day.isoformat()}|{level}|{name}",
+        "day": normalize_date(day),
+        "level": level,
+        "name": name,
+        "open_count": int(open_count),
+    }
 
-def evolution_chart_pipeline():
-    print("🚀 Iniciando ETL do Evolution Chart...")
 
-    # Extract
+def _count_rows(evolution):
+    # Documentos diários (caminho pandas) -> linhas (dia, nível, nome, abertos), na ordem da chave
+    for doc in evolution:
+        for level, field in (("category", "categories_count"), ("subcategory", "subcategories_count")):
+            for name, count in sorted(doc[field].items()):
+                yield doc["date"].date(), level, name, count
+
+
+def _staged_key(doc) -> list:
+    return [doc["day"], doc["level"], doc["name"]]
+
+
+def extract_to_staging(checkpoint: Checkpoint, end_date: datetime.date, engine: Optional[Engine] = None):
+    """
+    Extract: contagens diárias (dia, nível, nome) gravadas em lotes na staging,
+    com o offset e a chave da última linha gravada no checkpoint. Agregação no
+    SQL Server por padrão; pandas como fallback quando o servidor não aceita a
+    consulta (recomeça a staging). As linhas saem ordenadas pela chave, e uma
+    execução retomada continua depois dela: a consulta é refeita ao vivo, e
+    linhas novas ou removidas antes da chave deslocariam um offset posicional.
+    Erros de conexão sobem, e a próxima execução retoma do checkpoint.
+    """
+    db = checkpoint.db
+    engine = sqlserver() if engine is None else engine
+    saved = checkpoint.state.get("extracted_key")
+    if settings.EVOLUTION_EXTRACTION == "sql":
+        print("📥 Agregando evolução diária no SQL Server...")
+        after = (saved[0].date(), saved[1], saved[2]) if saved else None
+        try:
+            with engine.connect() as conn:
+                start_date = conn.execute(select(func.min(to_date(Ticket.created_at)))).scalar()
+                checkpoint.save(start_date=start_date and normalize_date(start_date))
+                query = daily_open_counts_query(end_date, after)
+                result = conn.execution_options(yield_per=BATCH_SIZE).execute(query)
+                rows = (_staged_row(*row) for row in result)
+                write_batches(checkpoint, EXTRACT_STAGING, rows, "extracted", BATCH_SIZE, key=_staged_key)
+            return
+        except (CompileError, NotSupportedError, ProgrammingError) as exc:
+            # Fallback: caminho pandas (ex.: servidor sem suporte às funções de janela)
+            print(f"⚠️ Agregação no SQL falhou ({exc.__class__.__name__}), usando pandas")
+            db.drop_collection(EXTRACT_STAGING)
+            checkpoint.save(extracted=0, extracted_key=None)
+            saved = None
+
     print("📥 Extraindo dados do SQL Server...")
-    df_first_date, df_tickets = extract_sqlserver_for_evolution_chart()
+    df_first_date, df_tickets = extract_sqlserver_for_evolution_chart(engine)
 
-    # Transform
+    # Transform (em códigos; os nomes só são decodificados para a carga)
     print("🔄 Transformando dados...")
-    evolution = transform_tickets(df_first_date, df_tickets)
+    counts = open_counts_by_code(df_first_date, df_tickets, end_date)
+    evolution = decode_counts(*counts)
+    checkpoint.save(start_date=evolution[0]["date"] if evolution else None)
+    rows = (_staged_row(*row) for row in _count_rows(evolution))
+    if saved:
+        rows = (doc for doc in rows if _staged_key(doc) > saved)
+    write_batches(checkpoint, EXTRACT_STAGING, rows, "extracted", BATCH_SIZE, key=_staged_key)
+
+
+def load_to_staging(checkpoint: Checkpoint) -> str:
+    """
+    Load: documentos no layout configurado, gravados em lotes na staging da
+    coleção alvo (offset no checkpoint). Retorna a coleção alvo.
+
+    A staging é lida na ordem de _id (dia|nível|nome): com vários nomes por
+    dia, a ordem só por dia variaria entre execuções, e com ela a ordem das
+    séries, deslocando o offset de uma carga retomada.
+    """
+    db = checkpoint.db
+    start_date = checkpoint.state.get("start_date")
+    end_date = datetime.date.fromisoformat(checkpoint.key["end_date"])
+    rows = (
+        (row["day"].date(), row["level"], row["name"], row["open_count"])
+        for row in db[EXTRACT_STAGING].find({}, sort=[("_id", 1)])
+    )
+    evolution = evolution_from_rows(start_date.date(), end_date, rows) if start_date else []
+
+    target_docs: Iterable[dict]
+    target_index: str | list[tuple[str, int]]
+    if checkpoint.key["layout"] == "series":
+        target, target_docs, target_index = (
+            SERIES_COLLECTION,
+            pack_series(evolution),
+            [("level", 1), ("start", 1), ("end", 1)],
+        )
+    else:
+        target, target_docs, target_index = (
+            DOCUMENTS_COLLECTION,
+            ({"_id": doc["date"], **doc} for doc in evolution),
+            "date",
+        )
+
+    # O índice também cria a staging: sem documentos, o swap publica a coleção vazia
+    db[staging_collection(target)].create_index(target_index)
+    report = write_batches(checkpoint, staging_collection(target), target_docs, "loaded", BATCH_SIZE)
+    print(f"💾 {report}")
+    return target
+
+
+def evolution_chart_pipeline(
+    db: Optional[Database] = None, engine: Optional[Engine] = None, end_date: Optional[datetime.date] = None
+):
+    print("🚀 Iniciando ETL do Evolution Chart...")
 
-    # Load
-    print("📤 Carregando dados no MongoDB...")
-    load_evolution_to_mongo(evolution, collection_name="tickets_evolution")
+    db = mongo() if db is None else db
+    end_date = end_date or pd.Timestamp.today().date()
+    checkpoint = Checkpoint.resume(
+        CHECKPOINT_NAME, {"end_date": end_date.isoformat(), "layout": settings.TICKETS_EVOLUTION_LAYOUT}, db
+    )
+    if checkpoint.resumed:
+        print(f"↩️ Retomando a execução {checkpoint.run_id} na etapa {checkpoint.stage}")
+    else:
+        # Restos de uma execução abandonada (outro dia ou outro layout)
+        for name in (EXTRACT_STAGING, staging_collection(DOCUMENTS_COLLECTION), staging_collection(SERIES_COLLECTION)):
+            db.drop_collection(name)
+
+    if checkpoint.stage == "extract":
+        extract_to_staging(checkpoint, end_date, engine)
+        checkpoint.save("load")
+
+    target = DOCUMENTS_COLLECTION if checkpoint.key["layout"] == "documents" else SERIES_COLLECTION
+    if checkpoint.stage == "load":
+        print("📤 Carregando dados no MongoDB...")
+        target = load_to_staging(checkpoint)
+        checkpoint.save("swap")
+
+    swap(db, staging_collection(target), target)
+    db.drop_collection(EXTRACT_STAGING)
+    checkpoint.clear()
 
     print("✅ Pipeline concluída com sucesso!")
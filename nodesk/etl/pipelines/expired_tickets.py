@@ -1,40 +1,100 @@
 from datetime import datetime, timezone
+from typing import Optional
 
-from sqlalchemy import func, literal_column, select
-from sqlalchemy.orm import Session
+from pymongo import ASCENDING, DeleteMany, UpdateOne
+from pymongo.database import Database
+from sqlalchemy.engine import Engine
 
-from ..databases import mongo, sqlserver
-from ..models import SLAPlan, Ticket
+from ..databases import mongo
+from ..open_tickets import OPEN_STATUS_IDS, OpenTickets, extract_open_tickets
 from ..settings import Settings
+from ..sink import write
 
 settings = Settings()
 
-OPEN_STATUS_IDS = (1, 2, 3)  # 1=Aberto, 2=Em Atendimento, 3=Aguardando Cliente
 COLLECTION_NAME = "expired_tickets_totals"
+LIST_COLLECTION_NAME = "expired_tickets_list"
 
 
-def run() -> str:
-    with Session(sqlserver) as session:
-        deadline = func.DATEADD(literal_column("minute"), SLAPlan.resolution_mins, Ticket.created_at)
+def deadline_documents(open_tickets: OpenTickets) -> dict[int, dict]:
+    """
+    Um documento por ticket aberto com prazo de resolução, por ticket_id.
 
-        stmt = (
-            select(func.count(Ticket.ticket_id))
-            .join(SLAPlan, SLAPlan.sla_plan_id == Ticket.sla_plan_id)
-            .where(
-                Ticket.current_status_id.in_(OPEN_STATUS_IDS),
-                Ticket.created_at.isnot(None),
-                SLAPlan.resolution_mins.isnot(None),
-                deadline < func.GETDATE(),
-            )
-        )
+    O deadline vai em UTC (comparado com o relógio da API); o atraso
+    (tempo_vencido_minutos) é calculado na leitura.
+    """
+    index, deadlines = open_tickets.deadlines()
+    offset = open_tickets.utc_offset
 
-        total_expired = session.execute(stmt).scalar_one()
+    documents = {}
+    # Precisão de milissegundos, a mesma do BSON: o deadline lido de volta compara igual
+    for i, deadline in zip(index.tolist(), deadlines.astype("datetime64[ms]").tolist()):
+        ticket_id = int(open_tickets.ticket_id[i])
+        company_id = int(open_tickets.company_id[i])
+        documents[ticket_id] = {
+            "ticket_id": ticket_id,
+            "deadline": deadline - offset,
+            "data_criacao": open_tickets.created_at[i].item().isoformat(),
+            "titulo": open_tickets.title[i],
+            "compania_id": company_id,
+            "compania_nome": open_tickets.company_names[company_id],
+            # IsVIP como texto
+            "user_vip": "Sim" if open_tickets.user_vip[i] else "Não",
+        }
+    return documents
 
-    doc = {
-        "generated_at": datetime.now(tz=timezone.utc).isoformat(),
+
+def totals_document(open_tickets: OpenTickets) -> dict:
+    index, _ = open_tickets.expired()
+    return {
+        "generated_at": datetime.now(tz=timezone.utc),
         "open_status_ids": list(OPEN_STATUS_IDS),
-        "total_expired_tickets": int(total_expired),
+        "total_expired_tickets": len(index),
     }
-    mongo[COLLECTION_NAME].insert_one(doc)
 
-    return f"Inserted snapshot into {settings.MONGO_DB}.{COLLECTION_NAME}"
+
+def run(
+    open_tickets: Optional[OpenTickets] = None, engine: Optional[Engine] = None, db: Optional[Database] = None
+) -> str:
+    """
+    Total de vencidos (snapshot histórico) e a lista de prazos dos tickets abertos.
+
+    A lista não é reconstruída: só entram os tickets que abriram ou mudaram
+    (prazo, título, empresa, VIP) e saem os que deixaram os status abertos
+    desde a última execução.
+    """
+    if open_tickets is None:
+        open_tickets = extract_open_tickets(engine)
+    db = mongo() if db is None else db
+    documents = deadline_documents(open_tickets)
+
+    collection = db[LIST_COLLECTION_NAME]
+    collection.create_index("ticket_id", unique=True)
+    collection.create_index([("deadline", ASCENDING), ("ticket_id", ASCENDING)])
+    collection.create_index([("compania_id", ASCENDING), ("deadline", ASCENDING), ("ticket_id", ASCENDING)])
+
+    # Documentos gravados, com os mesmos campos de deadline_documents
+    stored = {doc["ticket_id"]: doc for doc in collection.find({"ticket_id": {"$exists": True}}, {"_id": 0})}
+    upserts = (
+        UpdateOne({"ticket_id": ticket_id}, {"$set": doc}, upsert=True)
+        for ticket_id, doc in documents.items()
+        if stored.get(ticket_id) != doc
+    )
+    report = write(collection, upserts)
+    closed = [ticket_id for ticket_id in stored if ticket_id not in documents]
+    collection.bulk_write(
+        [
+            DeleteMany({"ticket_id": {"$in": closed}}),
+            # Documentos do formato antigo (atraso congelado, sem ticket_id)
+            DeleteMany({"ticket_id": {"$exists": False}}),
+        ],
+        ordered=False,
+    )
+
+    db[COLLECTION_NAME].insert_one(totals_document(open_tickets))
+
+    return (
+        f"Inserted snapshot into {settings.MONGO_DB}.{COLLECTION_NAME}; "
+        f"upserted {report.documents} and removed {len(closed)} tickets in {settings.MONGO_DB}.{LIST_COLLECTION_NAME} "
+        f"({report.docs_per_sec:,.0f} docs/s)"
+    )
@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo.database import Database
+
+from nodesk.kpi.forecast import (
+    FORECASTS_COLLECTION,
+    WEEKLY_FREQ,
+    WEEKLY_LAST_DATE,
+    forecast,
+    load_model,
+    model_fingerprint,
+)
+
+from ..databases import mongo
+from ..settings import Settings
+
+settings = Settings()
+
+
+def run(periods: int = 12, db: Optional[Database] = None) -> str:
+    """
+    Pré-calcula a previsão das próximas `periods` semanas para o KPI 3, que passa a ser apenas uma leitura.
+    """
+    model = load_model()
+    rows = forecast(model, periods, WEEKLY_FREQ, WEEKLY_LAST_DATE)
+
+    doc = {
+        "generated_at": datetime.now(tz=timezone.utc),
+        "model_fingerprint": model_fingerprint(),
+        "freq": WEEKLY_FREQ,
+        "last_date": WEEKLY_LAST_DATE,
+        "periods": periods,
+        "rows": [
+            {
+                "ds": row["ds"].to_pydatetime(),
+                "yhat": int(row["yhat"]),
+                "yhat_lower": int(row["yhat_lower"]),
+                "yhat_upper": int(row["yhat_upper"]),
+            }
+            for row in rows
+        ],
+    }
+    collection = (mongo() if db is None else db)[FORECASTS_COLLECTION]
+    collection.create_index([("model_fingerprint", 1), ("freq", 1), ("last_date", 1), ("generated_at", -1)])
+    collection.insert_one(doc)
+    return f"Inserted {periods}-week forecast into {settings.MONGO_DB}.{FORECASTS_COLLECTION}"
@@ -0,0 +1,193 @@
+import statistics
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo.database import Database
+from sqlalchemy import Float, Integer, Select, and_, case, cast, func, literal_column, or_, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from nodesk.kpi.forecast import FORECASTS_COLLECTION, WEEKLY_FREQ, WEEKLY_LAST_DATE
+
+from ..databases import mongo, sqlserver
+from ..models import SLAPlan, Ticket, TicketStatusHistory
+from ..settings import Settings
+from ..sql import add_days_to_datetime, days_between, db_now, minutes_between
+
+settings = Settings()
+
+COLLECTION_NAME = "kpi_snapshots"
+RESOLVED_STATUS_IDS = (4, 5)  # 4=Resolvido, 5=Fechado
+HISTORY_WEEKS = 12  # semanas anteriores usadas nos limites (percentis)
+
+
+def _percentile_limits(history: list[float]) -> tuple[Optional[float], Optional[float]]:
+    """
+    P10/P90 do histórico semanal; sem histórico suficiente não há limites.
+    """
+    if len(history) < 2:
+        return None, None
+    deciles = statistics.quantiles(history, n=10, method="inclusive")
+    return deciles[0], deciles[-1]
+
+
+def _format_count(value: Optional[float]) -> Optional[str]:
+    return None if value is None else str(round(value))
+
+
+def _format_minutes(value: Optional[float]) -> Optional[str]:
+    # Formato H:MM usado no card (horas podem passar de 24, ex.: 72:00)
+    if value is None:
+        return None
+    hours, minutes = divmod(round(value), 60)
+    return f"{hours}:{minutes:02d}"
+
+
+def _format_percent(value: Optional[float]) -> Optional[str]:
+    return None if value is None else f"{round(value)}%"
+
+
+def _card(
+    kpi_id: str,
+    title: str,
+    weekly: dict[int, float],
+    fmt: Callable[[Optional[float]], Optional[str]],
+    default: Optional[float] = None,
+) -> dict:
+    # Semana 0 = últimos 7 dias; 1..HISTORY_WEEKS = histórico
+    history = [weekly[week] for week in range(1, HISTORY_WEEKS + 1) if week in weekly]
+    bottom, top = _percentile_limits(history)
+    return {
+        "kpi_id": kpi_id,
+        "titulo_metrica": title,
+        "valor_metrica": fmt(weekly.get(0, default)),
+        "top_limit": fmt(top),
+        "bottom_limit": fmt(bottom),
+        "relation": False,
+    }
+
+
+def _resolution_stats_query() -> Select:
+    """
+    Por semana: tickets resolvidos, tempo médio de resolução (min) e quantos dentro do SLA.
+    """
+    now = db_now()
+    window_start = add_days_to_datetime(now, -7 * (HISTORY_WEEKS + 1))
+
+    # Primeira transição para um status de resolução dentro da janela
+    resolved = (
+        select(
+            TicketStatusHistory.ticket_id.label("ticket_id"),
+            func.min(TicketStatusHistory.changed_at).label("resolved_at"),
+        )
+        .where(
+            TicketStatusHistory.to_status_id.in_(RESOLVED_STATUS_IDS),
+            TicketStatusHistory.changed_at >= window_start,
+        )
+        .group_by(TicketStatusHistory.ticket_id)
+        .cte("resolved")
+    )
+
+    # Divisor literal: repetida no GROUP BY, a expressão com parâmetro (DATEDIFF(...) / ?) não
+    # casaria com a do SELECT no SQL Server (erro 8120), cada ? é um parâmetro distinto
+    week = days_between(resolved.c.resolved_at, now) // literal_column("7", Integer)
+    minutes = minutes_between(Ticket.created_at, resolved.c.resolved_at)
+    within_sla = case((minutes <= SLAPlan.resolution_mins, 1), else_=0)
+
+    stmt = (
+        select(
+            week,
+            func.count(),
+            func.avg(cast(minutes, Float)),
+            func.sum(within_sla),
+        )
+        .select_from(resolved)
+        .join(Ticket, Ticket.ticket_id == resolved.c.ticket_id)
+        .join(SLAPlan, SLAPlan.sla_plan_id == Ticket.sla_plan_id)
+        .where(Ticket.created_at.isnot(None))
+        .group_by(week)
+    )
+    return stmt
+
+
+def _resolution_stats(session: Session) -> list[tuple[int, int, Optional[float], int]]:
+    return list(session.execute(_resolution_stats_query()).tuples())
+
+
+def _open_tickets(session: Session) -> list[tuple[int, int]]:
+    """
+    Por semana: tickets abertos no fim da semana (criados até o corte e não fechados até ele).
+    """
+    # Semanas 0..HISTORY_WEEKS como SELECT ... UNION ALL (VALUES com nomes de coluna não existe no SQLite)
+    weeks = union_all(*(select(literal_column(str(n), Integer).label("n")) for n in range(HISTORY_WEEKS + 1))).subquery(
+        "weeks"
+    )
+    cutoff = add_days_to_datetime(db_now(), weeks.c.n * -7)
+
+    stmt = (
+        select(weeks.c.n, func.count(Ticket.ticket_id))
+        .select_from(weeks)
+        .outerjoin(
+            Ticket,
+            and_(
+                Ticket.created_at <= cutoff,
+                or_(Ticket.closed_at.is_(None), Ticket.closed_at > cutoff),
+            ),
+        )
+        .group_by(weeks.c.n)
+    )
+    return list(session.execute(stmt).tuples())
+
+
+def _forecast_card(db: Database) -> Optional[dict]:
+    # Embute a previsão mais recente (gerada antes por kpi_forecast) para o KPI 3 sair da mesma leitura
+    doc = db[FORECASTS_COLLECTION].find_one(
+        {"freq": WEEKLY_FREQ, "last_date": WEEKLY_LAST_DATE}, sort=[("generated_at", -1)]
+    )
+    if not doc or not doc.get("rows"):
+        return None
+    row = doc["rows"][0]
+    return {
+        "kpi_id": "3",
+        "titulo_metrica": "Previsão de chamados na próxima semana",
+        "valor_metrica": str(row["yhat"]),
+        "top_limit": str(row["yhat_upper"]),
+        "bottom_limit": str(row["yhat_lower"]),
+        "relation": False,
+        "model_fingerprint": doc["model_fingerprint"],
+    }
+
+
+def run(engine: Optional[Engine] = None, db: Optional[Database] = None) -> str:
+    db = mongo() if db is None else db
+    with Session(sqlserver() if engine is None else engine) as session:
+        resolution_rows = _resolution_stats(session)
+        open_rows = _open_tickets(session)
+
+    resolved = {int(week): float(count) for week, count, _, _ in resolution_rows}
+    avg_minutes = {int(week): float(avg) for week, _, avg, _ in resolution_rows if avg is not None}
+    sla_pct = {int(week): 100.0 * float(within) / count for week, count, _, within in resolution_rows if count}
+    open_tickets = {int(week): float(count) for week, count in open_rows}
+
+    cards = [
+        _card("1", "Tickets Resolvidos", resolved, _format_count, default=0),
+        _card("2", "Tempo médio de atendimento", avg_minutes, _format_minutes),
+        _card("4", "Tickets Abertos", open_tickets, _format_count, default=0),
+        _card("5", "Tickets resolvidos dentro do SLA", sla_pct, _format_percent),
+    ]
+    forecast_card = _forecast_card(db)
+    if forecast_card:
+        cards.insert(2, forecast_card)
+
+    doc = {
+        "generated_at": datetime.now(tz=timezone.utc),
+        "window_days": 7,
+        "history_weeks": HISTORY_WEEKS,
+        "resolved_status_ids": list(RESOLVED_STATUS_IDS),
+        "cards": cards,
+    }
+    collection = db[COLLECTION_NAME]
+    collection.create_index([("generated_at", -1)])
+    collection.insert_one(doc)
+    return f"Inserted snapshot into {settings.MONGO_DB}.{COLLECTION_NAME}"
@@ -1,21 +1,43 @@
+from collections.abc import Callable
+from typing import Any
+
+from ..open_tickets import extract_open_tickets
 from .critical_projects import run as run_critical_projects
 from .evolution_chart import evolution_chart_pipeline
 from .expired_tickets import run as run_expired_tickets
-from .expired_tickets_list import run as run_expired_tickets_list
-from .companies import run as run_companies
+from .companies import reconcile as reconcile_companies
+from .category_forecast import run as run_category_forecast
+from .kpi_forecast import run as run_kpi_forecast
+from .kpi_snapshots import run as run_kpi_snapshots
+from .snapshot_retention import run as run_snapshot_retention
+from .tickets_snapshot import run as run_tickets_snapshot
 
-PIPELINES = [
+PIPELINES: list[Callable[..., Any]] = [
     run_critical_projects,
     evolution_chart_pipeline,
-    run_expired_tickets,
-    run_expired_tickets_list,
-    run_companies,
+    run_expired_tickets,  # total e lista de vencidos
+    reconcile_companies,  # carga completa: pega edições e exclusões de empresas
+    run_kpi_forecast,
+    run_kpi_snapshots,  # depois de run_kpi_forecast: embute a previsão no snapshot
+    run_tickets_snapshot,
+    run_category_forecast,  # depois de run_tickets_snapshot: lê o snapshot colunar
+    run_snapshot_retention,
 ]
 
 
+# Derivam a saída do conjunto de tickets abertos, lido uma vez por execução
+OPEN_TICKETS_PIPELINES: set[Callable[..., Any]] = {run_critical_projects, run_expired_tickets}
+
+
 def run_all() -> None:
+    open_tickets = extract_open_tickets()
+    print(f"Extracted {len(open_tickets)} open tickets")
+
     for pipeline in PIPELINES:
-        result = pipeline()
+        if pipeline in OPEN_TICKETS_PIPELINES:
+            result = pipeline(open_tickets=open_tickets)
+        else:
+            result = pipeline()
         print(result)
 
 
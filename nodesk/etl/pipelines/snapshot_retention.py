@@ -0,0 +1,101 @@
+from datetime import timedelta
+from typing import Optional
+
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+from ..databases import mongo
+from ..settings import Settings
+
+settings = Settings()
+
+# Coleções de snapshots (um documento por execução) compactadas em rollups
+SNAPSHOT_COLLECTIONS = ("critical_projects", "expired_tickets_totals")
+TTL_INDEX_NAME = "generated_at_ttl"
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def rollup_collection(name: str, unit: str) -> str:
+    return f"{name}_{'hourly' if unit == 'hour' else 'daily'}"
+
+
+def _ensure_ttl(collection: Collection, days: int) -> None:
+    """
+    Índice TTL em generated_at; se a retenção mudou, ajusta o índice existente (collMod).
+    """
+    seconds = int(timedelta(days=days).total_seconds())
+    try:
+        collection.create_index("generated_at", name=TTL_INDEX_NAME, expireAfterSeconds=seconds)
+    except OperationFailure as exc:
+        if exc.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        collection.database.command(
+            "collMod", collection.name, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": seconds}
+        )
+
+
+def _normalize_generated_at(collection: Collection) -> int:
+    """
+    Snapshots antigos gravavam generated_at como string ISO; o TTL e os
+    rollups precisam de data BSON.
+    """
+    result = collection.update_many(
+        {"generated_at": {"$type": "string"}},
+        [{"$set": {"generated_at": {"$dateFromString": {"dateString": "$generated_at"}}}}],
+    )
+    return result.modified_count
+
+
+def compact(source: Collection, target: Collection, unit: str) -> None:
+    """
+    Um documento por hora/dia em `target`: o último snapshot do intervalo
+    (mesmo formato do original) com _id = início do intervalo, o nível
+    (`bucket`) e quantos snapshots de origem ele resume (`samples`).
+
+    Recalcula a partir do último intervalo já compactado (que pode ter ficado
+    incompleto), então cada execução só lê o que é novo.
+    """
+    last: Optional[dict] = target.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    match = {"generated_at": {"$gte": last["_id"]}} if last else {"generated_at": {"$type": "date"}}
+
+    source.aggregate(
+        [
+            {"$match": match},
+            {"$sort": {"generated_at": 1}},
+            {
+                "$group": {
+                    "_id": {"$dateTrunc": {"date": "$generated_at", "unit": unit}},
+                    "last": {"$last": "$$ROOT"},
+                    "samples": {"$sum": {"$ifNull": ["$samples", 1]}},
+                }
+            },
+            {"$replaceWith": {"$mergeObjects": ["$last", {"_id": "$_id", "bucket": unit, "samples": "$samples"}]}},
+            {"$merge": {"into": target.name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ]
+    )
+
+
+def run(db: Optional[Database] = None) -> str:
+    """
+    Retenção dos snapshots: resolução total por SNAPSHOT_RAW_RETENTION_DAYS,
+    rollups por hora por SNAPSHOT_HOURLY_RETENTION_DAYS e por dia por
+    SNAPSHOT_DAILY_RETENTION_DAYS. A remoção é feita pelos índices TTL do
+    MongoDB; este job cria os rollups antes que os snapshots expirem.
+    """
+    db = mongo() if db is None else db
+    normalized = 0
+    for name in SNAPSHOT_COLLECTIONS:
+        raw = db[name]
+        hourly = db[rollup_collection(name, "hour")]
+        daily = db[rollup_collection(name, "day")]
+
+        normalized += _normalize_generated_at(raw)
+        compact(raw, hourly, "hour")
+        compact(hourly, daily, "day")
+
+        _ensure_ttl(raw, settings.SNAPSHOT_RAW_RETENTION_DAYS)
+        _ensure_ttl(hourly, settings.SNAPSHOT_HOURLY_RETENTION_DAYS)
+        _ensure_ttl(daily, settings.SNAPSHOT_DAILY_RETENTION_DAYS)
+
+    return f"Compacted {', '.join(SNAPSHOT_COLLECTIONS)} into hourly/daily rollups ({normalized} dates normalized)"
@@ -0,0 +1,50 @@
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from nodesk.kpi.tickets import CATEGORY_COLUMNS, ID_COLUMNS, TIMESTAMP_COLUMNS, write_tickets
+
+from ..databases import sqlserver
+from ..models import Category, Priority, Status, Subcategory, Ticket
+from ..settings import Settings
+
+settings = Settings()
+
+
+def run(engine: Optional[Engine] = None, path: Optional[Path] = None) -> str:
+    """
+    Exporta as colunas de fato dos tickets para o snapshot colunar (Arrow IPC) lido pelo KPI.
+    """
+    with Session(sqlserver() if engine is None else engine) as session:
+        stmt = (
+            select(
+                Ticket.ticket_id,
+                Ticket.company_id,
+                Ticket.product_id,
+                Ticket.sla_plan_id,
+                Category.name.label("category"),
+                Subcategory.name.label("subcategory"),
+                Priority.name.label("priority"),
+                Status.name.label("status"),
+                Ticket.channel,
+                Ticket.created_at,
+                Ticket.first_response_at,
+                Ticket.closed_at,
+            )
+            .join(Category, Category.category_id == Ticket.category_id)
+            .outerjoin(Subcategory, Subcategory.subcategory_id == Ticket.subcategory_id)
+            .join(Priority, Priority.priority_id == Ticket.priority_id)
+            .join(Status, Status.status_id == Ticket.current_status_id)
+        )
+        rows = session.execute(stmt).all()
+
+    # Colunas em listas (o Arrow tipa e codifica as categorias em dicionário)
+    names = ("ticket_id", *ID_COLUMNS, *CATEGORY_COLUMNS, *TIMESTAMP_COLUMNS)
+    columns = {name: [getattr(row, name) for row in rows] for name in names}
+
+    path = Path(settings.TICKETS_SNAPSHOT_PATH) if path is None else path
+    total = write_tickets(columns, path)
+    return f"Wrote {total} tickets to {path}"
@@ -0,0 +1,292 @@
+"""
+Processo residente da ETL: executa cada job na sua agenda (intervalo ou cron).
+
+Os engines do SQL Server e do MongoDB são criados uma vez e reaproveitados
+entre execuções. Cada execução segura um lease no MongoDB (etl_locks): uma
+execução anterior ainda em andamento, ou outra réplica do scheduler, nunca
+roda o mesmo job ao mesmo tempo; se o lease se perde no meio (renovação
+falhou), o job para no próximo lote gravado pelo sink ou no próximo pipeline
+e a execução é registrada como "lease_lost". A próxima execução de cada job
+fica em etl_schedule. expired_tickets e critical_projects compartilham a
+extração dos tickets abertos enquanto ela for recente (SharedOpenTickets).
+
+Uso: python -m nodesk.etl.scheduler
+"""
+
+import os
+import signal
+import socket
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+from .databases import mongo
+from .open_tickets import OpenTickets, extract_open_tickets
+from .pipelines.category_forecast import run as run_category_forecast
+from .pipelines.companies import reconcile as reconcile_companies
+from .pipelines.companies import run as run_companies
+from .pipelines.critical_projects import run as run_critical_projects
+from .pipelines.evolution_chart import evolution_chart_pipeline
+from .pipelines.expired_tickets import run as run_expired_tickets
+from .pipelines.kpi_forecast import run as run_kpi_forecast
+from .pipelines.kpi_snapshots import run as run_kpi_snapshots
+from .pipelines.snapshot_retention import run as run_snapshot_retention
+from .pipelines.tickets_snapshot import run as run_tickets_snapshot
+from .schedules import Schedule, parse_schedule
+from .settings import Settings
+from .sink import interrupt_on
+
+settings = Settings()
+
+LOCKS_COLLECTION = "etl_locks"
+SCHEDULE_COLLECTION = "etl_schedule"
+MAX_SLEEP_SECONDS = 30.0
+
+
+class SharedOpenTickets:
+    """
+    Extração dos tickets abertos reaproveitada pelos jobs que disparam perto
+    um do outro: dentro de max_age segundos, quem chega depois (ou espera no
+    lock enquanto outro job extrai) recebe o mesmo conjunto, sem nova leitura.
+    """
+
+    def __init__(self, max_age: float, extract: Callable[[], OpenTickets] = extract_open_tickets):
+        self.max_age = max_age
+        self.extract = extract
+        self._lock = threading.Lock()
+        self._cached: Optional[tuple[float, OpenTickets]] = None
+
+    def get(self) -> OpenTickets:
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached[0] >= self.max_age:
+                self._cached = (now, self.extract())
+            return self._cached[1]
+
+
+open_tickets = SharedOpenTickets(settings.SCHEDULER_OPEN_TICKETS_MAX_AGE_SECONDS)
+
+
+def run_expired_tickets_shared() -> str:
+    return run_expired_tickets(open_tickets=open_tickets.get())
+
+
+def run_critical_projects_shared() -> str:
+    return run_critical_projects(open_tickets=open_tickets.get())
+
+
+# Job: pipelines executados em sequência e agenda padrão (sobrescrita por ETL_SCHEDULES)
+JOBS: dict[str, tuple[tuple[Callable[[], Any], ...], str]] = {
+    # Mesma extração de tickets abertos enquanto recente (SharedOpenTickets)
+    "expired_tickets": ((run_expired_tickets_shared,), "@every 1m"),
+    "critical_projects": ((run_critical_projects_shared,), "*/5 * * * *"),
+    "companies": ((run_companies,), "*/15 * * * *"),
+    # Edições e exclusões de empresas não passam pelo watermark (CreatedAt)
+    "companies_reconcile": ((reconcile_companies,), "40 3 * * *"),
+    "evolution_chart": ((evolution_chart_pipeline,), "0 * * * *"),
+    # Previsão antes do snapshot de KPI, que a embute
+    "kpi": ((run_kpi_forecast, run_kpi_snapshots), "5 * * * *"),
+    # Snapshot colunar antes da previsão por categoria, que o lê
+    "tickets_snapshot": ((run_tickets_snapshot, run_category_forecast), "30 2 * * *"),
+    # Rollups por hora/dia dos snapshots, antes que o TTL remova a resolução total
+    "snapshot_retention": ((run_snapshot_retention,), "50 * * * *"),
+}
+
+
+def utcnow() -> datetime:
+    return datetime.now(tz=timezone.utc)
+
+
+class Lease:
+    """
+    Lease de um job no MongoDB: um documento por job com dono e validade.
+    Vencido o prazo sem renovação (processo morto), outro dono pode assumir.
+    """
+
+    def __init__(self, db: Database, name: str, owner: str, seconds: float):
+        self.collection = db[LOCKS_COLLECTION]
+        self.name = name
+        self.owner = owner
+        self.seconds = seconds
+
+    def acquire(self) -> bool:
+        now = utcnow()
+        try:
+            self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {
+                    "$set": {
+                        "owner": self.owner,
+                        "acquired_at": now,
+                        "expires_at": now + timedelta(seconds=self.seconds),
+                    }
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # O documento existe e tem outro dono válido
+            return False
+        return True
+
+    def renew(self) -> bool:
+        result = self.collection.update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"expires_at": utcnow() + timedelta(seconds=self.seconds)}},
+        )
+        return result.matched_count == 1
+
+    def release(self) -> None:
+        self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+
+@dataclass
+class Job:
+    name: str
+    pipelines: Sequence[Callable[[], Any]]
+    spec: str
+    schedule: Schedule
+    next_run: datetime
+
+
+def build_jobs(overrides: Optional[dict[str, str]] = None, now: Optional[datetime] = None) -> list[Job]:
+    """
+    Jobs com a agenda efetiva; jobs de intervalo rodam logo na partida.
+    """
+    now = now or utcnow()
+    overrides = overrides or {}
+    unknown = set(overrides) - set(JOBS)
+    if unknown:
+        raise ValueError(f"Jobs desconhecidos em ETL_SCHEDULES: {sorted(unknown)}")
+
+    jobs = []
+    for name, (pipelines, default) in JOBS.items():
+        spec = overrides.get(name, default)
+        schedule = parse_schedule(spec)
+        next_run = now if spec.startswith("@every") else schedule.next_after(now)
+        jobs.append(Job(name=name, pipelines=pipelines, spec=spec, schedule=schedule, next_run=next_run))
+    return jobs
+
+
+class Scheduler:
+    def __init__(
+        self,
+        jobs: list[Job],
+        db: Optional[Database] = None,
+        workers: int = settings.SCHEDULER_WORKERS,
+        lease_seconds: float = settings.SCHEDULER_LEASE_SECONDS,
+        owner: Optional[str] = None,
+    ):
+        self.jobs = jobs
+        self.db = mongo() if db is None else db
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl-job")
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _report(self, job: Job, **fields: Any) -> None:
+        self.db[SCHEDULE_COLLECTION].update_one(
+            {"_id": job.name},
+            {"$set": {"schedule": job.spec, "next_run_at": job.next_run, **fields}},
+            upsert=True,
+        )
+
+    def _run(self, job: Job) -> None:
+        lease = Lease(self.db, job.name, self.owner, self.lease_seconds)
+        try:
+            if not lease.acquire():
+                print(f"⏭️ {job.name}: em execução em outra réplica, pulando")
+                return
+
+            # Renova o lease enquanto o job roda (a cada 1/3 do prazo); perdido, o job é interrompido
+            done, lost = threading.Event(), threading.Event()
+
+            def heartbeat() -> None:
+                while not done.wait(self.lease_seconds / 3):
+                    if not lease.renew():
+                        print(f"⚠️ {job.name}: lease perdido durante a execução, interrompendo")
+                        lost.set()
+                        return
+
+            threading.Thread(target=heartbeat, name=f"lease-{job.name}", daemon=True).start()
+            started = time.perf_counter()
+            status, results = "ok", []
+            try:
+                with interrupt_on(lost):
+                    for pipeline in job.pipelines:
+                        if lost.is_set():
+                            break
+                        results.append(str(pipeline()))
+            except Exception as exc:
+                status, results = "error", [*results, repr(exc)]
+            finally:
+                done.set()
+                lease.release()
+            if lost.is_set():
+                # Outra réplica pode ter assumido o job: o resultado desta execução não vale
+                status = "lease_lost"
+
+            seconds = time.perf_counter() - started
+            print(f"{'✅' if status == 'ok' else '❌'} {job.name} ({seconds:.1f}s): {'; '.join(results)}")
+            self._report(job, last_run_at=utcnow(), last_status=status, last_seconds=seconds, last_results=results)
+        finally:
+            with self._lock:
+                self._running.discard(job.name)
+
+    def tick(self, now: datetime) -> list[str]:
+        """
+        Dispara os jobs vencidos e agenda a próxima execução de cada um.
+        Um job ainda em execução neste processo não é disparado de novo.
+        """
+        started = []
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            job.next_run = job.schedule.next_after(now)
+            with self._lock:
+                busy = job.name in self._running
+                if not busy:
+                    self._running.add(job.name)
+            if busy:
+                print(f"⏭️ {job.name}: execução anterior ainda em andamento")
+            else:
+                self.executor.submit(self._run, job)
+                started.append(job.name)
+            print(f"🗓️ {job.name}: próxima execução em {job.next_run.isoformat()}")
+            self._report(job)
+        return started
+
+    def run_forever(self, stop: threading.Event) -> None:
+        for job in self.jobs:
+            print(f"🗓️ {job.name} ({job.spec}): próxima execução em {job.next_run.isoformat()}")
+            self._report(job)
+
+        while not stop.is_set():
+            now = utcnow()
+            self.tick(now)
+            wake = min(job.next_run for job in self.jobs)
+            stop.wait(min(max((wake - utcnow()).total_seconds(), 0.0), MAX_SLEEP_SECONDS))
+
+        # Espera os jobs em andamento terminarem e liberarem seus leases
+        self.executor.shutdown(wait=True)
+
+
+def main() -> None:
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    print("🚀 Iniciando scheduler da ETL...")
+    Scheduler(build_jobs(settings.ETL_SCHEDULES)).run_forever(stop)
+    print("👋 Scheduler encerrado")
+
+
+if __name__ == "__main__":
+    main()
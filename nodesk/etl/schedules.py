@@ -0,0 +1,112 @@
+"""
+Agendas dos jobs da ETL: intervalo fixo ("@every 30s", "@every 5m", "@every 1h")
+ou expressão cron de 5 campos ("*/15 * * * *"), avaliadas em UTC.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Union
+
+_EVERY = re.compile(r"^@every\s+(\d+)\s*([smh])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+# (mínimo, máximo) de cada campo: minuto, hora, dia do mês, mês, dia da semana (0/7 = domingo)
+_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_MAX_SEARCH = timedelta(days=5 * 366)
+
+
+@dataclass(frozen=True)
+class Interval:
+    seconds: int
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + timedelta(seconds=self.seconds)
+
+
+@dataclass(frozen=True)
+class Cron:
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]  # 0 = domingo
+    any_day: bool  # dia do mês é "*"
+    any_weekday: bool  # dia da semana é "*"
+
+    @classmethod
+    def parse(cls, expression: str) -> "Cron":
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expressão cron precisa de 5 campos: {expression!r}")
+        minutes, hours, days, months, weekdays = (
+            _parse_field(part, low, high) for part, (low, high) in zip(parts, _FIELDS)
+        )
+        return cls(
+            minutes=minutes,
+            hours=hours,
+            days=days,
+            months=months,
+            weekdays=frozenset(day % 7 for day in weekdays),
+            any_day=parts[2] == "*",
+            any_weekday=parts[4] == "*",
+        )
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        # Como no cron: com os dois campos restritos, basta um deles
+        if not self.any_day and not self.any_weekday:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        Primeiro minuto estritamente depois de `moment` que satisfaz a expressão.
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + _MAX_SEARCH
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError("Expressão cron sem próxima execução")
+
+
+Schedule = Union[Interval, Cron]
+
+
+def _parse_field(field: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for item in field.split(","):
+        base, _, step = item.partition("/")
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(value) for value in base.split("-", 1))
+        else:
+            start = end = int(base)
+            if step:
+                end = high
+        if not (low <= start <= end <= high):
+            raise ValueError(f"Campo cron fora do intervalo {low}-{high}: {item!r}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+def parse_schedule(spec: str) -> Schedule:
+    match = _EVERY.match(spec.strip())
+    if match:
+        seconds = int(match.group(1)) * _UNITS[match.group(2)]
+        if seconds <= 0:
+            raise ValueError(f"Intervalo precisa ser positivo: {spec!r}")
+        return Interval(seconds)
+    return Cron.parse(spec)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 from sqlalchemy.engine import URL
@@ -20,6 +22,38 @@ class Settings(BaseSettings):
     MONGO_URI: str = Field(default="mongodb://localhost:27017")
     MONGO_DB: str = Field(default="nodesk")
 
+    # Escrita dos loaders (nodesk.etl.sink): operações por bulk_write, lotes em voo ao mesmo tempo
+    # e write concern relaxado (w=1, sem journal) nas coleções reconstruíveis
+    ETL_WRITE_BATCH_SIZE: int = Field(default=1000, ge=1)
+    ETL_WRITE_WORKERS: int = Field(default=4, ge=1)
+    ETL_RELAXED_WRITE_CONCERN: bool = Field(default=True)
+
+    # Snapshot colunar dos tickets lido pelo KPI (mesmo caminho de KPI_TICKETS_SNAPSHOT_PATH)
+    TICKETS_SNAPSHOT_PATH: str = Field(default="analytics/tickets.arrow")
+
+    # Processos usados no ajuste das previsões por categoria/subcategoria
+    FORECAST_WORKERS: int = Field(default=4, ge=1)
+
+    # Evolução diária: agregada no SQL Server ("sql") ou no pandas ("pandas", fallback)
+    EVOLUTION_EXTRACTION: Literal["sql", "pandas"] = Field(default="sql")
+    # Layout gravado: um documento por dia ("documents") ou por série e ano com as contagens
+    # empacotadas ("series"); mesmo valor de TICKETS_EVOLUTION_LAYOUT no dashboard
+    TICKETS_EVOLUTION_LAYOUT: Literal["documents", "series"] = Field(default="documents")
+
+    # Retenção dos snapshots (critical_projects, expired_tickets_totals): resolução total,
+    # depois rollups por hora e por dia; a remoção é feita por índices TTL
+    SNAPSHOT_RAW_RETENTION_DAYS: int = Field(default=7, ge=1)
+    SNAPSHOT_HOURLY_RETENTION_DAYS: int = Field(default=90, ge=1)
+    SNAPSHOT_DAILY_RETENTION_DAYS: int = Field(default=730, ge=1)
+
+    # Scheduler residente (python -m nodesk.etl.scheduler)
+    # Agenda por job, sobrescrevendo a padrão (JSON): {"expired_tickets": "@every 30s", "kpi": "0 * * * *"}
+    ETL_SCHEDULES: dict[str, str] = Field(default_factory=dict)
+    SCHEDULER_WORKERS: int = Field(default=2, ge=1)  # jobs simultâneos neste processo
+    SCHEDULER_LEASE_SECONDS: int = Field(default=600, ge=10)  # validade do lease, renovado durante o job
+    # Idade máxima da extração de tickets abertos reaproveitada entre expired_tickets e critical_projects
+    SCHEDULER_OPEN_TICKETS_MAX_AGE_SECONDS: float = Field(default=60, ge=0)
+
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> URL:
         query = {"driver": self.MSSQL_DRIVER}
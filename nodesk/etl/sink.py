@@ -0,0 +1,127 @@
+"""
+Escrita em lote no MongoDB, compartilhada pelos loaders da ETL.
+
+As operações (upserts, inserts) são agrupadas em lotes de
+ETL_WRITE_BATCH_SIZE e enviadas com bulk_write(ordered=False): o servidor
+não para no primeiro erro nem serializa o lote. Até ETL_WRITE_WORKERS lotes
+ficam em voo ao mesmo tempo, mas a confirmação (on_batch) segue a ordem de
+envio: um offset ou watermark salvo nela nunca passa de um lote que ainda
+não foi gravado.
+
+Coleções reconstruíveis (staging, cargas refeitas a partir do SQL Server)
+usam write concern relaxado, w=1 sem journal. O checkpoint ou watermark
+gravado depois com o write concern padrão só é confirmado quando as
+escritas anteriores também estão no journal e replicadas; uma queda antes
+disso só faz a próxima execução repetir os lotes.
+
+Dentro de interrupt_on(evento), a escrita para entre dois lotes assim que o
+evento é sinalizado (o scheduler usa isso quando perde o lease do job).
+"""
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from itertools import batched
+from typing import Optional
+
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+from pymongo.collection import Collection
+from pymongo.write_concern import WriteConcern
+
+from .settings import Settings
+
+settings = Settings()
+
+RELAXED_WRITE_CONCERN = WriteConcern(w=1, j=False)
+
+WriteOperation = InsertOne | ReplaceOne | UpdateOne
+
+_interrupt: ContextVar[Optional[threading.Event]] = ContextVar("etl_sink_interrupt", default=None)
+
+
+class WriteInterrupted(RuntimeError):
+    pass
+
+
+@contextmanager
+def interrupt_on(event: threading.Event) -> Iterator[None]:
+    """
+    As escritas feitas neste contexto (mesma thread) param entre lotes quando
+    `event` é sinalizado, com WriteInterrupted.
+    """
+    token = _interrupt.set(event)
+    try:
+        yield
+    finally:
+        _interrupt.reset(token)
+
+
+@dataclass(frozen=True)
+class WriteReport:
+    documents: int
+    batches: int
+    seconds: float
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.documents} docs in {self.batches} batches ({self.docs_per_sec:,.0f} docs/s)"
+
+
+def write(
+    collection: Collection,
+    operations: Iterable[WriteOperation],
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    rebuildable: bool = False,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> WriteReport:
+    """
+    Grava as operações em lotes concorrentes. `on_batch` recebe quantas
+    operações já foram confirmadas, lote a lote e na ordem de envio; o
+    primeiro lote com erro interrompe a escrita (os seguintes são
+    cancelados ou descartados) e o erro sobe, assim como WriteInterrupted
+    quando o evento de interrupt_on é sinalizado.
+    """
+    batch_size = batch_size or settings.ETL_WRITE_BATCH_SIZE
+    workers = workers or settings.ETL_WRITE_WORKERS
+    if rebuildable and settings.ETL_RELAXED_WRITE_CONCERN:
+        collection = collection.with_options(write_concern=RELAXED_WRITE_CONCERN)
+
+    started = time.perf_counter()
+    documents = batches = 0
+    pending: deque[tuple[Future, int]] = deque()
+    interrupt = _interrupt.get()
+
+    def acknowledge() -> None:
+        nonlocal documents, batches
+        future, size = pending.popleft()
+        future.result()
+        documents += size
+        batches += 1
+        if on_batch:
+            on_batch(documents)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl-sink") as executor:
+        try:
+            for batch in batched(operations, batch_size):
+                if interrupt is not None and interrupt.is_set():
+                    raise WriteInterrupted(f"{collection.name}: interrupted after {documents} docs")
+                pending.append((executor.submit(collection.bulk_write, list(batch), ordered=False), len(batch)))
+                # No máximo `workers` lotes em memória
+                if len(pending) == workers:
+                    acknowledge()
+            while pending:
+                acknowledge()
+        except BaseException:
+            for future, _ in pending:
+                future.cancel()
+            raise
+    return WriteReport(documents=documents, batches=batches, seconds=time.perf_counter() - started)
@@ -0,0 +1,197 @@
+"""
+Portable SQL constructs for the ETL queries.
+
+Production runs against SQL Server; the same statements also compile for
+SQLite (tests and local stand-ins) and PostgreSQL.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Date, DateTime, Integer
+from sqlalchemy.dialects.mssql import DATETIME2
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class to_date(FunctionElement):
+    """Date part of a datetime expression."""
+
+    type = Date()
+    name = "to_date"
+    inherit_cache = True
+
+
+@compiles(to_date)
+def _to_date_default(element, compiler, **kw):
+    (expr,) = element.clauses
+    return f"CAST({compiler.process(expr, **kw)} AS DATE)"
+
+
+@compiles(to_date, "sqlite")
+def _to_date_sqlite(element, compiler, **kw):
+    (expr,) = element.clauses
+    return f"date({compiler.process(expr, **kw)})"
+
+
+class add_days(FunctionElement):
+    """add_days(date, n): the date n days later (n may be negative)."""
+
+    type = Date()
+    name = "add_days"
+    inherit_cache = True
+
+
+@compiles(add_days)
+def _add_days_default(element, compiler, **kw):
+    expr, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"(CAST({expr} AS DATE) + {days})"
+
+
+@compiles(add_days, "mssql")
+def _add_days_mssql(element, compiler, **kw):
+    expr, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"DATEADD(day, {days}, {expr})"
+
+
+@compiles(add_days, "sqlite")
+def _add_days_sqlite(element, compiler, **kw):
+    expr, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"date({expr}, printf('%+d days', {days}))"
+
+
+class add_days_to_datetime(FunctionElement):
+    """add_days_to_datetime(datetime, n): the same time of day n days later (n may be negative)."""
+
+    type = DateTime()
+    name = "add_days_to_datetime"
+    inherit_cache = True
+
+
+@compiles(add_days_to_datetime)
+def _add_days_to_datetime_default(element, compiler, **kw):
+    expr, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"({expr} + {days} * INTERVAL '1 day')"
+
+
+@compiles(add_days_to_datetime, "mssql")
+def _add_days_to_datetime_mssql(element, compiler, **kw):
+    expr, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"DATEADD(day, {days}, {expr})"
+
+
+@compiles(add_days_to_datetime, "sqlite")
+def _add_days_to_datetime_sqlite(element, compiler, **kw):
+    expr, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"datetime({expr}, printf('%+d days', {days}))"
+
+
+class days_between(FunctionElement):
+    """days_between(start, end): day boundaries crossed from start to end, as DATEDIFF(day, ...)."""
+
+    type = Integer()
+    name = "days_between"
+    inherit_cache = True
+
+
+@compiles(days_between)
+def _days_between_default(element, compiler, **kw):
+    start, end = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"(CAST({end} AS DATE) - CAST({start} AS DATE))"
+
+
+@compiles(days_between, "mssql")
+def _days_between_mssql(element, compiler, **kw):
+    start, end = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"DATEDIFF(day, {start}, {end})"
+
+
+@compiles(days_between, "sqlite")
+def _days_between_sqlite(element, compiler, **kw):
+    start, end = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"CAST(julianday(date({end})) - julianday(date({start})) AS INTEGER)"
+
+
+class minutes_between(FunctionElement):
+    """minutes_between(start, end): minute boundaries crossed from start to end, as DATEDIFF(minute, ...)."""
+
+    type = Integer()
+    name = "minutes_between"
+    inherit_cache = True
+
+
+@compiles(minutes_between)
+def _minutes_between_default(element, compiler, **kw):
+    start, end = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"CAST(EXTRACT(EPOCH FROM date_trunc('minute', {end}) - date_trunc('minute', {start})) / 60 AS INTEGER)"
+
+
+@compiles(minutes_between, "mssql")
+def _minutes_between_mssql(element, compiler, **kw):
+    start, end = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"DATEDIFF(minute, {start}, {end})"
+
+
+@compiles(minutes_between, "sqlite")
+def _minutes_between_sqlite(element, compiler, **kw):
+    start, end = (compiler.process(clause, **kw) for clause in element.clauses)
+    minute = "'%Y-%m-%d %H:%M'"
+    return (
+        f"CAST(ROUND((julianday(strftime({minute}, {end})) - julianday(strftime({minute}, {start}))) * 1440)"
+        " AS INTEGER)"
+    )
+
+
+class db_now(FunctionElement[datetime]):
+    """Current local date and time on the database server (GETDATE() on SQL Server)."""
+
+    type = DateTime()
+    name = "db_now"
+    inherit_cache = True
+
+
+@compiles(db_now)
+def _db_now_default(element, compiler, **kw):
+    return "LOCALTIMESTAMP"
+
+
+@compiles(db_now, "mssql")
+def _db_now_mssql(element, compiler, **kw):
+    return "GETDATE()"
+
+
+@compiles(db_now, "sqlite")
+def _db_now_sqlite(element, compiler, **kw):
+    return "datetime('now', 'localtime')"
+
+
+class db_utcnow(FunctionElement[datetime]):
+    """Current UTC date and time on the database server (GETUTCDATE() on SQL Server)."""
+
+    type = DateTime()
+    name = "db_utcnow"
+    inherit_cache = True
+
+
+@compiles(db_utcnow)
+def _db_utcnow_default(element, compiler, **kw):
+    return "(CURRENT_TIMESTAMP AT TIME ZONE 'UTC')"
+
+
+@compiles(db_utcnow, "mssql")
+def _db_utcnow_mssql(element, compiler, **kw):
+    return "GETUTCDATE()"
+
+
+@compiles(db_utcnow, "sqlite")
+def _db_utcnow_sqlite(element, compiler, **kw):
+    return "datetime('now')"
+
+
+@compiles(DATETIME2, "sqlite")
+def _datetime2_sqlite(type_, compiler, **kw):
+    return "DATETIME"
+
+
+@compiles(DATETIME2, "postgresql")
+def _datetime2_postgresql(type_, compiler, **kw):
+    return "TIMESTAMP"
@@ -0,0 +1,655 @@
+"""
+Dados sintéticos do helpdesk para testes de escala e de carga.
+
+Gera empresas, usuários, agentes, produtos, tickets, histórico de status,
+interações e tags com distribuições próximas das reais: poucas empresas
+concentram a maior parte dos tickets (Zipf), volume crescente com menos
+chamados no fim de semana e pico em horário comercial, prioridades e SLAs por
+plano, tempos de resolução log-normais (parte estoura o SLA) e reaberturas.
+
+Os tickets são gerados em blocos (memória constante) e gravados:
+
+* no banco relacional (SQLite ou PostgreSQL), com o esquema de
+  nodesk/etl/models.py, para rodar os pipelines da ETL;
+* direto no MongoDB (opcional), nas coleções lidas pelo dashboard, montadas
+  com as mesmas funções dos pipelines (evolução diária, vencidos, projetos
+  críticos e empresas). Só essas coleções são recriadas; o banco da
+  ETL (MONGO_DB) é recusado sem --force.
+
+Uso: python -m nodesk.etl.synthetic --tickets 1000000 --sql-url sqlite:///analytics/synthetic.db
+     [--mongo-uri mongodb://localhost:27017 --mongo-db nodesk_synthetic [--force]] [--days 730] [--seed 42]
+"""
+
+import argparse
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import InsertOne, MongoClient
+from pymongo.database import Database
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+
+from nodesk.dashboard.evolution import DOCUMENTS_COLLECTION, SERIES_COLLECTION, EvolutionLayout, pack_series
+
+from . import sql  # noqa: F401 (DATETIME2 no SQLite/PostgreSQL)
+from .models import (
+    Agent,
+    Base,
+    Category,
+    Company,
+    Department,
+    Priority,
+    Product,
+    SLAPlan,
+    Status,
+    Subcategory,
+    Tag,
+    Ticket,
+    TicketInteraction,
+    TicketStatusHistory,
+    TicketTag,
+    User,
+)
+from .open_tickets import OPEN_STATUS_IDS, OpenTickets
+from .pipelines.critical_projects import snapshot_document
+from .pipelines.evolution_chart import decode_counts, open_counts_by_code
+from .pipelines.expired_tickets import COLLECTION_NAME as EXPIRED_TOTALS
+from .pipelines.expired_tickets import LIST_COLLECTION_NAME as EXPIRED_LIST
+from .pipelines.expired_tickets import deadline_documents, totals_document
+from .settings import Settings
+from .sink import write
+
+settings = Settings()
+
+CATALOG = {
+    "Acesso": ["Senha", "Permissão", "Bloqueio de conta", "MFA"],
+    "Rede": ["Wi-Fi", "VPN", "Lentidão", "Cabeamento"],
+    "Hardware": ["Notebook", "Impressora", "Monitor", "Periféricos"],
+    "Software": ["Instalação", "Licença", "Atualização", "Erro de sistema", "Integração"],
+    "Financeiro": ["Boleto", "Nota fiscal", "Cobrança"],
+    "E-mail": ["Caixa cheia", "Spam", "Configuração"],
+}
+STATUSES = {1: "Aberto", 2: "Em Atendimento", 3: "Aguardando Cliente", 4: "Resolvido", 5: "Fechado"}
+# (nome, peso, participação, primeira resposta e resolução do plano em minutos)
+PRIORITIES = [
+    ("Baixa", 1, 0.40, 480, 4320),
+    ("Média", 2, 0.35, 240, 1440),
+    ("Alta", 3, 0.18, 60, 480),
+    ("Crítica", 4, 0.07, 15, 240),
+]
+DEPARTMENTS = ["Suporte N1", "Suporte N2", "Infraestrutura", "Sistemas", "Financeiro"]
+SEGMENTS = ["Varejo", "Indústria", "Saúde", "Educação", "Serviços", "Tecnologia", "Governo"]
+TAGS = ["urgente", "recorrente", "cliente-novo", "vip", "bug", "melhoria", "duvida", "integracao", "mobile", "web"]
+CHANNELS = (["Email", "Portal", "Telefone", "Chat"], [0.35, 0.30, 0.20, 0.15])
+DEVICES = (["Desktop", "Notebook", "Celular", "Tablet"], [0.45, 0.30, 0.20, 0.05])
+TITLES = ["não funciona", "erro ao acessar", "solicitação de ajuste", "dúvida", "parou após atualização", "lentidão"]
+MESSAGES = [
+    "Olá, poderiam verificar, por favor?",
+    "Estamos analisando o caso.",
+    "Segue o print do erro.",
+    "Pode testar novamente?",
+    "Ajuste aplicado, aguardamos retorno.",
+    "Continua com o mesmo problema.",
+]
+# Chamados por hora do dia (pico em horário comercial)
+HOUR_WEIGHTS = np.array([1, 1, 1, 1, 1, 2, 4, 8, 14, 18, 18, 16, 10, 14, 17, 16, 14, 10, 6, 4, 3, 2, 2, 1], float)
+
+CHUNK_SIZE = 100_000
+NONE = -1  # chave estrangeira nula nos arrays
+
+
+@dataclass(frozen=True)
+class Volumes:
+    tickets: int = 100_000
+    companies: int = 0  # 0 = proporcional aos tickets
+    users_per_company: float = 8.0
+    agents: int = 0
+    products: int = 60
+    days: int = 730
+    interactions_per_ticket: float = 2.5
+
+    @property
+    def company_count(self) -> int:
+        return self.companies or max(20, self.tickets // 500)
+
+    @property
+    def agent_count(self) -> int:
+        return self.agents or max(10, self.tickets // 5000)
+
+
+def zipf_weights(n: int, exponent: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _to_python(values: np.ndarray) -> list:
+    # datetime64 -> datetime (NaT -> None), ids NONE -> None
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[us]").tolist()
+    if np.issubdtype(values.dtype, np.integer):
+        return [None if value == NONE else value for value in values.tolist()]
+    return values.tolist()
+
+
+def _rows(columns: dict[str, Any]) -> list[dict]:
+    keys = list(columns)
+    values = [_to_python(value) if isinstance(value, np.ndarray) else value for value in columns.values()]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+class Dimensions:
+    """
+    Cadastros (tudo que não é ticket), com as distribuições usadas na geração dos tickets.
+    """
+
+    def __init__(self, rng: np.random.Generator, volumes: Volumes, start: datetime):
+        self.categories = list(CATALOG)
+        self.subcategories = [(c, name) for c, names in enumerate(CATALOG.values(), 1) for name in names]
+        # Subcategorias de cada categoria são ids contíguos
+        sizes = np.array([len(names) for names in CATALOG.values()])
+        self.subcategory_offset = np.concatenate(([0], np.cumsum(sizes)[:-1])) + 1
+        self.subcategory_size = sizes
+        self.category_p = zipf_weights(len(self.categories), 0.8)
+
+        n_companies = volumes.company_count
+        self.company_p = zipf_weights(n_companies)
+        self.company_names = {i: f"Empresa {i} {SEGMENTS[i % len(SEGMENTS)]} LTDA" for i in range(1, n_companies + 1)}
+        self.company_created = np.datetime64(start, "s") - rng.integers(30, 1500, n_companies).astype("timedelta64[D]")
+        self.company_segment = rng.choice(SEGMENTS, n_companies)
+
+        # Usuários por empresa proporcionais ao volume de tickets (mínimo 1), em ids contíguos
+        users = np.maximum(1, np.round(self.company_p * n_companies * volumes.users_per_company)).astype(np.int64)
+        self.user_count = users
+        self.user_offset = np.concatenate(([0], np.cumsum(users)[:-1])) + 1
+        self.user_company = np.repeat(np.arange(1, n_companies + 1), users)
+        self.user_vip = rng.random(len(self.user_company)) < 0.05
+
+        self.agent_p = zipf_weights(volumes.agent_count, 0.5)
+        self.agent_department = rng.integers(1, len(DEPARTMENTS) + 1, volumes.agent_count)
+        self.product_p = zipf_weights(volumes.products, 1.2)
+        self.product_names = {i: f"Produto {i:03d}" for i in range(1, volumes.products + 1)}
+
+        # Dia de criação: crescimento de 60% na janela, fim de semana com 30% do volume
+        days = pd.date_range(start, periods=volumes.days, freq="D")
+        weights = np.linspace(1.0, 1.6, volumes.days) * np.where(days.dayofweek >= 5, 0.3, 1.0)
+        self.day_p = weights / weights.sum()
+        self.hour_p = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+
+    def lookup_rows(self, volumes: Volumes, start: datetime) -> dict[Any, list[dict]]:
+        n_agents = volumes.agent_count
+        return {
+            Category: [{"CategoryId": i, "Name": name} for i, name in enumerate(self.categories, 1)],
+            Subcategory: [
+                {"SubcategoryId": i, "CategoryId": category, "Name": name}
+                for i, (category, name) in enumerate(self.subcategories, 1)
+            ],
+            Status: [{"StatusId": i, "Name": name} for i, name in STATUSES.items()],
+            Priority: [{"PriorityId": i, "Name": name, "Weight": w} for i, (name, w, *_) in enumerate(PRIORITIES, 1)],
+            SLAPlan: [
+                {"SLAPlanId": i, "Name": f"SLA {name}", "FirstResponseMins": first, "ResolutionMins": resolution}
+                for i, (name, _, _, first, resolution) in enumerate(PRIORITIES, 1)
+            ],
+            Department: [{"DepartmentId": i, "Name": name} for i, name in enumerate(DEPARTMENTS, 1)],
+            Tag: [{"TagId": i, "Name": name} for i, name in enumerate(TAGS, 1)],
+            Product: [
+                {"ProductId": i, "Name": name, "Code": f"P{i:03d}", "IsActive": True, "CreatedAt": start}
+                for i, name in self.product_names.items()
+            ],
+            Company: _rows(
+                {
+                    "CompanyId": np.arange(1, len(self.company_names) + 1),
+                    "Name": list(self.company_names.values()),
+                    "CNPJ": [f"{i:014d}" for i in self.company_names],
+                    "Segmento": self.company_segment,
+                    "CreatedAt": self.company_created,
+                }
+            ),
+            Agent: [
+                {
+                    "AgentId": i,
+                    "FullName": f"Agente {i}",
+                    "Email": f"agente{i}@nodesk.com",
+                    "DepartmentId": int(self.agent_department[i - 1]),
+                    "IsActive": True,
+                    "HiredAt": (start - timedelta(days=int(i % 900))).date(),
+                }
+                for i in range(1, n_agents + 1)
+            ],
+            User: _rows(
+                {
+                    "UserId": np.arange(1, len(self.user_company) + 1),
+                    "CompanyId": self.user_company,
+                    "FullName": [f"Usuário {i}" for i in range(1, len(self.user_company) + 1)],
+                    "Email": [f"usuario{i}@cliente.com" for i in range(1, len(self.user_company) + 1)],
+                    "IsVIP": self.user_vip,
+                    "CreatedAt": self.company_created[self.user_company - 1],
+                }
+            ),
+        }
+
+
+def ticket_chunks(
+    rng: np.random.Generator, dims: Dimensions, volumes: Volumes, start: datetime, now: datetime, chunk_size: int
+) -> Iterator[dict[str, Any]]:
+    """
+    Tickets em blocos de colunas NumPy (ids sequenciais, datas datetime64[s]).
+    """
+    start64, now64 = np.datetime64(start, "s"), np.datetime64(now, "s")
+    first_response_sla = np.array([p[3] for p in PRIORITIES], float)
+    resolution_sla = np.array([p[4] for p in PRIORITIES], float)
+
+    for first in range(0, volumes.tickets, chunk_size):
+        size = min(chunk_size, volumes.tickets - first)
+        day = rng.choice(volumes.days, size, p=dims.day_p)
+        seconds = day * 86400 + rng.choice(24, size, p=dims.hour_p) * 3600 + rng.integers(0, 3600, size)
+        created = start64 + seconds.astype("timedelta64[s]")
+
+        company = rng.choice(len(dims.company_p), size, p=dims.company_p)
+        user = dims.user_offset[company] + rng.integers(0, dims.user_count[company])
+        category = rng.choice(len(dims.categories), size, p=dims.category_p)
+        subcategory = dims.subcategory_offset[category] + rng.integers(0, dims.subcategory_size[category])
+        subcategory[rng.random(size) < 0.03] = NONE  # sem subcategoria
+        priority = rng.choice(len(PRIORITIES), size, p=[p[2] for p in PRIORITIES])
+        product = rng.choice(len(dims.product_p), size, p=dims.product_p) + 1
+        product[rng.random(size) < 0.1] = NONE
+        agent = rng.choice(len(dims.agent_p), size, p=dims.agent_p) + 1
+
+        # Resolução log-normal em torno de 60% do SLA (parte estoura); 2% nunca resolvidos
+        resolution = rng.lognormal(np.log(resolution_sla[priority] * 0.6), 1.0)
+        resolution[rng.random(size) < 0.02] = np.inf
+        response = np.minimum(rng.lognormal(np.log(first_response_sla[priority] * 0.5), 0.8), resolution * 0.5)
+        first_response = created + (response * 60).astype("timedelta64[s]")
+        with np.errstate(invalid="ignore"):
+            closed = created + np.where(np.isfinite(resolution), resolution * 60, 0).astype("timedelta64[s]")
+        is_closed = np.isfinite(resolution) & (closed <= now64)
+        has_response = first_response <= now64
+        reopened = is_closed & (rng.random(size) < 0.04)
+        waiting = has_response & (rng.random(size) < 0.25)
+        is_fechado = is_closed & (closed + np.timedelta64(1, "D") <= now64)
+        agent[~has_response & (rng.random(size) < 0.5)] = NONE  # ainda sem agente
+
+        status = np.where(has_response, np.where(waiting, 3, 2), 1)
+        status = np.where(is_closed, np.where(is_fechado, 5, 4), status)
+        end = np.where(is_closed, closed, now64)
+
+        yield {
+            "ticket_id": np.arange(first + 1, first + size + 1, dtype=np.int64),
+            "company_id": company + 1,
+            "user_id": user,
+            "agent_id": agent,
+            "product_id": product,
+            "category_id": category + 1,
+            "subcategory_id": subcategory,
+            "priority_id": priority + 1,
+            "status_id": status,
+            "created_at": created,
+            "first_response_at": np.where(has_response, first_response, np.datetime64("NaT")),
+            "closed_at": np.where(is_closed, closed, np.datetime64("NaT")),
+            "is_closed": is_closed,
+            "reopened": reopened,
+            "waiting": waiting,
+            "is_fechado": is_fechado,
+            # Espera pelo cliente, primeira resolução e reabertura entre a resposta e o fim
+            "waiting_at": first_response + ((end - first_response) * 0.2).astype("timedelta64[s]"),
+            "first_resolved_at": first_response + ((end - first_response) * 0.4).astype("timedelta64[s]"),
+            "reopened_at": first_response + ((end - first_response) * 0.6).astype("timedelta64[s]"),
+            "title": [
+                f"{dims.subcategories[s - 1][1] if s != NONE else dims.categories[c]}: {TITLES[t]}"
+                for s, c, t in zip(subcategory.tolist(), category.tolist(), rng.integers(0, len(TITLES), size).tolist())
+            ],
+            "channel": rng.choice(CHANNELS[0], size, p=CHANNELS[1]),
+            "device": rng.choice(DEVICES[0], size, p=DEVICES[1]),
+        }
+
+
+def history_columns(chunk: dict[str, Any]) -> dict[str, np.ndarray]:
+    """
+    Histórico de status de cada ticket do bloco: resposta (1->2), espera pelo
+    cliente (2->3), resolução com reabertura eventual (->4, 4->1, 1->4) e
+    fechamento (4->5).
+    """
+    ids, agent = chunk["ticket_id"], chunk["agent_id"]
+    has_response = ~np.isnat(chunk["first_response_at"])
+    closed, reopened, waiting = chunk["is_closed"], chunk["reopened"], chunk["waiting"]
+    before_close = np.where(waiting, 3, 2)
+    # (tickets com o evento, status de origem (fixo ou por ticket), status de destino, quando)
+    events: list[tuple[np.ndarray, int | np.ndarray, int, np.ndarray]] = [
+        (has_response, 1, 2, chunk["first_response_at"]),
+        (waiting, 2, 3, chunk["waiting_at"]),
+        (reopened, before_close, 4, chunk["first_resolved_at"]),
+        (reopened, 4, 1, chunk["reopened_at"]),
+        (closed, np.where(reopened, 1, before_close), 4, chunk["closed_at"]),
+        (chunk["is_fechado"], 4, 5, chunk["closed_at"] + np.timedelta64(1, "D")),
+    ]
+    parts: dict[str, list[np.ndarray]] = {key: [] for key in ("TicketId", "From", "To", "ChangedAt", "Agent")}
+    for mask, from_status, to_status, changed_at in events:
+        parts["TicketId"].append(ids[mask])
+        parts["From"].append(np.broadcast_to(from_status, ids.shape)[mask])
+        parts["To"].append(np.full(mask.sum(), to_status))
+        parts["ChangedAt"].append(changed_at[mask])
+        parts["Agent"].append(agent[mask])
+    return {key: np.concatenate(values) for key, values in parts.items()}
+
+
+def interaction_columns(rng: np.random.Generator, chunk: dict[str, Any], per_ticket: float) -> dict[str, np.ndarray]:
+    count = rng.poisson(per_ticket, len(chunk["ticket_id"]))
+    ticket = np.repeat(np.arange(len(count)), count)
+    created = chunk["created_at"][ticket]
+    end = np.where(chunk["is_closed"], chunk["closed_at"], chunk["created_at"] + np.timedelta64(3, "D"))[ticket]
+    from_agent = (rng.random(len(ticket)) < 0.5) & (chunk["agent_id"][ticket] != NONE)
+    return {
+        "TicketId": chunk["ticket_id"][ticket],
+        "AuthorType": np.where(from_agent, "A", "U"),
+        "AuthorUserId": np.where(from_agent, NONE, chunk["user_id"][ticket]),
+        "AuthorAgentId": np.where(from_agent, chunk["agent_id"][ticket], NONE),
+        "Message": rng.choice(MESSAGES, len(ticket)),
+        "IsPublic": rng.random(len(ticket)) < 0.9,
+        "CreatedAt": created + ((end - created) * rng.random(len(ticket))).astype("timedelta64[s]"),
+    }
+
+
+def tag_columns(rng: np.random.Generator, chunk: dict[str, Any]) -> dict[str, np.ndarray]:
+    # 0, 1 ou 2 tags distintas por ticket
+    count = rng.choice(3, len(chunk["ticket_id"]), p=[0.5, 0.35, 0.15])
+    first = rng.integers(0, len(TAGS), len(count))
+    second = (first + 1 + rng.integers(0, len(TAGS) - 1, len(count))) % len(TAGS)
+    ticket = np.concatenate((chunk["ticket_id"][count >= 1], chunk["ticket_id"][count == 2]))
+    tag = np.concatenate((first[count >= 1], second[count == 2])) + 1
+    return {"TicketId": ticket, "TagId": tag}
+
+
+def ticket_rows(chunk: dict[str, Any]) -> list[dict]:
+    return _rows(
+        {
+            "TicketId": chunk["ticket_id"],
+            "CompanyId": chunk["company_id"],
+            "CreatedByUserId": chunk["user_id"],
+            "AssignedAgentId": chunk["agent_id"],
+            "ProductId": chunk["product_id"],
+            "CategoryId": chunk["category_id"],
+            "SubcategoryId": chunk["subcategory_id"],
+            "PriorityId": chunk["priority_id"],
+            "CurrentStatusId": chunk["status_id"],
+            "SLAPlanId": chunk["priority_id"],
+            "Title": chunk["title"],
+            "Channel": chunk["channel"],
+            "Device": chunk["device"],
+            "CreatedAt": chunk["created_at"],
+            "FirstResponseAt": chunk["first_response_at"],
+            "ClosedAt": chunk["closed_at"],
+        }
+    )
+
+
+class SqlWriter:
+    """
+    Grava no banco relacional com o esquema da ETL (sem o schema dbo fora do SQL Server).
+    """
+
+    def __init__(self, url: str):
+        self.engine: Engine = create_engine(url, execution_options={"schema_translate_map": {"dbo": None}})
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.next_history_id = 1
+        self.next_interaction_id = 1
+
+    def lookups(self, rows: dict[Any, list[dict]]) -> None:
+        with self.engine.begin() as conn:
+            for model, values in rows.items():
+                conn.execute(insert(model.__table__), values)
+
+    def chunk(self, rng: np.random.Generator, chunk: dict[str, Any], volumes: Volumes) -> None:
+        history = history_columns(chunk)
+        history_ids = np.arange(self.next_history_id, self.next_history_id + len(history["TicketId"]))
+        self.next_history_id += len(history_ids)
+        interactions = interaction_columns(rng, chunk, volumes.interactions_per_ticket)
+        interaction_ids = np.arange(self.next_interaction_id, self.next_interaction_id + len(interactions["TicketId"]))
+        self.next_interaction_id += len(interaction_ids)
+
+        with self.engine.begin() as conn:
+            conn.execute(insert(Ticket), ticket_rows(chunk))
+            conn.execute(
+                insert(TicketStatusHistory),
+                _rows(
+                    {
+                        "HistoryId": history_ids,
+                        "TicketId": history["TicketId"],
+                        "FromStatusId": history["From"],
+                        "ToStatusId": history["To"],
+                        "ChangedAt": history["ChangedAt"],
+                        "ChangedByAgentId": history["Agent"],
+                    }
+                ),
+            )
+            if len(interaction_ids):
+                conn.execute(insert(TicketInteraction), _rows({"InteractionId": interaction_ids, **interactions}))
+            tags = tag_columns(rng, chunk)
+            if len(tags["TicketId"]):
+                conn.execute(insert(TicketTag), _rows(tags))
+
+
+class DashboardAccumulator:
+    """
+    Acumula, bloco a bloco, o que as coleções do dashboard precisam: a
+    evolução diária (somada por código de categoria/subcategoria) e os tickets
+    abertos. Os documentos saem das mesmas funções dos pipelines da ETL.
+    """
+
+    def __init__(self, dims: Dimensions, start: datetime, now: datetime):
+        self.dims = dims
+        self.start = start
+        self.now = now
+        self.categories = pd.CategoricalDtype(dims.categories)
+        self.subcategories = pd.CategoricalDtype(sorted({name for _, name in dims.subcategories}))
+        self.category_counts: Optional[np.ndarray] = None
+        self.subcategory_counts: Optional[np.ndarray] = None
+        self.days: list[date] = []
+        self.open_columns: list[dict[str, Any]] = []
+
+    def add(self, chunk: dict[str, Any]) -> None:
+        # Mesmas linhas da extração do pandas (Tickets x TicketStatusHistory), só com subcategoria
+        history = history_columns(chunk)
+        has_subcategory = chunk["subcategory_id"] != NONE
+        position = np.searchsorted(chunk["ticket_id"], history["TicketId"])
+        keep = has_subcategory[position]
+        without_history = np.setdiff1d(np.flatnonzero(has_subcategory), position)
+        rows = np.concatenate((position[keep], without_history))
+        category = np.array(self.dims.categories)[chunk["category_id"] - 1]
+        subcategory = np.array([name for _, name in self.dims.subcategories])[chunk["subcategory_id"] - 1]
+        frame = pd.DataFrame(
+            {
+                "TicketId": chunk["ticket_id"][rows],
+                "FromStatusId": np.concatenate((history["From"][keep], np.full(len(without_history), np.nan))),
+                "ToStatusId": np.concatenate((history["To"][keep], np.full(len(without_history), np.nan))),
+                "ChangedAt": np.concatenate(
+                    (history["ChangedAt"][keep], np.full(len(without_history), np.datetime64("NaT"), "datetime64[s]"))
+                ),
+                "Category": pd.Categorical(category[rows], dtype=self.categories),
+                "Subcategories": pd.Categorical(subcategory[rows], dtype=self.subcategories),
+                "CreatedAt": chunk["created_at"][rows],
+            }
+        )
+        first = pd.DataFrame({"FirstCreatedAt": [self.start]})
+        days, category_counts, _, subcategory_counts, _ = open_counts_by_code(first, frame, self.now.date())
+        self.days = days
+        self.category_counts = category_counts + (0 if self.category_counts is None else self.category_counts)
+        self.subcategory_counts = subcategory_counts + (
+            0 if self.subcategory_counts is None else self.subcategory_counts
+        )
+
+        is_open = np.isin(chunk["status_id"], OPEN_STATUS_IDS)
+        self.open_columns.append(
+            {
+                "ticket_id": chunk["ticket_id"][is_open],
+                "title": [title for title, keep in zip(chunk["title"], is_open) if keep],
+                "created_at": chunk["created_at"][is_open].astype("datetime64[us]"),
+                "priority": chunk["priority_id"][is_open],
+                "product_id": chunk["product_id"][is_open],
+                "company_id": chunk["company_id"][is_open],
+                "user_vip": self.dims.user_vip[chunk["user_id"][is_open] - 1],
+            }
+        )
+
+    def evolution(self) -> list[dict]:
+        if self.category_counts is None:
+            return []
+        return decode_counts(
+            self.days,
+            self.category_counts,
+            list(self.categories.categories),
+            self.subcategory_counts,
+            list(self.subcategories.categories),
+        )
+
+    def open_tickets(self) -> OpenTickets:
+        columns = {key: [part[key] for part in self.open_columns] for key in self.open_columns[0]}
+        resolution = np.array([p[4] for p in PRIORITIES], float)
+        return OpenTickets(
+            now=self.now,
+            utc_now=self.now,
+            ticket_id=np.concatenate(columns["ticket_id"]),
+            title=[title for part in columns["title"] for title in part],
+            created_at=np.concatenate(columns["created_at"]),
+            resolution_mins=resolution[np.concatenate(columns["priority"]) - 1],
+            product_id=np.concatenate(columns["product_id"]),
+            company_id=np.concatenate(columns["company_id"]),
+            user_vip=np.concatenate(columns["user_vip"]),
+            product_names=self.dims.product_names,
+            company_names=self.dims.company_names,
+        )
+
+
+# Coleções gravadas no MongoDB (as duas da evolução: a do outro layout ficaria desatualizada)
+MONGO_COLLECTIONS = (
+    "companies",
+    DOCUMENTS_COLLECTION,
+    SERIES_COLLECTION,
+    EXPIRED_LIST,
+    EXPIRED_TOTALS,
+    "critical_projects",
+)
+
+
+def write_dashboard(db: Database, accumulator: DashboardAccumulator, layout: EvolutionLayout) -> None:
+    dims = accumulator.dims
+    db["companies"].insert_many(
+        [{"company_id": i, "name": name, "cnpj": f"{i:014d}"} for i, name in dims.company_names.items()]
+    )
+
+    evolution = accumulator.evolution()
+    if layout == "series":
+        _insert_batches(db[SERIES_COLLECTION], pack_series(evolution))
+    else:
+        _insert_batches(db[DOCUMENTS_COLLECTION], evolution)
+
+    open_tickets = accumulator.open_tickets()
+    _insert_batches(db[EXPIRED_LIST], deadline_documents(open_tickets).values())
+    db[EXPIRED_TOTALS].insert_one(totals_document(open_tickets))
+    db["critical_projects"].insert_one(snapshot_document(open_tickets))
+
+    # Índices só depois da carga (um build por índice em vez de manter a cada lote), os mesmos dos pipelines
+    db["companies"].create_index("company_id", unique=True)
+    db[DOCUMENTS_COLLECTION if layout == "documents" else SERIES_COLLECTION].create_index(
+        "date" if layout == "documents" else [("level", 1), ("start", 1), ("end", 1)]
+    )
+    db[EXPIRED_LIST].create_index("ticket_id", unique=True)
+    db[EXPIRED_LIST].create_index([("deadline", 1), ("ticket_id", 1)])
+    db[EXPIRED_LIST].create_index([("compania_id", 1), ("deadline", 1), ("ticket_id", 1)])
+
+
+def _insert_batches(collection, docs: Iterable[dict], batch_size: int = 10_000) -> None:
+    # Dados gerados: reconstruíveis, com write concern relaxado
+    write(collection, map(InsertOne, docs), batch_size, rebuildable=True)
+
+
+def generate(
+    volumes: Volumes,
+    sql_url: Optional[str] = None,
+    mongo_db: Optional[Database] = None,
+    layout: EvolutionLayout = "documents",
+    seed: int = 42,
+    now: Optional[datetime] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict[str, int]:
+    """
+    Gera o conjunto completo; retorna quantas linhas de cada tipo foram gravadas.
+    """
+    rng = np.random.default_rng(seed)
+    now = (now or datetime.now()).replace(microsecond=0)
+    start = datetime.combine(now.date() - timedelta(days=volumes.days - 1), datetime.min.time())
+    dims = Dimensions(rng, volumes, start)
+
+    writer = SqlWriter(sql_url) if sql_url else None
+    accumulator = DashboardAccumulator(dims, start, now) if mongo_db is not None else None
+    if writer:
+        writer.lookups(dims.lookup_rows(volumes, start))
+    if mongo_db is not None:
+        for name in MONGO_COLLECTIONS:
+            mongo_db.drop_collection(name)
+
+    tickets = 0
+    for chunk in ticket_chunks(rng, dims, volumes, start, now, chunk_size):
+        if writer:
+            writer.chunk(rng, chunk, volumes)
+        if accumulator:
+            accumulator.add(chunk)
+        tickets += len(chunk["ticket_id"])
+        print(f"🧪 {tickets:,}/{volumes.tickets:,} tickets")
+
+    if accumulator and mongo_db is not None:
+        write_dashboard(mongo_db, accumulator, layout)
+
+    return {
+        "companies": len(dims.company_names),
+        "users": len(dims.user_company),
+        "agents": volumes.agent_count,
+        "tickets": tickets,
+        "history": writer.next_history_id - 1 if writer else 0,
+        "interactions": writer.next_interaction_id - 1 if writer else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=Volumes.tickets)
+    parser.add_argument("--companies", type=int, default=0, help="0 = proporcional aos tickets")
+    parser.add_argument("--users-per-company", type=float, default=Volumes.users_per_company)
+    parser.add_argument("--agents", type=int, default=0, help="0 = proporcional aos tickets")
+    parser.add_argument("--products", type=int, default=Volumes.products)
+    parser.add_argument("--days", type=int, default=Volumes.days)
+    parser.add_argument("--interactions-per-ticket", type=float, default=Volumes.interactions_per_ticket)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sql-url", help="ex.: sqlite:///analytics/synthetic.db, postgresql+psycopg://...")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--mongo-db", default="nodesk_synthetic", help="coleções do dashboard recriadas do zero")
+    parser.add_argument("--force", action="store_true", help="aceita --mongo-db igual ao MONGO_DB da ETL")
+    parser.add_argument("--evolution-layout", choices=["documents", "series"], default="documents")
+    args = parser.parse_args()
+    if not args.sql_url and not args.mongo_uri:
+        parser.error("informe --sql-url e/ou --mongo-uri")
+    if args.mongo_uri and args.mongo_db == settings.MONGO_DB and not args.force:
+        parser.error(f"--mongo-db {args.mongo_db} é o banco da ETL (MONGO_DB); use outro nome ou --force")
+
+    volumes = Volumes(
+        tickets=args.tickets,
+        companies=args.companies,
+        users_per_company=args.users_per_company,
+        agents=args.agents,
+        products=args.products,
+        days=args.days,
+        interactions_per_ticket=args.interactions_per_ticket,
+    )
+    mongo_db: Optional[Database] = MongoClient(args.mongo_uri)[args.mongo_db] if args.mongo_uri else None
+    started = time.perf_counter()
+    counts = generate(volumes, args.sql_url, mongo_db, args.evolution_layout, args.seed, chunk_size=args.chunk_size)
+    print(f"✅ {counts} em {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import hashlib
+import statistics
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+    from prophet import Prophet
+
+MODEL_PATH = Path(__file__).parent / "model" / "weekly_tickets_model.json"
+FORECASTS_COLLECTION = "kpi_forecasts"
+
+# Parâmetros da previsão semanal exibida no KPI 3
+WEEKLY_FREQ = "W-MON"
+WEEKLY_LAST_DATE = "2025-01-01"
+
+_fingerprints: dict[tuple[str, int, int], str] = {}
+
+
+def model_fingerprint(path: Path = MODEL_PATH) -> str:
+    """
+    sha256 do arquivo do modelo; recalculado apenas quando mtime/tamanho mudam.
+    """
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _fingerprints:
+        _fingerprints[key] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return _fingerprints[key]
+
+
+def load_model(path: Path = MODEL_PATH) -> "Prophet":
+    # prophet (e matplotlib) só é importado por quem de fato carrega o modelo
+    from prophet.serialize import model_from_json
+
+    with open(path, "r") as fin:
+        return model_from_json(fin.read())
+
+
+def forecast(model: "Prophet", periods: int, freq: str, last_date: str) -> list[dict[str, Any]]:
+    """
+    Previsão de `periods` períodos após o histórico do modelo, limitada a datas > last_date.
+    """
+    import pandas as pd
+
+    # Gera futuro
+    future = model.make_future_dataframe(periods=periods, freq=freq)
+
+    # Filtra datas maiores que last_date
+    future = future[future["ds"] > pd.to_datetime(last_date)]
+
+    result = model.predict(future)
+
+    # Seleciona as últimas previsões
+    result = result[["ds", "yhat", "yhat_lower", "yhat_upper"]].tail(periods)
+
+    # 🔥 Arredonda todos os valores numéricos para inteiro
+    result["yhat"] = result["yhat"].round().astype(int)
+    result["yhat_lower"] = result["yhat_lower"].round().astype(int)
+    result["yhat_upper"] = result["yhat_upper"].round().astype(int)
+
+    return result.to_dict(orient="records")
+
+
+class ForecastCache:
+    """
+    LRU em memória para previsões, chaveado por (periods, freq, last_date, fingerprint do modelo).
+    """
+
+    def __init__(self, maxsize: int = 64) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, list[dict[str, Any]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> list[dict[str, Any]] | None:
+        rows = self._entries.get(key)
+        if rows is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return [dict(row) for row in rows]
+
+    def set(self, key: Hashable, rows: list[dict[str, Any]]) -> None:
+        self._entries[key] = [dict(row) for row in rows]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+forecast_cache = ForecastCache()
+
+
+def stan_init(model: "Prophet") -> dict[str, Any]:
+    """
+    Parâmetros ajustados no formato aceito por Prophet.fit(init=...), para warm-start.
+    """
+    params: dict[str, Any] = {name: float(model.params[name][0][0]) for name in ("k", "m", "sigma_obs")}
+    params.update({name: [float(value) for value in model.params[name][0]] for name in ("delta", "beta")})
+    return params
+
+
+def fit_series(
+    ds: "Sequence[datetime] | np.ndarray",
+    y: "Sequence[int] | np.ndarray",
+    periods: int,
+    freq: str,
+    init: Optional[dict[str, Any]] = None,
+) -> dict[str, Any]:
+    """
+    Ajusta um Prophet para uma série semanal e prevê os próximos `periods` períodos.
+
+    Com `init` (parâmetros da execução anterior) o otimizador parte do ajuste
+    anterior. Se a forma dos parâmetros mudou (ex.: mais changepoints com o
+    histórico maior) o Stan não aproveita o init, e o ajuste é registrado como
+    frio (warm_start=False).
+    """
+    import numpy as np
+    import pandas as pd
+    from prophet import Prophet
+
+    history = pd.DataFrame({"ds": pd.to_datetime(ds), "y": y})
+    start = time.perf_counter()
+
+    def fit(init_params: Optional[dict[str, Any]]) -> "Prophet":
+        model = Prophet(weekly_seasonality=False, daily_seasonality=False)
+        if not init_params:
+            return model.fit(history)
+        # delta/beta ficam salvos como listas (Mongo); o Stan espera arrays
+        return model.fit(history, init={name: np.asarray(value) for name, value in init_params.items()})
+
+    try:
+        model = fit(init)
+    except (RuntimeError, ValueError):
+        if init is None:
+            raise
+        init = None
+        model = fit(None)
+
+    fitted = stan_init(model)
+    warm_start = init is not None and all(len(init[name]) == len(fitted[name]) for name in ("delta", "beta"))
+    fit_seconds = time.perf_counter() - start
+
+    future = model.make_future_dataframe(periods=periods, freq=freq, include_history=False)
+    result = model.predict(future)[["ds", "yhat", "yhat_lower", "yhat_upper"]]
+
+    # Contagens: inteiras e nunca negativas
+    rows = [
+        {
+            "ds": row.ds.to_pydatetime(),
+            "yhat": max(int(round(row.yhat)), 0),
+            "yhat_lower": max(int(round(row.yhat_lower)), 0),
+            "yhat_upper": max(int(round(row.yhat_upper)), 0),
+        }
+        for row in result.itertuples()
+    ]
+    return {"rows": rows, "params": fitted, "fit_seconds": fit_seconds, "warm_start": warm_start}
+
+
+SEASON_LENGTH = 52  # semanas
+SMOOTHING_GRID = (0.1, 0.3, 0.5, 0.7, 0.9)
+
+
+def _smooth(y: "np.ndarray", alpha: float, gamma: float, season: int) -> tuple[float, "np.ndarray", "np.ndarray"]:
+    """
+    Suavização exponencial com sazonalidade aditiva (Holt-Winters sem tendência).
+
+    Retorna o nível final, os `season` últimos índices sazonais e os erros de
+    previsão um passo à frente. Com alpha=0 e gamma=1 vira o seasonal-naive.
+    """
+    import numpy as np
+
+    level = float(y[:season].mean())
+    seasonal = list(y[:season] - level)
+    errors = np.empty(len(y) - season)
+    for t in range(season, len(y)):
+        s = seasonal[t - season]
+        errors[t - season] = y[t] - (level + s)
+        previous = level
+        level = alpha * (y[t] - s) + (1 - alpha) * level
+        seasonal.append(gamma * (y[t] - previous) + (1 - gamma) * s)
+    return level, np.asarray(seasonal[-season:]), errors
+
+
+def smoothing_forecast(
+    ds: Sequence[datetime],
+    y: Sequence[int],
+    periods: int,
+    freq: str,
+    last_date: str,
+    interval_width: float = 0.8,
+) -> list[dict[str, Any]]:
+    """
+    Previsão só com NumPy: seasonal-naive + suavização exponencial, com intervalos.
+
+    Mesmo formato de `forecast` (ds, yhat, yhat_lower, yhat_upper inteiros), para
+    servir de alternativa leve ao Prophet. Com menos de duas temporadas de
+    histórico a sazonalidade é desligada (suavização simples). Os parâmetros
+    vêm de uma busca em grade pelo menor erro um passo à frente; o intervalo usa
+    o desvio desses erros, alargado com o horizonte.
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = np.asarray(y, dtype=float)
+    if values.size == 0:
+        return []
+    season = SEASON_LENGTH if values.size >= 2 * SEASON_LENGTH else 1
+
+    fits = [
+        (alpha, *_smooth(values, alpha, gamma, season))
+        for alpha in SMOOTHING_GRID
+        for gamma in (SMOOTHING_GRID if season > 1 else (0.0,))
+    ]
+    # Menor soma dos erros quadráticos; no empate fica o primeiro da grade
+    alpha, level, seasonal, errors = min(fits, key=lambda fit: float(np.square(fit[3]).sum()))
+
+    sigma = float(errors.std()) if errors.size > 1 else 0.0
+    z = statistics.NormalDist().inv_cdf(0.5 + interval_width / 2)
+
+    future = pd.date_range(pd.DatetimeIndex(ds)[-1], periods=periods + 1, freq=freq)[1:]
+    horizon = np.arange(1, periods + 1)
+    yhat = level + seasonal[(horizon - 1) % season]
+    spread = z * sigma * np.sqrt(1 + (horizon - 1) * alpha**2)
+
+    rows = [
+        {
+            "ds": date.to_pydatetime(),
+            "yhat": max(int(round(mean)), 0),
+            "yhat_lower": max(int(round(mean - width)), 0),
+            "yhat_upper": max(int(round(mean + width)), 0),
+        }
+        for date, mean, width in zip(future, yhat, spread)
+    ]
+    # Mesmo recorte de `forecast`: só datas depois de last_date
+    cutoff = pd.Timestamp(last_date).to_pydatetime()
+    return [row for row in rows if row["ds"] > cutoff]
@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from fastapi import HTTPException, status
+
+from nodesk.kpi.forecast import MODEL_PATH, forecast, load_model, model_fingerprint
+
+if TYPE_CHECKING:
+    from prophet import Prophet
+
+# Modelo carregado uma única vez por processo do pool (ver _init_worker)
+_worker_model: Optional["Prophet"] = None
+
+
+def _init_worker(model_path: str) -> None:
+    global _worker_model
+    _worker_model = load_model(Path(model_path))
+
+
+def _ping() -> bool:
+    return _worker_model is not None
+
+
+def _predict(periods: int, freq: str, last_date: str) -> list[dict[str, Any]]:
+    if _worker_model is None:
+        raise RuntimeError("Processo do pool sem modelo: _init_worker não rodou")
+    return forecast(_worker_model, periods, freq, last_date)
+
+
+class PredictionService:
+    """
+    Executa as previsões do Prophet num pool de processos dedicado, fora do event loop.
+
+    Cada processo desserializa o modelo uma vez, no initializer. O número de
+    previsões simultâneas é limitado por um semáforo: quando todas as vagas estão
+    ocupadas a requisição é recusada com 503 em vez de enfileirar, e uma previsão
+    que passe do timeout responde 504. Assim o KPI nunca segura o worker da API
+    usado por autenticação e dashboard.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 1,
+        timeout: float = 10.0,
+        max_concurrency: int = 2,
+        model_path: Path = MODEL_PATH,
+    ) -> None:
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.model_path = model_path
+        self._executor: ProcessPoolExecutor | None = None
+        self._warmups: list[Future[bool]] = []
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._fingerprint: str | None = None
+
+    def start(self, warm: bool = True) -> None:
+        # Fingerprint do arquivo que o pool vai carregar (no start, não no import)
+        self._fingerprint = model_fingerprint(self.model_path)
+        # spawn: o processo da API já tem threads (Motor), fork não é seguro
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(self.model_path),),
+        )
+        if warm:
+            # Sobe todos os processos (e carrega o modelo) sem bloquear o startup
+            self._warmups = [self._executor.submit(_ping) for _ in range(self.max_workers)]
+
+    def fingerprint(self) -> str:
+        """
+        sha256 do modelo carregado pelo pool, calculado no último start. Um
+        arquivo de modelo trocado só vale (para o pool e para o fingerprint)
+        depois de reiniciar o serviço.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = model_fingerprint(self.model_path)
+        return self._fingerprint
+
+    def state(self) -> str:
+        """
+        stopped, warming (processos ainda carregando o modelo), failed ou ready.
+        Sem aquecimento o pool sobe sob demanda e é considerado pronto.
+        """
+        if self._executor is None:
+            return "stopped"
+        if not all(future.done() for future in self._warmups):
+            return "warming"
+        if any(future.cancelled() or future.exception() is not None for future in self._warmups):
+            return "failed"
+        return "ready"
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._warmups = []
+
+    async def predict(self, periods: int, freq: str, last_date: str) -> list[dict[str, Any]]:
+        if self._executor is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Previsão indisponível.")
+        if self._semaphore.locked():
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Serviço de previsão ocupado.")
+
+        await self._semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, _predict, periods, freq, last_date)
+        # A vaga só é liberada quando o processo termina, mesmo após um timeout
+        future.add_done_callback(lambda _: self._semaphore.release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Tempo limite da previsão excedido."
+            )
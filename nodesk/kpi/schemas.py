@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Dict, Literal, Optional
+
 from pydantic import BaseModel
 
 
@@ -9,7 +12,16 @@ class MetricsCardResponse(BaseModel):
     relation: bool | None = None
 
 
+class KPIBatchResponse(BaseModel):
+    generated_at: Optional[datetime] = None
+    cards: Dict[str, MetricsCardResponse]
+
+
+ForecastModel = Literal["prophet", "numpy"]
+
+
 class PredictionRequest(BaseModel):
     periods: int = 12
     freq: str = "W"
     last_date: str
+    model: Optional[ForecastModel] = None
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from nodesk.kpi.forecast import (
+    FORECASTS_COLLECTION,
+    WEEKLY_FREQ,
+    WEEKLY_LAST_DATE,
+    forecast_cache,
+    smoothing_forecast,
+)
+from nodesk.core.settings import KPISettings
+from nodesk.kpi.prediction import PredictionService
+from nodesk.kpi.schemas import ForecastModel, PredictionRequest
+from nodesk.kpi.tickets import weekly_ticket_counts
+
+KPI_SNAPSHOTS_COLLECTION = "kpi_snapshots"
+KPI_IDS = ("1", "2", "3", "4", "5")
+FORECAST_KPI_ID = "3"
+
+
+async def get_weekly_forecast(
+    db: AsyncIOMotorDatabase,
+    prediction: PredictionService,
+    settings: KPISettings,
+    model: Optional[ForecastModel] = None,
+) -> list[dict]:
+    """
+    Previsão da próxima semana: lê o documento pré-calculado pela ETL para o
+    modelo atual; sem ele (ou pedindo o modelo numpy), calcula via predict (com cache).
+    """
+    if model != "numpy":
+        doc = await db[FORECASTS_COLLECTION].find_one(
+            {"model_fingerprint": prediction.fingerprint(), "freq": WEEKLY_FREQ, "last_date": WEEKLY_LAST_DATE},
+            sort=[("generated_at", -1)],
+        )
+        if doc and doc.get("rows"):
+            return doc["rows"][:1]
+
+    request = PredictionRequest(periods=1, freq=WEEKLY_FREQ, last_date=WEEKLY_LAST_DATE, model=model)
+    return await predict(request, prediction, settings)
+
+
+async def predict(request: PredictionRequest, prediction: PredictionService, settings: KPISettings):
+    """
+    Previsão pelo Prophet (pool de processos) ou pelo modelo NumPy.
+
+    Sem modelo no request vale KPI_FORECAST_MODEL. O Prophet cai automaticamente
+    para o NumPy enquanto o pool ainda carrega o modelo ou quando está ocupado (503).
+    O NumPy roda numa thread: leitura do snapshot e ajuste não bloqueiam o event loop.
+    """
+    model = request.model or settings.KPI_FORECAST_MODEL
+    if model == "prophet" and prediction.state() != "ready":
+        model = "numpy"
+
+    if model == "prophet":
+        key = (request.periods, request.freq, request.last_date, prediction.fingerprint())
+        cached = forecast_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            result = await prediction.predict(request.periods, request.freq, request.last_date)
+        except HTTPException as exc:
+            if exc.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                raise
+            # Pool ocupado: responde com o NumPy
+            return await asyncio.to_thread(_numpy_forecast, request, Path(settings.KPI_TICKETS_SNAPSHOT_PATH))
+        forecast_cache.set(key, result)
+        return result
+
+    return await asyncio.to_thread(_numpy_forecast, request, Path(settings.KPI_TICKETS_SNAPSHOT_PATH))
+
+
+def _numpy_forecast(request: PredictionRequest, path: Path) -> list[dict]:
+    """
+    Previsão NumPy sobre o snapshot colunar gerado pela ETL, com cache
+    chaveado também pelo mtime e tamanho do snapshot: reescrito pela ETL, a
+    próxima previsão já usa os dados novos.
+    """
+    # Snapshot colunar gerado pela ETL (só a coluna created_at, via memory-map)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        # A ETL ainda não gerou o snapshot (implantação nova): indisponível por ora, não ausente
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Previsão aquecendo: snapshot de tickets ainda não gerado pela ETL.",
+        )
+
+    key = (request.periods, request.freq, request.last_date, "numpy", stat.st_mtime_ns, stat.st_size)
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Agrega por semana (contagem de tickets)
+    try:
+        df = weekly_ticket_counts(path, freq=request.freq)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    if df.empty:
+        raise HTTPException(status_code=400, detail="Dados insuficientes para previsão.")
+
+    result = smoothing_forecast(df["ds"], df["y"], request.periods, request.freq, request.last_date)
+    forecast_cache.set(key, result)
+    return result
+
+
+def forecast_card(row: dict) -> dict:
+    return {
+        "kpi_id": FORECAST_KPI_ID,
+        "titulo_metrica": "Previsão de chamados na próxima semana",
+        "valor_metrica": str(row["yhat"]),
+        "top_limit": str(row["yhat_upper"]),
+        "bottom_limit": str(row["yhat_lower"]),
+        "relation": False,
+    }
+
+
+async def get_cards(
+    db: AsyncIOMotorDatabase,
+    prediction: PredictionService,
+    settings: KPISettings,
+    kpi_ids: Iterable[str] = KPI_IDS,
+    model: Optional[ForecastModel] = None,
+) -> tuple[Optional[datetime], dict[str, dict]]:
+    """
+    Cards do snapshot mais recente da ETL (uma leitura pelo índice de generated_at).
+
+    O card de previsão embutido no snapshot só é usado se veio do modelo atual
+    (e o request não pediu o modelo numpy); caso contrário cai em get_weekly_forecast.
+    Se a previsão falha, o lote segue sem o card 3; pedido sozinho, o erro sobe.
+    """
+    snapshot = await db[KPI_SNAPSHOTS_COLLECTION].find_one({}, {"_id": 0}, sort=[("generated_at", -1)]) or {}
+    cards = {card["kpi_id"]: card for card in snapshot.get("cards", []) if card["kpi_id"] in kpi_ids}
+
+    forecast = cards.get(FORECAST_KPI_ID)
+    if FORECAST_KPI_ID in kpi_ids and (
+        model == "numpy" or forecast is None or forecast.get("model_fingerprint") != prediction.fingerprint()
+    ):
+        try:
+            rows = await get_weekly_forecast(db, prediction, settings, model)
+        except HTTPException:
+            if set(kpi_ids) == {FORECAST_KPI_ID}:
+                raise
+            cards.pop(FORECAST_KPI_ID, None)
+        else:
+            cards[FORECAST_KPI_ID] = forecast_card(rows[0])
+
+    return snapshot.get("generated_at"), {kpi_id: cards[kpi_id] for kpi_id in kpi_ids if kpi_id in cards}
@@ -0,0 +1,129 @@
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+# Snapshot colunar dos tickets (Arrow IPC, sem compressão para permitir memory-map)
+TIMESTAMP_COLUMNS = ("created_at", "first_response_at", "closed_at")
+CATEGORY_COLUMNS = ("category", "subcategory", "priority", "status", "channel")
+ID_COLUMNS = ("company_id", "product_id", "sla_plan_id")
+WEEKDAYS = ("MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN")
+
+
+def tickets_schema() -> "pa.Schema":
+    import pyarrow as pa
+
+    return pa.schema(
+        [("ticket_id", pa.int64())]
+        + [(name, pa.int32()) for name in ID_COLUMNS]
+        + [(name, pa.dictionary(pa.int32(), pa.string())) for name in CATEGORY_COLUMNS]
+        + [(name, pa.timestamp("ms")) for name in TIMESTAMP_COLUMNS]
+    )
+
+
+def write_tickets(columns: Mapping[str, Sequence], path: Path) -> int:
+    """
+    Grava o snapshot de forma atômica: leitores com o arquivo antigo mapeado
+    continuam válidos até reabrirem.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    schema = tickets_schema()
+    arrays = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], type=field.type))
+    table = pa.Table.from_arrays(arrays, schema=schema)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    feather.write_feather(table, tmp, compression="uncompressed")
+    os.replace(tmp, path)
+    return table.num_rows
+
+
+def read_tickets(path: Path, columns: Optional[Iterable[str]] = None) -> "pa.Table":
+    """
+    Lê só as colunas pedidas, mapeando o arquivo em memória (páginas compartilhadas entre workers).
+    """
+    import pyarrow.feather as feather
+
+    return feather.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+
+
+def _week_labels(created_at: "np.ndarray", freq: str) -> "np.ndarray":
+    """
+    Dia (desde 1970-01-01) que rotula a semana de cada timestamp: o próximo dia
+    âncora, inclusive, como em resample(freq) para frequências W-MON, W-SUN, ...
+    """
+    import numpy as np
+
+    if freq == "W":
+        freq = "W-SUN"  # alias do pandas
+    if not freq.startswith("W-") or freq[2:] not in WEEKDAYS:
+        raise ValueError(f"Frequência semanal não suportada: {freq}")
+
+    # 1970-01-01 foi uma quinta (3)
+    days = created_at.astype("datetime64[D]").astype(np.int64)
+    return days + (WEEKDAYS.index(freq[2:]) - (days + 3)) % 7
+
+
+def weekly_ticket_counts(path: Path, freq: str = "W-MON") -> "pd.DataFrame":
+    """
+    Contagem de tickets por semana (ds, y), no formato do Prophet.
+
+    Equivale a resample(freq).size() do pandas, mas com bincount sobre os dias:
+    dispensa ordenar ~centenas de milhares de timestamps a cada chamada.
+    """
+    import numpy as np
+    import pandas as pd
+
+    created_at = read_tickets(path, columns=["created_at"]).column("created_at").to_numpy()
+    created_at = created_at[~np.isnat(created_at)]
+    if created_at.size == 0:
+        return pd.DataFrame({"ds": pd.DatetimeIndex([]), "y": np.array([], dtype=np.int64)})
+
+    labels = _week_labels(created_at, freq)
+    first = labels.min()
+    counts = np.bincount((labels - first) // 7)
+    ds = (first + 7 * np.arange(counts.size)).astype("datetime64[D]")
+    return pd.DataFrame({"ds": pd.DatetimeIndex(ds), "y": counts})
+
+
+def weekly_counts_by(path: Path, column: str, freq: str = "W-MON") -> tuple["np.ndarray", dict[str, "np.ndarray"]]:
+    """
+    Contagem semanal por valor de uma coluna categórica (ex.: category).
+
+    Usa os códigos do dicionário Arrow direto: um único bincount 2D
+    (código x semana) em vez de um groupby por string. Retorna as semanas (ds)
+    e, para cada valor, a série de contagens alinhada a elas.
+    """
+    import numpy as np
+
+    table = read_tickets(path, columns=[column, "created_at"])
+    values = table.column(column).combine_chunks()
+    codes = values.indices.to_numpy(zero_copy_only=False)
+    created_at = table.column("created_at").to_numpy()
+
+    valid = ~np.isnat(created_at) & values.is_valid().to_numpy(zero_copy_only=False)
+    if not valid.any():
+        return np.array([], dtype="datetime64[D]"), {}
+
+    codes = codes[valid].astype(np.int64)
+    labels = _week_labels(created_at[valid], freq)
+    first = labels.min()
+    weeks = (labels - first) // 7
+    n_weeks = int(weeks.max()) + 1
+    n_values = len(values.dictionary)
+
+    counts = np.bincount(codes * n_weeks + weeks, minlength=n_values * n_weeks).reshape(n_values, n_weeks)
+    ds = (first + 7 * np.arange(n_weeks)).astype("datetime64[D]")
+    names = values.dictionary.to_pylist()
+    return ds, {names[code]: counts[code] for code in range(n_values) if counts[code].any()}
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import (
 from nodesk.users.service import create_user_secure, get_user_decrypted, delete_user_secure, update_user_secure
 
 
+from ..core.compression import CompressedRoute
 from ..core.di import provider_for
 from .models import Role, User
 from .protocols import PasswordHasherProtocol
@@ -19,7 +20,7 @@ PasswordHasher = Annotated[PasswordHasherProtocol, Depends(provider_for(Password
 Session = Annotated[AsyncSession, Depends(provider_for(AsyncSession))]
 
 
-users_router = APIRouter(prefix="/users", tags=["users"])
+users_router = APIRouter(prefix="/users", tags=["users"], route_class=CompressedRoute)
 
 
 @users_router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -1,6 +1,11 @@
+import asyncio
+import subprocess
+import sys
+
 import pytest
 
 from nodesk import app
+from nodesk.core.readiness import Readiness
 
 
 @pytest.mark.asyncio
@@ -26,3 +31,27 @@ async def test_docs_and_openapi(client):
     assert r.status_code == 200
     schema = r.json()
     assert "paths" in schema and "/users/" in schema["paths"]
+
+
+@pytest.mark.asyncio
+async def test_ready(client):
+    r = await client.get("/ready")
+    assert r.status_code == 200
+    assert r.json() == {"ready": True, "components": {"kpi_prediction": "ready"}}
+
+
+@pytest.mark.asyncio
+async def test_readiness_reports_warming_components():
+    readiness = Readiness()
+    pending = asyncio.get_running_loop().create_future()
+    readiness.track("analytics", pending)
+    assert readiness.report() == {"ready": False, "components": {"analytics": "warming"}}
+
+    pending.set_result(None)
+    assert readiness.report()["ready"] is True
+
+
+def test_import_does_not_load_analytics_modules():
+    code = "import sys, nodesk; print(any(m in sys.modules for m in ('pandas', 'prophet')))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -1,10 +1,19 @@
-from datetime import datetime, timezone
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime, timedelta, timezone
 from typing import Any, Optional
 
 import pytest
 
 from nodesk import app
 from nodesk.core.database.session import get_mongo_db
+from nodesk.core.di import provider_for
+from nodesk.core.settings import DashboardSettings, Settings
+from nodesk.dashboard import service as dashboard_service
+from nodesk.dashboard.evolution import pack_series
 
 
 class FakeMongoCollection:
@@ -14,6 +23,9 @@ class FakeMongoCollection:
     async def find_one(self, *args: Any, **kwargs: Any) -> Optional[dict[str, Any]]:
         return self.doc
 
+    async def count_documents(self, *args: Any, **kwargs: Any) -> int:
+        return 0
+
 
 class FakeMongoDatabase:
     def __init__(self, doc: Optional[dict[str, Any]]):
@@ -23,6 +35,15 @@ class FakeMongoDatabase:
         return FakeMongoCollection(self.doc)
 
 
+class FakeDeadlineCollection:
+    def __init__(self, deadlines: list[datetime]):
+        self.deadlines = deadlines
+
+    async def count_documents(self, filter_query: dict[str, Any], *args: Any, **kwargs: Any) -> int:
+        assert list(filter_query) == ["deadline"]
+        return sum(deadline < filter_query["deadline"]["$lt"] for deadline in self.deadlines)
+
+
 @pytest.mark.asyncio
 async def test_total_expired_tickets_with_snapshot(client):
     snapshot = {
@@ -31,9 +52,17 @@ async def test_total_expired_tickets_with_snapshot(client):
         "total_expired_tickets": 7,
         "open_status_ids": [1, 2, 3],
     }
+    now = datetime.now(tz=timezone.utc)
+    # Total contado na leitura sobre a lista (dois prazos já passaram), não o do snapshot
+    deadlines = [now - timedelta(hours=1), now - timedelta(minutes=1), now + timedelta(hours=1)]
 
     async def fake_get_mongo_db():
-        yield FakeMongoDatabase(snapshot)
+        yield FakeCollectionsDatabase(
+            {
+                "expired_tickets_totals": FakeListCollection([snapshot]),
+                "expired_tickets_list": FakeDeadlineCollection(deadlines),
+            }
+        )
 
     app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
     try:
@@ -43,7 +72,7 @@ async def test_total_expired_tickets_with_snapshot(client):
 
     assert response.status_code == 200
     payload = response.json()
-    assert payload["total_expired_tickets"] == 7
+    assert payload["total_expired_tickets"] == 2
     assert payload["open_status_ids"] == [1, 2, 3]
     assert "generated_at" in payload and payload["generated_at"]
 
@@ -64,3 +93,431 @@ async def test_total_expired_tickets_without_snapshot(client):
     assert payload["total_expired_tickets"] == 0
     assert payload["open_status_ids"] == [1, 2, 3]
     assert payload["generated_at"] is None
+
+
+class FakeCursor:
+    def __init__(self, docs: list[dict[str, Any]], delay: float = 0):
+        self.docs = docs
+        self.delay = delay
+
+    def sort(self, *args: Any, **kwargs: Any) -> "FakeCursor":
+        return self
+
+    def skip(self, count: int) -> "FakeCursor":
+        return FakeCursor(self.docs[count:])
+
+    def limit(self, count: int) -> "FakeCursor":
+        return FakeCursor(self.docs[:count])
+
+    def batch_size(self, size: int) -> "FakeCursor":
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+    async def to_list(self, length: Optional[int] = None) -> list[dict[str, Any]]:
+        await asyncio.sleep(self.delay)
+        return [dict(doc) for doc in self.docs[:length]]
+
+
+class FakeListCollection:
+    def __init__(self, docs: list[dict[str, Any]], delay: float = 0, find_delay: float = 0):
+        self.docs = docs
+        self.delay = delay
+        self.find_delay = find_delay
+        self.find_calls = 0
+        self.pipelines: list[list[dict[str, Any]]] = []
+
+    def find(self, *args: Any, **kwargs: Any) -> FakeCursor:
+        self.find_calls += 1
+        self.find_args = args
+        return FakeCursor(self.docs, self.find_delay)
+
+    def aggregate(self, pipeline: list[dict[str, Any]], **kwargs: Any) -> FakeCursor:
+        # Só paginação: os documentos já estão no formato de saída
+        self.pipelines.append(pipeline)
+        cursor = FakeCursor(self.docs, self.find_delay)
+        for stage in pipeline:
+            if "$skip" in stage:
+                cursor = cursor.skip(stage["$skip"])
+            elif "$limit" in stage:
+                cursor = cursor.limit(stage["$limit"])
+        return cursor
+
+    async def find_one(self, *args: Any, **kwargs: Any) -> Optional[dict[str, Any]]:
+        await asyncio.sleep(self.delay)
+        return dict(self.docs[0]) if self.docs else None
+
+    async def count_documents(self, *args: Any, **kwargs: Any) -> int:
+        return len(self.docs)
+
+
+class FakeCollectionsDatabase:
+    def __init__(self, collections: dict[str, FakeListCollection]):
+        self.collections = collections
+
+    def __getitem__(self, name: str) -> FakeListCollection:
+        return self.collections.get(name, FakeListCollection([]))
+
+
+EXPIRED_ITEM = {
+    "tempo_vencido_minutos": 30,
+    "data_criacao": "2025-01-01T10:00:00",
+    "titulo": "Sem acesso",
+    "compania_id": 1,
+    "compania_nome": "ACME",
+    "user_vip": "Não",
+}
+
+
+def overview_database(expired_delay: float = 0) -> FakeCollectionsDatabase:
+    today = datetime.combine(datetime.today().date(), datetime.min.time())
+    return FakeCollectionsDatabase(
+        {
+            "tickets_evolution": FakeListCollection(
+                [{"date": today, "categories_count": {"Rede": 3}, "subcategories_count": {"Wi-Fi": 3}}]
+            ),
+            "critical_projects": FakeListCollection(
+                [
+                    {
+                        "_id": "snapshot-id",
+                        "generated_at": datetime.now(tz=timezone.utc),
+                        "limit": 10,
+                        "open_status_ids": [1, 2, 3],
+                        "rows": [{"product_id": 1, "product_name": "ERP", "open_tickets": 4}],
+                    }
+                ]
+            ),
+            "expired_tickets_totals": FakeListCollection(
+                [{"generated_at": None, "total_expired_tickets": 2, "open_status_ids": [1, 2, 3]}],
+                delay=expired_delay,
+            ),
+            "expired_tickets_list": FakeListCollection([dict(EXPIRED_ITEM)]),
+            "companies": FakeListCollection([{"company_id": 1, "name": "ACME", "cnpj": None}]),
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_overview_composes_all_widgets(client):
+    async def fake_get_mongo_db():
+        yield overview_database()
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get("/dashboard/overview")
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["errors"] == {}
+    assert payload["tickets_evolution"]["itens"][0]["name"] == "Rede"
+    assert payload["categories"] == [{"name": "Wi-Fi", "count": 0}]
+    assert payload["critical_projects"][0]["id"] == "snapshot-id"
+    # Contado sobre a lista: o mesmo total da rota da lista
+    assert payload["total_expired_tickets"]["total_expired_tickets"] == 1
+    assert payload["expired_tickets_list"]["total"] == 1
+    assert payload["companies"]["companies"][0]["name"] == "ACME"
+
+
+@pytest.mark.asyncio
+async def test_critical_projects_range_reads_rollup_bucket(client):
+    hourly = {
+        "_id": datetime(2025, 1, 1, 10),
+        "generated_at": datetime(2025, 1, 1, 10, 59),
+        "limit": 10,
+        "open_status_ids": [1, 2, 3],
+        "rows": [{"product_id": 1, "product_name": "ERP", "open_tickets": 4}],
+        "bucket": "hour",
+        "samples": 60,
+    }
+
+    async def fake_get_mongo_db():
+        yield FakeCollectionsDatabase({"critical_projects_hourly": FakeListCollection([hourly])})
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get(
+            "/dashboard/critical_projects",
+            params={"start": "2025-01-01T00:00:00Z", "end": "2025-01-02T00:00:00Z", "bucket": "hour"},
+        )
+        invalid = await client.get("/dashboard/critical_projects", params={"bucket": "minute"})
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    (snapshot,) = response.json()
+    assert snapshot["bucket"] == "hour" and snapshot["samples"] == 60
+    assert snapshot["generated_at"] == "2025-01-01T10:59:00"
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_overview_slow_widget_times_out_alone(client):
+    async def fake_get_mongo_db():
+        yield overview_database(expired_delay=1)
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get(
+            "/dashboard/overview",
+            params={"widgets": ["total_expired_tickets", "companies"], "timeout": 0.05},
+        )
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["errors"] == {"total_expired_tickets": "timeout"}
+    assert payload["total_expired_tickets"] is None
+    assert payload["companies"]["companies"][0]["company_id"] == 1
+    assert payload["tickets_evolution"] is None
+
+
+@pytest.mark.asyncio
+async def test_expired_tickets_list_returns_etl_documents(client):
+    async def fake_get_mongo_db():
+        yield overview_database()
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get("/dashboard/expired_tickets_list", params={"limit": 10})
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    payload = response.json()
+    assert payload["total"] == 1 and payload["limit"] == 10 and payload["offset"] == 0
+    assert payload["items"][0]["data_criacao"] == "2025-01-01T10:00:00"
+    assert payload["items"][0]["compania_nome"] == "ACME"
+
+
+@pytest.mark.asyncio
+async def test_dashboard_lists_keep_only_response_fields():
+    expired = FakeListCollection(
+        [
+            {**EXPIRED_ITEM, "data_criacao": "2025-01-01T10:00:00Z"},
+            {**EXPIRED_ITEM, "data_criacao": "ontem"},
+        ]
+    )
+    companies = FakeListCollection([{"company_id": 1, "name": "ACME", "cnpj": None}])
+    db = FakeCollectionsDatabase({"expired_tickets_list": expired, "companies": companies})
+
+    # data_criacao em string ISO vira datetime; inválida, None
+    items = (await dashboard_service.get_expired_tickets_list(db))["items"]
+    assert [item["data_criacao"] for item in items] == [datetime(2025, 1, 1, 10, tzinfo=timezone.utc), None]
+
+    # Empresas projetadas nos campos de CompanyItem, sem campos extras gravados pela ETL
+    await dashboard_service.get_companies(db)
+    assert companies.find_args == ({}, {"_id": 0, "company_id": 1, "name": 1, "cnpj": 1})
+
+
+@pytest.mark.asyncio
+async def test_expired_tickets_overdue_computed_at_read_time():
+    collection = FakeListCollection([])
+    before = datetime.now(tz=timezone.utc)
+    await dashboard_service.get_expired_tickets_list(
+        FakeCollectionsDatabase({"expired_tickets_list": collection}), limit=20, offset=40, company_id=7
+    )
+
+    match, sort, skip, limit, project = collection.pipelines[0]
+    now = match["$match"]["deadline"]["$lt"]
+    assert now >= before and match["$match"]["compania_id"] == 7
+    assert sort == {"$sort": {"deadline": 1, "ticket_id": 1}}
+    assert (skip, limit) == ({"$skip": 40}, {"$limit": 20})
+    overdue = project["$replaceWith"]["tempo_vencido_minutos"]["$dateDiff"]
+    assert overdue == {"startDate": "$deadline", "endDate": now, "unit": "minute"}
+    assert list(project["$replaceWith"]) == list(dashboard_service.EXPIRED_TICKETS_EXPORT_FIELDS)
+
+
+class FakeSeriesCollection(FakeListCollection):
+    def find(self, query: dict[str, Any], *args: Any, **kwargs: Any) -> FakeCursor:
+        return FakeCursor([doc for doc in self.docs if doc["level"] == query["level"]])
+
+
+def evolution_days(start: datetime, days: int) -> list[dict]:
+    evolution = []
+    for i in range(days):
+        categories = {"Rede": i % 4} if i % 4 else {}
+        if i >= days // 2:
+            categories["Acesso"] = 2
+        evolution.append(
+            {
+                "date": start + timedelta(days=i),
+                "categories_count": categories,
+                "subcategories_count": {"Wi-Fi": categories.get("Rede", 0) + 1, "VPN": i % 3} if i % 3 else {},
+            }
+        )
+    return evolution
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("window", [(date(2024, 12, 28), date(2025, 1, 3)), (date(2024, 11, 1), date(2025, 2, 20))])
+async def test_tickets_evolution_layouts_match(window):
+    evolution = evolution_days(datetime(2024, 10, 1), 150)
+    start, end = window
+    in_window = [doc for doc in evolution if start <= doc["date"].date() <= end]
+    databases = {
+        "documents": FakeCollectionsDatabase({"tickets_evolution": FakeListCollection(in_window)}),
+        "series": FakeCollectionsDatabase({"tickets_evolution_series": FakeSeriesCollection(pack_series(evolution))}),
+    }
+
+    results = {}
+    for layout, db in databases.items():
+        settings = DashboardSettings(TICKETS_EVOLUTION_LAYOUT=layout)
+        results[layout] = (
+            await dashboard_service.get_tickets_evolution(db, settings, start, end, subcategories=False),
+            await dashboard_service.get_tickets_evolution(db, settings, start, end, subcategories=True),
+            await dashboard_service.get_top_subcategories(db, settings, start, end),
+        )
+
+    assert results["series"] == results["documents"]
+    categories, _, top = results["series"]
+    assert {item["name"] for item in categories["itens"]} == {"Rede", "Acesso"}
+    assert [item["name"] for item in top] == ["Wi-Fi", "VPN"]
+
+
+def expired_export_database(rows: int) -> FakeCollectionsDatabase:
+    docs = [
+        {
+            "tempo_vencido_minutos": rows - i,
+            "data_criacao": "2025-01-01T10:00:00",
+            "titulo": f"Chamado {i}, urgente",
+            "compania_id": 1,
+            "compania_nome": "ACME",
+            "user_vip": "Não",
+        }
+        for i in range(rows)
+    ]
+    return FakeCollectionsDatabase({"expired_tickets_list": FakeListCollection(docs)})
+
+
+@pytest.mark.asyncio
+async def test_export_expired_tickets_ndjson(client):
+    async def fake_get_mongo_db():
+        yield expired_export_database(1200)
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get("/dashboard/expired_tickets_list/export")
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert len(lines) == 1200
+    assert json.loads(lines[0])["tempo_vencido_minutos"] == 1200
+    assert json.loads(lines[-1])["titulo"] == "Chamado 1199, urgente"
+
+
+@pytest.mark.asyncio
+async def test_export_expired_tickets_csv_gzip(client):
+    async def fake_get_mongo_db():
+        yield expired_export_database(3)
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get("/dashboard/expired_tickets_list/export", params={"format": "csv", "gzip": True})
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="expired_tickets.csv.gz"' in response.headers["content-disposition"]
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode("utf-8-sig"))))
+    assert rows[0] == ["tempo_vencido_minutos", "data_criacao", "titulo", "compania_id", "compania_nome", "user_vip"]
+    assert rows[1] == ["3", "2025-01-01T10:00:00", "Chamado 0, urgente", "1", "ACME", "Não"]
+    assert len(rows) == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("accept_encoding", ["gzip", "br", "gzip;q=0.5, br"])
+async def test_large_dashboard_payload_is_compressed(client, accept_encoding):
+    async def fake_get_mongo_db():
+        yield expired_export_database(200)
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get(
+            "/dashboard/expired_tickets_list",
+            params={"limit": 200},
+            headers={"Accept-Encoding": accept_encoding},
+        )
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == accept_encoding.split(",")[-1].split(";")[0].strip()
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()["items"]) == 200
+
+
+@pytest.mark.asyncio
+async def test_small_dashboard_payload_is_not_compressed(client):
+    async def fake_get_mongo_db():
+        yield FakeMongoDatabase(None)
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        response = await client.get("/dashboard/total_expired_tickets", headers={"Accept-Encoding": "gzip"})
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_compression_settings_are_injected(client):
+    async def fake_get_mongo_db():
+        yield FakeMongoDatabase(None)
+
+    # Settings vêm do provider ligado no lifespan: sobrescrevê-lo muda o limiar
+    bound = app.dependency_overrides[provider_for(Settings)]
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    app.dependency_overrides[provider_for(Settings)] = lambda: Settings(COMPRESSION_MINIMUM_SIZE=0)
+    try:
+        response = await client.get("/dashboard/total_expired_tickets", headers={"Accept-Encoding": "gzip"})
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+        app.dependency_overrides[provider_for(Settings)] = bound
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_identical_evolution_requests_are_coalesced(client):
+    today = datetime.combine(datetime.today().date(), datetime.min.time())
+    evolution = FakeListCollection(
+        [{"date": today, "categories_count": {"Rede": 3}, "subcategories_count": {"Wi-Fi": 3}}],
+        find_delay=0.1,
+    )
+
+    async def fake_get_mongo_db():
+        yield FakeCollectionsDatabase({"tickets_evolution": evolution})
+
+    params = {"start_date": "2025-01-01", "end_date": "2025-01-05"}
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        before = (await client.get("/dashboard/coalescing")).json()
+        responses = await asyncio.gather(*(client.get("/dashboard/tickets_evolution", params=params) for _ in range(5)))
+        after = (await client.get("/dashboard/coalescing")).json()
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.content for r in responses}) == 1
+    assert evolution.find_calls == 1
+    assert after["requests"] - before["requests"] == 5
+    assert after["executions"] - before["executions"] == 1
+    assert after["coalesced"] - before["coalesced"] == 4
+    assert after["in_flight"] == 0
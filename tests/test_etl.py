@@ -0,0 +1,660 @@
+import threading
+import time
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import pandas as pd
+import pytest
+from pymongo import DeleteMany, UpdateOne
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.dialects import mssql
+from sqlalchemy.orm import Session
+
+from nodesk.etl.models import (
+    Base,
+    Category,
+    Company,
+    Priority,
+    Product,
+    SLAPlan,
+    Status,
+    Subcategory,
+    Ticket,
+    TicketStatusHistory,
+    User,
+)
+from nodesk.etl.open_tickets import extract_open_tickets
+from nodesk.etl.incremental import WATERMARKS_COLLECTION, sync
+from nodesk.etl.pipelines import evolution_chart, expired_tickets, kpi_snapshots
+from nodesk.etl.pipelines.companies import COMPANIES
+from nodesk.etl.pipelines.snapshot_retention import compact
+from nodesk.etl import scheduler, sink
+from nodesk.etl.scheduler import LOCKS_COLLECTION, SCHEDULE_COLLECTION, Lease, Scheduler, build_jobs
+from nodesk.etl.schedules import parse_schedule
+from nodesk.etl.synthetic import Volumes, generate
+
+
+class FakeSyncCollection:
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.docs: list[dict] = []
+        self.operations: list = []
+        self.pipelines: list[list[dict]] = []
+        self.deletes: list[dict] = []
+
+    def create_index(self, *args, **kwargs) -> None:
+        pass
+
+    def find(self, *args, **kwargs) -> list[dict]:
+        return list(self.docs)
+
+    def find_one(self, filter_query: dict, *args, **kwargs) -> Optional[dict]:
+        return next((doc for doc in self.docs if filter_query.items() <= doc.items()), None)
+
+    def insert_one(self, doc: dict) -> None:
+        self.docs.append(doc)
+
+    def update_one(self, filter_query: dict, update: dict, upsert: bool = False) -> None:
+        doc = self.find_one(filter_query)
+        if doc is None:
+            doc = dict(filter_query)
+            self.docs.append(doc)
+        doc.update(update["$set"])
+
+    def bulk_write(self, operations: list, ordered: bool = True) -> None:
+        self.operations.extend(operations)
+
+    def delete_many(self, filter_query: dict) -> SimpleNamespace:
+        self.deletes.append(filter_query)
+        return SimpleNamespace(deleted_count=1)
+
+    def with_options(self, **kwargs) -> "FakeSyncCollection":
+        return self
+
+    def aggregate(self, pipeline: list[dict]) -> list[dict]:
+        self.pipelines.append(pipeline)
+        return []
+
+
+class FakeSyncDatabase(dict):
+    def __missing__(self, name: str) -> FakeSyncCollection:
+        self[name] = FakeSyncCollection(name)
+        return self[name]
+
+
+@pytest.fixture
+def sqlite_engine():
+    """
+    SQLite no lugar do SQL Server, com o mesmo esquema (sem o schema dbo).
+    """
+    engine = create_engine("sqlite://", execution_options={"schema_translate_map": {"dbo": None}})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def ticket_row(ticket_id: int, created_at: datetime, **columns) -> dict:
+    return {
+        "TicketId": ticket_id,
+        "CompanyId": 1,
+        "CreatedByUserId": 1,
+        "CategoryId": 1,
+        "PriorityId": 1,
+        "CurrentStatusId": 1,
+        "SLAPlanId": 1,
+        "Title": f"Ticket {ticket_id}",
+        "CreatedAt": created_at,
+        **columns,
+    }
+
+
+@pytest.fixture
+def sqlite_tickets(sqlite_engine):
+    engine = sqlite_engine
+    tickets = [
+        # (id, categoria, subcategoria, criado em)
+        (1, 1, 1, datetime(2025, 1, 1, 9)),
+        (2, 1, 2, datetime(2025, 1, 1, 15)),
+        (3, 2, 3, datetime(2025, 1, 2, 10)),
+        (4, 2, 3, datetime(2025, 1, 3, 8)),
+        (5, 1, None, datetime(2025, 1, 2, 11)),  # sem subcategoria: fora da evolução
+        (6, 2, 3, datetime(2025, 1, 6, 12)),
+    ]
+    history = [
+        # (ticket, para status, quando)
+        (1, 2, datetime(2025, 1, 1, 10)),
+        (1, 4, datetime(2025, 1, 3, 18)),
+        (1, 1, datetime(2025, 1, 5, 9)),  # reaberto
+        (2, 5, datetime(2025, 1, 2, 8)),
+        (3, 3, datetime(2025, 1, 4, 8)),
+        (3, 4, datetime(2025, 1, 4, 17)),  # reabre e fecha no mesmo dia: fechado
+        (4, 2, datetime(2025, 1, 4, 9)),
+        (6, 5, datetime(2025, 1, 6, 13)),  # criado e fechado no mesmo dia
+    ]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Category.__table__), [{"CategoryId": 1, "Name": "Rede"}, {"CategoryId": 2, "Name": "Acesso"}]
+        )
+        conn.execute(
+            insert(Subcategory.__table__),
+            [
+                {"SubcategoryId": 1, "CategoryId": 1, "Name": "Wi-Fi"},
+                {"SubcategoryId": 2, "CategoryId": 1, "Name": "VPN"},
+                {"SubcategoryId": 3, "CategoryId": 2, "Name": "Senha"},
+            ],
+        )
+        conn.execute(
+            insert(Ticket.__table__),
+            [
+                ticket_row(ticket_id, created_at, CategoryId=category_id, SubcategoryId=subcategory_id)
+                for ticket_id, category_id, subcategory_id, created_at in tickets
+            ],
+        )
+        conn.execute(
+            insert(TicketStatusHistory.__table__),
+            [
+                {"HistoryId": history_id, "TicketId": ticket_id, "ToStatusId": status, "ChangedAt": at}
+                for history_id, (ticket_id, status, at) in enumerate(history, start=1)
+            ],
+        )
+    return engine
+
+
+def test_evolution_sql_matches_pandas(sqlite_tickets):
+    end_date = date(2025, 1, 8)
+
+    df_first_date, df_tickets = evolution_chart.extract_sqlserver_for_evolution_chart(sqlite_tickets)
+    expected = evolution_chart.transform_tickets(df_first_date, df_tickets, end_date=end_date)
+    evolution = evolution_chart.extract_daily_open_counts(sqlite_tickets, end_date=end_date)
+
+    assert evolution == expected
+    assert [doc["date"] for doc in evolution][:2] == [datetime(2025, 1, 1), datetime(2025, 1, 2)]
+    assert evolution[3] == {
+        "date": datetime(2025, 1, 4),
+        "categories_count": {"Acesso": 1},
+        "subcategories_count": {"Senha": 1},
+    }
+    assert evolution[-1]["categories_count"] == {"Rede": 1, "Acesso": 1}
+
+
+def test_evolution_transform_counts_by_code():
+    df_first_date = pd.DataFrame({"FirstCreatedAt": [datetime(2025, 1, 1, 9)]})
+    df_tickets = pd.DataFrame(
+        [
+            # ticket 1: fechado no dia 2 e reaberto/fechado de novo no dia 3 (abre antes de fechar)
+            (1, 1, 4, datetime(2025, 1, 2, 10), "Rede", "Wi-Fi", datetime(2025, 1, 1, 9)),
+            (1, 4, 1, datetime(2025, 1, 3, 8), "Rede", "Wi-Fi", datetime(2025, 1, 1, 9)),
+            (1, 1, 5, datetime(2025, 1, 3, 18), "Rede", "Wi-Fi", datetime(2025, 1, 1, 9)),
+            # ticket 2: sem histórico
+            (2, None, None, None, "Acesso", "Senha", datetime(2025, 1, 2, 12)),
+        ],
+        columns=["TicketId", "FromStatusId", "ToStatusId", "ChangedAt", "Category", "Subcategories", "CreatedAt"],
+    ).astype({"Category": "category", "Subcategories": "category"})
+
+    days, category_counts, categories, _, _ = evolution_chart.open_counts_by_code(
+        df_first_date, df_tickets, end_date=date(2025, 1, 3)
+    )
+
+    assert categories == ["Acesso", "Rede"]
+    assert category_counts.tolist() == [[0, 1], [1, 0], [1, 0]]
+    assert evolution_chart.transform_tickets(df_first_date, df_tickets, end_date=date(2025, 1, 3))[0] == {
+        "date": datetime(2025, 1, 1),
+        "categories_count": {"Rede": 1},
+        "subcategories_count": {"Wi-Fi": 1},
+    }
+
+
+def test_kpi_resolution_stats_group_by_has_no_parameters(sqlite_tickets):
+    stmt = kpi_snapshots._resolution_stats_query()
+    # SQL Server só aceita o GROUP BY se a expressão for idêntica à do SELECT: sem parâmetros (cada ? é distinto)
+    compiled = str(stmt.compile(dialect=mssql.dialect()))
+    group_by = compiled.split("GROUP BY")[-1]
+    assert "DATEDIFF(day" in group_by and ":" not in group_by
+
+    # E o SQLite continua executando a mesma consulta
+    with Session(sqlite_tickets) as session:
+        kpi_snapshots._resolution_stats(session)
+
+
+def test_open_tickets_feed_critical_projects_and_expired(sqlite_engine):
+    now = datetime.now()
+    with sqlite_engine.begin() as conn:
+        conn.execute(
+            insert(SLAPlan.__table__),
+            [
+                {"SLAPlanId": 1, "Name": "Padrão", "ResolutionMins": 60},
+                {"SLAPlanId": 2, "Name": "Sem prazo", "ResolutionMins": None},
+            ],
+        )
+        conn.execute(insert(Company.__table__), [{"CompanyId": 1, "Name": "ACME"}])
+        conn.execute(
+            insert(User.__table__),
+            [{"UserId": 1, "CompanyId": 1, "FullName": "Ana", "IsVIP": True}],
+        )
+        conn.execute(insert(Product.__table__), [{"ProductId": 1, "Name": "ERP"}, {"ProductId": 2, "Name": "CRM"}])
+        conn.execute(
+            insert(Ticket.__table__),
+            [
+                ticket_row(1, now - timedelta(hours=5), ProductId=1),  # vencido há ~4h
+                ticket_row(2, now - timedelta(hours=2), ProductId=1),  # vencido há ~1h
+                ticket_row(3, now - timedelta(minutes=10), ProductId=2),  # no prazo
+                ticket_row(4, now - timedelta(days=3), ProductId=2, SLAPlanId=2),  # plano sem prazo
+                ticket_row(5, now - timedelta(days=3), ProductId=None),  # sem produto
+                ticket_row(6, now - timedelta(days=3), ProductId=2, CurrentStatusId=5),  # fechado
+            ],
+        )
+
+    open_tickets = extract_open_tickets(sqlite_engine)
+
+    assert len(open_tickets) == 5
+    assert open_tickets.top_products(10) == [(1, "ERP", 2), (2, "CRM", 2)]
+    assert open_tickets.top_products(1) == [(1, "ERP", 2)]
+
+    index, overdue = open_tickets.expired()
+    assert open_tickets.ticket_id[index].tolist() == [5, 1, 2]
+    assert 4 * 60 - 1 <= overdue[1] <= 4 * 60 + 1
+    assert 60 - 1 <= overdue[2] <= 60 + 1
+    assert open_tickets.user_vip[index].all()
+
+    mongo = FakeSyncDatabase()
+    expired_tickets.run(open_tickets=open_tickets, db=mongo)
+
+    assert mongo["expired_tickets_totals"].docs[0]["total_expired_tickets"] == 3
+    # Lista: prazo (UTC) de todo ticket aberto com SLA de resolução; o atraso é calculado na leitura
+    upserts = [op for op in mongo["expired_tickets_list"].operations if isinstance(op, UpdateOne)]
+    documents = expired_tickets.deadline_documents(open_tickets)
+    assert upserts == [UpdateOne({"ticket_id": key}, {"$set": doc}, upsert=True) for key, doc in documents.items()]
+    utc_now = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+    assert sorted(documents) == [1, 2, 3, 5]
+    assert sorted(key for key, doc in documents.items() if doc["deadline"] < utc_now) == [1, 2, 5]
+
+    # Próxima execução: só as mudanças (ticket 1 resolvido, título do ticket 2) são aplicadas
+    mongo["expired_tickets_list"].docs = [dict(doc) for doc in documents.values()]
+    mongo["expired_tickets_list"].operations.clear()
+    with sqlite_engine.begin() as conn:
+        conn.execute(update(Ticket.__table__).where(Ticket.ticket_id == 1).values(CurrentStatusId=4))
+        conn.execute(update(Ticket.__table__).where(Ticket.ticket_id == 2).values(Title="Novo título"))
+    expired_tickets.run(open_tickets=extract_open_tickets(sqlite_engine), db=mongo)
+
+    assert upserted_keys(mongo["expired_tickets_list"], "ticket_id") == [2]
+    assert DeleteMany({"ticket_id": {"$in": [1]}}) in mongo["expired_tickets_list"].operations
+
+
+def upserted_keys(collection: FakeSyncCollection, field: str) -> list:
+    return [op._filter[field] for op in collection.operations if isinstance(op, UpdateOne)]
+
+
+def test_incremental_sync_reads_only_changes(sqlite_tickets):
+    mongo = FakeSyncDatabase()
+    with sqlite_tickets.begin() as conn:
+        conn.execute(
+            insert(Company.__table__),
+            [
+                {"CompanyId": 1, "Name": "ACME", "CreatedAt": datetime(2025, 1, 1)},
+                {"CompanyId": 2, "Name": "Globex", "CreatedAt": datetime(2025, 1, 2)},
+                {"CompanyId": 4, "Name": "Umbrella", "CreatedAt": None},
+            ],
+        )
+        conn.execute(insert(Priority.__table__), [{"PriorityId": 1, "Name": "Alta"}])
+        conn.execute(insert(Status.__table__), [{"StatusId": s, "Name": f"Status {s}"} for s in range(1, 6)])
+
+    first = sync(COMPANIES, sqlite_tickets, mongo, batch_size=1)
+    assert (first.rows, first.batches, first.watermark) == (3, 3, datetime(2025, 1, 2))
+    assert mongo[WATERMARKS_COLLECTION].find_one({"_id": "companies"})["value"] == datetime(2025, 1, 2)
+
+    with sqlite_tickets.begin() as conn:
+        conn.execute(
+            insert(Company.__table__), [{"CompanyId": 3, "Name": "Initech", "CreatedAt": datetime(2025, 2, 1)}]
+        )
+    mongo["companies"].operations.clear()
+    second = sync(COMPANIES, sqlite_tickets, mongo)
+    # >= no watermark: a linha de fronteira é relida (upsert idempotente), e a sem CreatedAt também
+    assert sorted(upserted_keys(mongo["companies"], "company_id")) == [2, 3, 4]
+    assert second.watermark == datetime(2025, 2, 1)
+
+    # Edição e exclusão não mexem em CreatedAt: só a reconciliação as vê
+    with sqlite_tickets.begin() as conn:
+        conn.execute(update(Company.__table__).where(Company.company_id == 1).values(Name="ACME S.A."))
+        conn.execute(Company.__table__.delete().where(Company.company_id == 2))
+    mongo["companies"].operations.clear()
+    sync(COMPANIES, sqlite_tickets, mongo)
+    assert 1 not in upserted_keys(mongo["companies"], "company_id")
+
+    mongo["companies"].operations.clear()
+    full = sync(COMPANIES, sqlite_tickets, mongo, full=True)
+    renamed = [op for op in mongo["companies"].operations if op._filter == {"company_id": 1}]
+    assert renamed[0]._doc["$set"]["name"] == "ACME S.A."
+    ((deleted_filter,),) = [list(delete.values()) for delete in mongo["companies"].deletes]
+    assert sorted(deleted_filter["$nin"]) == [1, 3, 4] and full.deleted == 1
+
+
+@pytest.mark.parametrize(
+    ("spec", "moment", "expected"),
+    [
+        ("@every 90s", datetime(2025, 1, 1, 10, 0, 30), datetime(2025, 1, 1, 10, 2)),
+        ("*/15 * * * *", datetime(2025, 1, 1, 10, 0, 30), datetime(2025, 1, 1, 10, 15)),
+        ("5 * * * *", datetime(2025, 1, 1, 10, 5), datetime(2025, 1, 1, 11, 5)),
+        ("30 2 * * *", datetime(2025, 12, 31, 3), datetime(2026, 1, 1, 2, 30)),
+        ("0 9 * * 1-5", datetime(2025, 1, 3, 9), datetime(2025, 1, 6, 9)),  # sexta -> segunda
+        ("0 0 1 * 0", datetime(2025, 1, 1, 12), datetime(2025, 1, 5)),  # dia 1 OU domingo
+        ("0 0 29 2 *", datetime(2025, 3, 1), datetime(2028, 2, 29)),
+    ],
+)
+def test_schedules_next_run(spec, moment, expected):
+    assert parse_schedule(spec).next_after(moment) == expected
+
+
+@pytest.mark.parametrize("spec", ["* * * *", "60 * * * *", "@every 0s", "*/0 * * * *"])
+def test_schedules_reject_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_schedule(spec)
+
+
+def test_scheduler_lease_and_overlap(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().db
+
+    first = Lease(db, "expired_tickets", "etl-1", seconds=60)
+    second = Lease(db, "expired_tickets", "etl-2", seconds=60)
+    assert first.acquire() and first.acquire()  # reentrante para o mesmo dono
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+
+    # Lease vencido (dono morto) pode ser assumido
+    db[LOCKS_COLLECTION].update_one({"_id": "expired_tickets"}, {"$set": {"expires_at": datetime(2000, 1, 1)}})
+    assert first.acquire()
+    first.release()
+
+    started, gate = [], threading.Event()
+
+    def slow_pipeline():
+        started.append(1)
+        gate.wait(5)
+        return "ok"
+
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    monkeypatch.setitem(scheduler.JOBS, "expired_tickets", ((slow_pipeline,), "@every 1m"))
+    jobs = [job for job in build_jobs(now=now) if job.name == "expired_tickets"]
+    daemon = Scheduler(jobs, db=db, workers=2, lease_seconds=60, owner="etl-1")
+
+    assert daemon.tick(now) == ["expired_tickets"]
+    assert jobs[0].next_run == now + timedelta(minutes=1)
+    # Execução anterior ainda rodando: não dispara de novo
+    assert daemon.tick(now + timedelta(minutes=1)) == []
+    gate.set()
+    daemon.executor.shutdown(wait=True)
+
+    assert started == [1]
+    report = db[SCHEDULE_COLLECTION].find_one({"_id": "expired_tickets"})
+    assert report["last_status"] == "ok" and report["next_run_at"] == datetime(2025, 1, 1, 0, 2)
+    assert db[LOCKS_COLLECTION].count_documents({}) == 0
+
+
+def test_scheduler_shares_recent_open_tickets_extract():
+    extracts = []
+
+    def extract():
+        extracts.append(object())
+        return extracts[-1]
+
+    # expired_tickets e critical_projects no mesmo minuto: uma leitura só
+    shared = scheduler.SharedOpenTickets(max_age=60, extract=extract)
+    assert shared.get() is shared.get() is extracts[0]
+
+    # Vencida a idade máxima, a próxima execução lê de novo
+    shared.max_age = 0
+    assert shared.get() is extracts[1]
+
+
+class RecordingCollection:
+    name = "recorded"
+
+    def __init__(self):
+        self.written = 0
+
+    def bulk_write(self, operations, ordered=True):
+        self.written += len(operations)
+
+
+def test_scheduler_interrupts_job_when_lease_is_lost(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().db
+    collection, second = RecordingCollection(), []
+
+    def operations():
+        for i in range(500):
+            time.sleep(0.005)
+            yield UpdateOne({"_id": i}, {"$set": {"n": i}}, upsert=True)
+
+    def writer():
+        return str(sink.write(collection, operations(), batch_size=1, workers=1))
+
+    monkeypatch.setattr(Lease, "renew", lambda self: False)
+    monkeypatch.setitem(scheduler.JOBS, "kpi", ((writer, lambda: second.append(1)), "@every 1m"))
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    jobs = [job for job in build_jobs(now=now) if job.name == "kpi"]
+    daemon = Scheduler(jobs, db=db, workers=1, lease_seconds=0.03, owner="etl-1")
+    daemon.tick(now)
+    daemon.executor.shutdown(wait=True)
+
+    # A escrita parou entre lotes e o pipeline seguinte não rodou
+    assert 0 < collection.written < 500 and second == []
+    report = db[SCHEDULE_COLLECTION].find_one({"_id": "kpi"})
+    assert report["last_status"] == "lease_lost" and "WriteInterrupted" in report["last_results"][-1]
+    assert db[LOCKS_COLLECTION].count_documents({}) == 0
+
+
+def test_snapshot_compaction_resumes_from_last_bucket():
+    mongo = FakeSyncDatabase()
+    raw, hourly = mongo["critical_projects"], mongo["critical_projects_hourly"]
+
+    compact(raw, hourly, "hour")
+    assert raw.pipelines[-1][0] == {"$match": {"generated_at": {"$type": "date"}}}
+
+    # O último intervalo compactado é recalculado (podia estar incompleto)
+    hourly.docs = [{"_id": datetime(2025, 1, 1, 10)}]
+    compact(raw, hourly, "hour")
+    match, sort, group, replace, merge = raw.pipelines[-1]
+    assert match == {"$match": {"generated_at": {"$gte": datetime(2025, 1, 1, 10)}}}
+    assert group["$group"]["_id"] == {"$dateTrunc": {"date": "$generated_at", "unit": "hour"}}
+    assert merge["$merge"]["into"] == "critical_projects_hourly" and merge["$merge"]["on"] == "_id"
+
+
+def test_sink_acknowledges_concurrent_batches_in_order(monkeypatch):
+    monkeypatch.setattr(sink.settings, "ETL_RELAXED_WRITE_CONCERN", True)
+    release = threading.Event()
+
+    class SlowFirstBatch(FakeSyncCollection):
+        write_concern = None
+
+        def with_options(self, write_concern=None, **kwargs) -> "SlowFirstBatch":
+            self.write_concern = write_concern
+            return self
+
+        def bulk_write(self, operations: list, ordered: bool = True) -> None:
+            assert not ordered
+            if operations[0]._filter["ticket_id"] == 0:
+                # O primeiro lote termina por último
+                assert release.wait(5)
+            elif operations[0]._filter["ticket_id"] == 4:
+                release.set()
+            if operations[0]._filter["ticket_id"] == 2 and self.name == "falha":
+                raise ConnectionError("Mongo indisponível")
+            super().bulk_write(operations, ordered)
+
+    def upserts(count: int):
+        return (UpdateOne({"ticket_id": n}, {"$set": {"n": n}}, upsert=True) for n in range(count))
+
+    collection = SlowFirstBatch()
+    acknowledged = []
+    report = sink.write(collection, upserts(7), batch_size=2, workers=3, rebuildable=True, on_batch=acknowledged.append)
+    assert acknowledged == [2, 4, 6, 7]
+    assert (report.documents, report.batches) == (7, 4)
+    assert sorted(upserted_keys(collection, "ticket_id")) == list(range(7))
+    assert collection.write_concern == sink.RELAXED_WRITE_CONCERN
+
+    # O terceiro lote foi gravado, mas o segundo falhou: a confirmação para no primeiro
+    release.clear()
+    acknowledged.clear()
+    failing = SlowFirstBatch("falha")
+    with pytest.raises(ConnectionError):
+        sink.write(failing, upserts(9), batch_size=2, workers=3, on_batch=acknowledged.append)
+    assert acknowledged == [2] and 4 in upserted_keys(failing, "ticket_id")
+
+
+def test_evolution_pipeline_resumes_after_failed_load(sqlite_tickets, monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    from pymongo import ReplaceOne
+
+    db = mongomock.MongoClient().db
+    db["tickets_evolution"].insert_one({"_id": "anterior", "date": datetime(2024, 1, 1)})
+    monkeypatch.setattr(evolution_chart, "BATCH_SIZE", 2)
+    # Um lote por vez: a falha cai sempre no terceiro lote enviado
+    monkeypatch.setattr(sink.settings, "ETL_WRITE_WORKERS", 1)
+    monkeypatch.setattr(evolution_chart.settings, "TICKETS_EVOLUTION_LAYOUT", "documents")
+
+    # O bulk_write do mongomock não aceita as operações do pymongo atual; aplica os upserts um a um
+    writes = {"tickets_evolution_staging": 0}
+
+    def bulk_write(collection, operations, ordered=True):
+        if collection.name in writes:
+            writes[collection.name] += 1
+            if writes[collection.name] == 3:
+                raise ConnectionError("Mongo indisponível")
+        for operation in operations:
+            assert isinstance(operation, ReplaceOne)
+            collection.replace_one(operation._filter, operation._doc, upsert=True)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+
+    with pytest.raises(ConnectionError):
+        evolution_chart.evolution_chart_pipeline(db, sqlite_tickets, end_date=date(2025, 1, 8))
+
+    # A coleção publicada não foi esvaziada; o checkpoint guarda etapa e offsets
+    assert [doc["_id"] for doc in db["tickets_evolution"].find()] == ["anterior"]
+    checkpoint = db["etl_checkpoints"].find_one({"_id": "evolution_chart"})
+    assert checkpoint["stage"] == "load" and checkpoint["state"]["loaded"] == 4
+    extracted = checkpoint["state"]["extracted"]
+
+    monkeypatch.setattr(evolution_chart, "extract_to_staging", lambda *args: pytest.fail("extração refeita"))
+    evolution_chart.evolution_chart_pipeline(db, sqlite_tickets, end_date=date(2025, 1, 8))
+
+    expected = evolution_chart.extract_daily_open_counts(sqlite_tickets, end_date=date(2025, 1, 8))
+    loaded = list(db["tickets_evolution"].find({}, {"_id": 0}, sort=[("date", 1)]))
+    assert loaded == expected and extracted > 0
+    assert writes["tickets_evolution_staging"] == 3 + (len(expected) - 4 + 1) // 2
+    assert db["etl_checkpoints"].find_one({"_id": "evolution_chart"}) is None
+    assert set(db.list_collection_names()) == {"tickets_evolution"}
+
+
+def test_evolution_load_reads_staging_in_key_order(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    from nodesk.etl.checkpoints import Checkpoint
+
+    db = mongomock.MongoClient().db
+    day = datetime(2025, 1, 1)
+    # Vários nomes no mesmo dia, gravados fora da ordem da chave
+    for name in ("Rede", "Acesso", "Hardware"):
+        db[evolution_chart.EXTRACT_STAGING].insert_one(evolution_chart._staged_row(day.date(), "category", name, 1))
+    checkpoint = Checkpoint.resume("evolution_chart", {"end_date": "2025-01-01", "layout": "series"}, db)
+    checkpoint.save(start_date=day)
+
+    loaded = []
+    monkeypatch.setattr(evolution_chart, "write_batches", lambda _, name, docs, *args: loaded.extend(docs))
+    evolution_chart.load_to_staging(checkpoint)
+
+    # Séries sempre na mesma ordem: o offset de uma carga retomada aponta para o mesmo documento
+    assert [doc["name"] for doc in loaded] == ["Acesso", "Hardware", "Rede"]
+
+
+def test_evolution_extract_resumes_after_last_staged_key(sqlite_tickets, monkeypatch, tmp_path):
+    mongomock = pytest.importorskip("mongomock")
+    from pymongo import ReplaceOne
+    from sqlalchemy.exc import OperationalError
+
+    end_date = date(2025, 1, 8)
+    with sqlite_tickets.connect() as conn:
+        rows = conn.execute(evolution_chart.daily_open_counts_query(end_date)).all()
+        after = conn.execute(evolution_chart.daily_open_counts_query(end_date, tuple(rows[3][:3]))).all()
+    assert after == rows[4:]
+
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(evolution_chart, "BATCH_SIZE", 2)
+    monkeypatch.setattr(sink.settings, "ETL_WRITE_WORKERS", 1)
+    monkeypatch.setattr(evolution_chart.settings, "EVOLUTION_EXTRACTION", "sql")
+    writes = {evolution_chart.EXTRACT_STAGING: 0}
+
+    def bulk_write(collection, operations, ordered=True):
+        if collection.name in writes:
+            writes[collection.name] += 1
+            if writes[collection.name] == 3:
+                raise ConnectionError("Mongo indisponível")
+        for operation in operations:
+            assert isinstance(operation, ReplaceOne)
+            collection.replace_one(operation._filter, operation._doc, upsert=True)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+
+    with pytest.raises(ConnectionError):
+        evolution_chart.evolution_chart_pipeline(db, sqlite_tickets, end_date=end_date)
+    checkpoint = db["etl_checkpoints"].find_one({"_id": "evolution_chart"})
+    day, level, name, _ = rows[3]
+    assert checkpoint["stage"] == "extract" and checkpoint["state"]["extracted"] == 4
+    assert checkpoint["state"]["extracted_key"] == [evolution_chart.normalize_date(day), level, name]
+
+    # Queda do SQL Server: sem fallback para o pandas, a staging e o checkpoint ficam para a próxima execução
+    monkeypatch.setattr(
+        evolution_chart, "extract_sqlserver_for_evolution_chart", lambda *args: pytest.fail("fallback pandas")
+    )
+    offline = create_engine(f"sqlite:///{tmp_path / 'inexistente' / 'nodesk.db'}")
+    with pytest.raises(OperationalError):
+        evolution_chart.evolution_chart_pipeline(db, offline, end_date=end_date)
+    assert db[evolution_chart.EXTRACT_STAGING].count_documents({}) == 4
+    assert db["etl_checkpoints"].find_one({"_id": "evolution_chart"})["state"] == checkpoint["state"]
+
+    evolution_chart.evolution_chart_pipeline(db, sqlite_tickets, end_date=end_date)
+    expected = evolution_chart.extract_daily_open_counts(sqlite_tickets, end_date=end_date)
+    assert list(db["tickets_evolution"].find({}, {"_id": 0}, sort=[("date", 1)])) == expected
+    # Só as linhas depois da chave salva foram extraídas de novo
+    assert writes[evolution_chart.EXTRACT_STAGING] == 3 + (len(rows) - 4 + 1) // 2
+
+
+def test_synthetic_data_matches_etl_on_generated_tables(tmp_path):
+    mongomock = pytest.importorskip("mongomock")
+
+    db = mongomock.MongoClient().db
+    url = f"sqlite:///{tmp_path / 'synthetic.db'}"
+    now = datetime(2025, 3, 1, 12)
+    # Coleções que o gerador não grava ficam intactas
+    db["etl_checkpoints"].insert_one({"_id": "evolution_chart", "state": {}})
+    counts = generate(Volumes(tickets=2000, days=60), sql_url=url, mongo_db=db, now=now, chunk_size=700)
+    assert db["etl_checkpoints"].count_documents({}) == 1
+    assert counts["tickets"] == 2000 and counts["history"] > counts["tickets"]
+
+    engine = create_engine(url, execution_options={"schema_translate_map": {"dbo": None}})
+    try:
+        # Evolução gravada direto no Mongo = a que a ETL extrai das tabelas geradas
+        expected = evolution_chart.extract_daily_open_counts(engine, end_date=now.date())
+        evolution = list(db["tickets_evolution"].find({}, {"_id": 0}, sort=[("date", 1)]))
+        assert evolution[-len(expected) :] == expected
+        assert not any(doc["categories_count"] for doc in evolution[: -len(expected)])
+
+        open_tickets = extract_open_tickets(engine)
+        listed = sorted(doc["ticket_id"] for doc in db["expired_tickets_list"].find())
+        assert listed == sorted(open_tickets.ticket_id.tolist()) and len(listed) > 0
+
+        # Status atual = último destino do histórico
+        with engine.connect() as conn:
+            tickets = dict(conn.execute(select(Ticket.ticket_id, Ticket.current_status_id)).all())
+            history = conn.execute(
+                select(TicketStatusHistory.ticket_id, TicketStatusHistory.to_status_id).order_by(
+                    TicketStatusHistory.changed_at, TicketStatusHistory.history_id
+                )
+            ).all()
+    finally:
+        engine.dispose()
+    last = {ticket_id: 1 for ticket_id in tickets} | dict(history)
+    assert last == tickets
+    assert db["companies"].count_documents({}) == counts["companies"]
@@ -0,0 +1,447 @@
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from nodesk import app
+from nodesk.core.database.session import get_mongo_db
+from nodesk.kpi import service as kpi_service
+from nodesk.kpi.forecast import (
+    ForecastCache,
+    fit_series,
+    forecast,
+    forecast_cache,
+    load_model,
+    model_fingerprint,
+    smoothing_forecast,
+)
+from nodesk.core.settings import KPISettings
+from nodesk.kpi.prediction import PredictionService
+from nodesk.kpi.schemas import PredictionRequest
+from nodesk.kpi.tickets import (
+    CATEGORY_COLUMNS,
+    ID_COLUMNS,
+    TIMESTAMP_COLUMNS,
+    read_tickets,
+    weekly_counts_by,
+    weekly_ticket_counts,
+    write_tickets,
+)
+
+
+class FakeKPICollection:
+    def __init__(self, doc: Optional[dict[str, Any]] = None):
+        self.doc = doc
+        self.queries: list[dict[str, Any]] = []
+
+    async def find_one(self, query: dict[str, Any], *args: Any, **kwargs: Any) -> Optional[dict[str, Any]]:
+        self.queries.append(query)
+        return self.doc
+
+
+class FakeKPIDatabase:
+    def __init__(self, **collections: FakeKPICollection):
+        self.collections = collections
+
+    def __getitem__(self, name: str) -> FakeKPICollection:
+        return self.collections.setdefault(name, FakeKPICollection())
+
+
+def forecast_doc() -> dict[str, Any]:
+    return {
+        "generated_at": datetime.now(tz=timezone.utc),
+        "rows": [
+            {"ds": datetime(2025, 9, 15), "yhat": 748, "yhat_lower": 225, "yhat_upper": 1242},
+            {"ds": datetime(2025, 9, 22), "yhat": 858, "yhat_lower": 346, "yhat_upper": 1403},
+        ],
+    }
+
+
+def snapshot_doc(forecast_fingerprint: str) -> dict[str, Any]:
+    card = {"top_limit": "20", "bottom_limit": "10", "relation": False}
+    return {
+        "generated_at": datetime(2025, 9, 10, 12, 0, tzinfo=timezone.utc),
+        "cards": [
+            {"kpi_id": "1", "titulo_metrica": "Tickets Resolvidos", "valor_metrica": "15", **card},
+            {"kpi_id": "2", "titulo_metrica": "Tempo médio de atendimento", "valor_metrica": "18:53", **card},
+            {
+                "kpi_id": "3",
+                "titulo_metrica": "Previsão de chamados na próxima semana",
+                "valor_metrica": "700",
+                "model_fingerprint": forecast_fingerprint,
+                **card,
+            },
+            {"kpi_id": "4", "titulo_metrica": "Tickets Abertos", "valor_metrica": "5", **card},
+            {"kpi_id": "5", "titulo_metrica": "Tickets resolvidos dentro do SLA", "valor_metrica": "87%", **card},
+        ],
+    }
+
+
+async def fail_predict(*args: Any, **kwargs: Any):
+    raise AssertionError("predict must not run when a precomputed forecast exists")
+
+
+async def get_with_db(client, path: str, db: FakeKPIDatabase):
+    async def fake_get_mongo_db():
+        yield db
+
+    app.dependency_overrides[get_mongo_db] = fake_get_mongo_db
+    try:
+        return await client.get(path)
+    finally:
+        app.dependency_overrides.pop(get_mongo_db, None)
+
+
+@pytest.mark.asyncio
+async def test_kpi_3_reads_precomputed_forecast(client, monkeypatch):
+    forecasts = FakeKPICollection(forecast_doc())
+    monkeypatch.setattr(kpi_service, "predict", fail_predict)
+
+    response = await get_with_db(client, "/kpi/3", FakeKPIDatabase(kpi_forecasts=forecasts))
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["valor_metrica"] == "748"
+    assert payload["bottom_limit"] == "225"
+    assert payload["top_limit"] == "1242"
+    assert forecasts.queries[0]["model_fingerprint"] == model_fingerprint()
+
+
+@pytest.mark.asyncio
+async def test_kpi_3_falls_back_to_predict(client, monkeypatch):
+    calls = []
+
+    async def fake_predict(request, prediction, settings):
+        calls.append(request)
+        return [{"ds": datetime(2025, 9, 15), "yhat": 10, "yhat_lower": 5, "yhat_upper": 15}]
+
+    monkeypatch.setattr(kpi_service, "predict", fake_predict)
+
+    response = await get_with_db(client, "/kpi/3", FakeKPIDatabase())
+
+    assert response.status_code == 200
+    assert response.json()["valor_metrica"] == "10"
+    assert calls[0].periods == 1 and calls[0].freq == "W-MON"
+
+
+@pytest.mark.asyncio
+async def test_kpi_card_served_from_snapshot(client, monkeypatch):
+    forecasts = FakeKPICollection(forecast_doc())
+    db = FakeKPIDatabase(kpi_snapshots=FakeKPICollection(snapshot_doc(model_fingerprint())), kpi_forecasts=forecasts)
+    monkeypatch.setattr(kpi_service, "predict", fail_predict)
+
+    response = await get_with_db(client, "/kpi/2", db)
+    assert response.status_code == 200
+    assert response.json() == {
+        "titulo_metrica": "Tempo médio de atendimento",
+        "valor_metrica": "18:53",
+        "top_limit": "20",
+        "bottom_limit": "10",
+        "relation": False,
+    }
+
+    # Previsão embutida no snapshot para o modelo atual: nenhuma leitura extra
+    response = await get_with_db(client, "/kpi/3", db)
+    assert response.json()["valor_metrica"] == "700"
+    assert forecasts.queries == []
+
+
+@pytest.mark.asyncio
+async def test_kpi_without_snapshot_is_not_found(client):
+    response = await get_with_db(client, "/kpi/1", FakeKPIDatabase())
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_kpi_batch_returns_all_cards(client, monkeypatch):
+    # Snapshot gerado com outro modelo: o card 3 vem da previsão do modelo atual
+    db = FakeKPIDatabase(
+        kpi_snapshots=FakeKPICollection(snapshot_doc("outdated")),
+        kpi_forecasts=FakeKPICollection(forecast_doc()),
+    )
+    monkeypatch.setattr(kpi_service, "predict", fail_predict)
+
+    response = await get_with_db(client, "/kpi", db)
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["generated_at"].startswith("2025-09-10T12:00:00")
+    assert list(payload["cards"]) == ["1", "2", "3", "4", "5"]
+    assert payload["cards"]["3"]["valor_metrica"] == "748"
+    assert payload["cards"]["5"]["valor_metrica"] == "87%"
+
+
+@pytest.mark.asyncio
+async def test_kpi_batch_without_forecast_returns_other_cards(client, monkeypatch):
+    async def missing_forecast(request, prediction, settings):
+        raise HTTPException(status_code=404, detail="Nenhum ticket encontrado.")
+
+    db = FakeKPIDatabase(kpi_snapshots=FakeKPICollection(snapshot_doc("outdated")))
+    monkeypatch.setattr(kpi_service, "predict", missing_forecast)
+
+    response = await get_with_db(client, "/kpi", db)
+    assert response.status_code == 200
+    assert list(response.json()["cards"]) == ["1", "2", "4", "5"]
+
+    # Pedido sozinho, o card 3 devolve o erro da previsão
+    response = await get_with_db(client, "/kpi/3", db)
+    assert response.status_code == 404
+
+
+def test_forecast_cache_returns_copies_and_evicts():
+    cache = ForecastCache(maxsize=2)
+    cache.set("a", [{"yhat": 1}])
+    cache.set("b", [{"yhat": 2}])
+
+    rows = cache.get("a")
+    rows[0]["yhat"] = 99
+    assert cache.get("a") == [{"yhat": 1}]
+
+    cache.set("c", [{"yhat": 3}])
+    assert cache.get("b") is None
+    assert cache.hits == 2 and cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_prediction_service_runs_in_process_pool():
+    service = PredictionService(max_workers=1, timeout=60, max_concurrency=1)
+    service.start()
+    try:
+        rows = await service.predict(2, "W-MON", "2025-01-01")
+        expected = forecast(load_model(), 2, "W-MON", "2025-01-01")
+        # yhat_lower/upper vêm de amostragem aleatória; ds e yhat são determinísticos
+        assert [(row["ds"], row["yhat"]) for row in rows] == [(row["ds"], row["yhat"]) for row in expected]
+
+        first = asyncio.ensure_future(service.predict(1, "W-MON", "2025-01-01"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as busy:
+            await service.predict(1, "W-MON", "2025-01-01")
+        assert busy.value.status_code == 503
+        await first
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_prediction_service_times_out():
+    service = PredictionService(max_workers=1, timeout=0.001, max_concurrency=1)
+    service.start(warm=False)
+    try:
+        with pytest.raises(HTTPException) as timeout:
+            await service.predict(1, "W-MON", "2025-01-01")
+        assert timeout.value.status_code == 504
+    finally:
+        service.shutdown()
+
+
+def test_prediction_fingerprint_follows_loaded_model(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text("v1")
+    service = PredictionService(model_path=path)
+    first = service.fingerprint()
+
+    # O pool ainda tem o modelo antigo: o fingerprint só muda quando ele é recarregado
+    path.write_text("v2, outro modelo")
+    assert service.fingerprint() == first
+    service.start(warm=False)
+    try:
+        assert service.fingerprint() == model_fingerprint(path) != first
+    finally:
+        service.shutdown()
+
+
+def test_tickets_snapshot_roundtrip(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    path = tmp_path / "tickets.arrow"
+    columns = {
+        "ticket_id": [1, 2, 3],
+        "company_id": [10, 10, 20],
+        "product_id": [None, 5, 5],
+        "sla_plan_id": [1, 1, 2],
+        "category": ["Rede", "Rede", "Acesso"],
+        "subcategory": ["VPN", None, "Senha"],
+        "priority": ["Alta", "Baixa", "Alta"],
+        "status": ["Aberto", "Resolvido", "Aberto"],
+        "channel": ["Email", "Portal", "Email"],
+        "created_at": [datetime(2025, 1, 7, 9), datetime(2025, 1, 8, 15), datetime(2025, 1, 14, 10)],
+        "first_response_at": [None, datetime(2025, 1, 8, 16), None],
+        "closed_at": [None, datetime(2025, 1, 9), None],
+    }
+
+    assert write_tickets(columns, path) == 3
+
+    table = read_tickets(path, columns=["category", "created_at"])
+    assert table.column_names == ["category", "created_at"]
+    assert pa.types.is_dictionary(table.schema.field("category").type)
+    assert table.schema.field("created_at").type == pa.timestamp("ms")
+
+    weekly = weekly_ticket_counts(path)
+    assert weekly["y"].tolist() == [2, 1]
+
+    ds, by_category = weekly_counts_by(path, "category")
+    assert ds.tolist() == [date(2025, 1, 13), date(2025, 1, 20)]
+    assert {name: counts.tolist() for name, counts in by_category.items()} == {"Rede": [2, 0], "Acesso": [0, 1]}
+
+
+class FakePrediction:
+    def __init__(self, state: str = "ready", error: Optional[HTTPException] = None):
+        self._state = state
+        self.error = error
+        self.calls = 0
+
+    def state(self) -> str:
+        return self._state
+
+    def fingerprint(self) -> str:
+        return "modelo-atual"
+
+    async def predict(self, periods, freq, last_date):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return [{"ds": datetime(2025, 9, 15), "yhat": 1, "yhat_lower": 0, "yhat_upper": 2}]
+
+
+@pytest.fixture
+def tickets_snapshot(tmp_path):
+    pytest.importorskip("pyarrow")
+    forecast_cache.clear()
+    yield tmp_path / "tickets.arrow"
+    forecast_cache.clear()
+
+
+@pytest.fixture
+def kpi_settings(tickets_snapshot):
+    return KPISettings(KPI_TICKETS_SNAPSHOT_PATH=str(tickets_snapshot))
+
+
+def write_weekly_tickets(path, weeks: int = 30) -> None:
+    created_at = [datetime(2024, 1, 2) + timedelta(weeks=week) for week in range(weeks) for _ in range(5 + week % 3)]
+    columns = {name: [None] * len(created_at) for name in (*ID_COLUMNS, *CATEGORY_COLUMNS, *TIMESTAMP_COLUMNS)}
+    columns.update(ticket_id=list(range(len(created_at))), created_at=created_at)
+    write_tickets(columns, path)
+
+
+@pytest.mark.asyncio
+async def test_predict_reads_tickets_snapshot(tickets_snapshot, kpi_settings):
+    request = PredictionRequest(periods=1, freq="W-MON", last_date="1999-01-01", model="numpy")
+
+    # Snapshot ainda não gerado pela ETL: aquecendo (503), não ausente
+    with pytest.raises(HTTPException) as missing:
+        await kpi_service.predict(request, FakePrediction(), kpi_settings)
+    assert missing.value.status_code == 503 and "aquecendo" in missing.value.detail
+
+    # O Prophet usa o histórico do modelo, não o snapshot
+    prophet = PredictionRequest(periods=1, freq="W-MON", last_date="1999-01-01", model="prophet")
+    assert (await kpi_service.predict(prophet, FakePrediction(), kpi_settings))[0]["yhat"] == 1
+
+    write_weekly_tickets(tickets_snapshot)
+    first = await kpi_service.predict(request, FakePrediction(), kpi_settings)
+
+    # Snapshot reescrito pela ETL: o cache da previsão NumPy não serve o resultado antigo
+    write_weekly_tickets(tickets_snapshot, weeks=40)
+    rows = await kpi_service.predict(request, FakePrediction(), kpi_settings)
+    assert rows != first and rows == await kpi_service.predict(request, FakePrediction(), kpi_settings)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "prediction",
+    [
+        FakePrediction(state="warming"),
+        FakePrediction(error=HTTPException(status_code=503, detail="Serviço de previsão ocupado.")),
+    ],
+    ids=["model-not-loaded", "executor-busy"],
+)
+async def test_predict_falls_back_to_numpy(tickets_snapshot, kpi_settings, prediction):
+    write_weekly_tickets(tickets_snapshot)
+    request = PredictionRequest(periods=2, freq="W-MON", last_date="1999-01-01")
+
+    rows = await kpi_service.predict(request, prediction, kpi_settings)
+
+    # Última semana do histórico termina em 2024-07-29
+    assert [row["ds"] for row in rows] == [datetime(2024, 8, 5), datetime(2024, 8, 12)]
+    assert all(row["yhat_lower"] <= row["yhat"] <= row["yhat_upper"] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_numpy_forecast_does_not_block_event_loop(tickets_snapshot, kpi_settings, monkeypatch):
+    write_weekly_tickets(tickets_snapshot)
+    fit = kpi_service.smoothing_forecast
+
+    def slow_forecast(*args: Any, **kwargs: Any):
+        time.sleep(0.2)
+        return fit(*args, **kwargs)
+
+    monkeypatch.setattr(kpi_service, "smoothing_forecast", slow_forecast)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    request = PredictionRequest(periods=1, freq="W-MON", last_date="1999-01-01", model="numpy")
+    await kpi_service.predict(request, FakePrediction(), kpi_settings)
+    task.cancel()
+
+    # O event loop seguiu atendendo enquanto o ajuste rodava
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_predict_model_selectable_per_request_and_settings(tickets_snapshot, kpi_settings):
+    write_weekly_tickets(tickets_snapshot)
+    prediction = FakePrediction()
+
+    await kpi_service.predict(
+        PredictionRequest(periods=1, freq="W-MON", last_date="1999-01-01", model="numpy"), prediction, kpi_settings
+    )
+    assert prediction.calls == 0
+
+    numpy_settings = kpi_settings.model_copy(update={"KPI_FORECAST_MODEL": "numpy"})
+    await kpi_service.predict(
+        PredictionRequest(periods=3, freq="W-MON", last_date="1999-01-01"), prediction, numpy_settings
+    )
+    assert prediction.calls == 0
+
+    await kpi_service.predict(
+        PredictionRequest(periods=4, freq="W-MON", last_date="1999-01-01", model="prophet"), prediction, numpy_settings
+    )
+    assert prediction.calls == 1
+
+
+def test_smoothing_forecast_follows_seasonal_pattern():
+    season = [10 + (week % 52) for week in range(52)]
+    ds = pd.date_range("2022-01-03", periods=156, freq="W-MON")
+
+    rows = smoothing_forecast(ds, season * 3, periods=3, freq="W-MON", last_date="2020-01-01")
+
+    assert [row["ds"] for row in rows] == list(pd.date_range(ds[-1], periods=4, freq="W-MON")[1:])
+    assert [row["yhat"] for row in rows] == season[:3]
+    assert all(row["yhat_lower"] <= row["yhat"] <= row["yhat_upper"] for row in rows)
+
+
+def test_fit_series_warm_starts_from_previous_params():
+    ds = pd.date_range("2024-01-01", periods=30, freq="W-MON")
+    y = [20 + (week % 4) * 3 for week in range(30)]
+
+    cold = fit_series(ds, y, periods=2, freq="W-MON")
+    assert cold["warm_start"] is False
+    assert [row["ds"] for row in cold["rows"]] == [datetime(2024, 7, 29), datetime(2024, 8, 5)]
+    assert all(row["yhat"] >= 0 for row in cold["rows"])
+    assert set(cold["params"]) == {"k", "m", "sigma_obs", "delta", "beta"}
+
+    warm = fit_series(ds, y, periods=2, freq="W-MON", init=cold["params"])
+    assert warm["warm_start"] is True
+    assert warm["fit_seconds"] > 0
+
+    # Parâmetros com forma incompatível: refaz o ajuste do zero
+    stale = {**cold["params"], "delta": [0.0]}
+    assert fit_series(ds, y, periods=1, freq="W-MON", init=stale)["warm_start"] is False